@@ -0,0 +1,155 @@
+import csv
+import json
+
+UNKNOWN = "Unknown"
+
+
+def table_key(table):
+    """
+    Normalizes a table name for catalog matching: unqualified and lower-case.
+    """
+    return table.rsplit(".", 1)[-1].lower()
+
+
+class SchemaCatalog:
+    """
+    Table -> columns catalog used to resolve unqualified columns. Loaded once per run and
+    inverted into a column -> tables index so each lookup is a single hash probe.
+    Names are matched case-insensitively and schema prefixes are ignored, since the
+    parsers report tables by their unqualified name.
+    """
+
+    def __init__(self, table_columns):
+        """
+        :param table_columns: Dictionary mapping table names to iterables of column names.
+        """
+        self.column_tables = {}
+        self.table_columns = {}
+        for table, columns in table_columns.items():
+            key = table_key(table)
+            known = self.table_columns.setdefault(key, set())
+            for column in columns:
+                column = column.lower()
+                if column not in known:
+                    known.add(column)
+                    self.column_tables.setdefault(column, []).append(key)
+
+    def tables_for(self, column):
+        return self.column_tables.get(column.lower(), ())
+
+    def has_column(self, table, column):
+        return column.lower() in self.table_columns.get(table_key(table), ())
+
+
+def load_schema_catalog(path):
+    """
+    Loads a schema catalog from an index compiled by catalog_index (memory-mapped), a
+    JSON file ({"table": ["col", ...]}) or a CSV export with table_name and column_name
+    columns (e.g. information_schema.columns).
+    :param path: Path to the catalog file.
+    :return: CatalogIndex or SchemaCatalog instance.
+    """
+    from catalog_index import CatalogIndex, is_catalog_index
+    if is_catalog_index(path):
+        return CatalogIndex(path)
+    if path.lower().endswith(".json"):
+        with open(path, mode='r', encoding='utf-8') as f:
+            return SchemaCatalog(json.load(f))
+
+    table_columns = {}
+    with open(path, mode='r', encoding='utf-8') as csv_file:
+        reader = csv.DictReader(csv_file)
+        fields = {name.lower(): name for name in reader.fieldnames or []}
+        if "table_name" not in fields or "column_name" not in fields:
+            raise ValueError(f"Catalog '{path}' needs table_name and column_name columns")
+        for row in reader:
+            table_columns.setdefault(row[fields["table_name"]], []).append(row[fields["column_name"]])
+    return SchemaCatalog(table_columns)
+
+
+class DerivedTable:
+    """
+    A subquery (or CTE) used in FROM. Its output columns map back to the physical
+    columns and tables they were selected from.
+    """
+
+    def __init__(self, name, columns):
+        """
+        :param name: Alias of the derived table.
+        :param columns: List of (output_column, source_column, source_table) tuples from the subquery.
+        """
+        self.name = name
+        self.columns = {}
+        for output_column, source_column, source_table in columns:
+            self.columns.setdefault(output_column, (source_column, source_table))
+        self.default_table = next((table for _, table in self.columns.values() if table != UNKNOWN), UNKNOWN)
+
+    def resolve(self, column):
+        return self.columns.get(column, (column, self.default_table))
+
+    def __repr__(self):
+        return f"DerivedTable({self.name!r})"
+
+
+class AliasIndex(dict):
+    """
+    Per-statement alias -> table index. Values are table names or DerivedTable objects,
+    kept in FROM order so the first entry is still the default for unqualified columns
+    when no catalog is available.
+    """
+
+    def __init__(self, catalog=None):
+        super().__init__()
+        self.catalog = catalog
+        self._lower = {}
+        self._table_rank = {}
+        self._derived = []
+
+    def __setitem__(self, alias, table):
+        super().__setitem__(alias, table)
+        self._lower.setdefault(alias.lower(), table)
+        if isinstance(table, DerivedTable):
+            self._derived.append(table)
+        else:
+            self._table_rank.setdefault(table_key(table), (len(self._table_rank), table))
+
+    def lookup(self, alias):
+        entry = self.get(alias)
+        if entry is None:
+            entry = self._lower.get(alias.lower())
+        return entry
+
+    def resolve(self, qualifier, column):
+        """
+        Resolves a column reference to its physical source.
+        :param qualifier: Table alias/name the column was qualified with, or None.
+        :param column: Column name.
+        :return: Tuple (source_column, source_table).
+        """
+        if qualifier is not None:
+            entry = self.lookup(qualifier)
+            if entry is None:
+                return column, UNKNOWN
+            if isinstance(entry, DerivedTable):
+                return entry.resolve(column)
+            return column, entry
+
+        if self.catalog is not None:
+            # Probe from whichever side is smaller: the column's tables or the FROM tables
+            candidates = self.catalog.tables_for(column)
+            if len(candidates) <= len(self._table_rank):
+                ranked = [self._table_rank[key] for key in candidates if key in self._table_rank]
+            else:
+                ranked = [rank for key, rank in self._table_rank.items() if self.catalog.has_column(key, column)]
+            if ranked:
+                return column, min(ranked)[1]
+        for derived in self._derived:
+            if column in derived.columns:
+                return derived.columns[column]
+
+        first = next(iter(self.values()), None)
+        if first is None:
+            return column, UNKNOWN
+        if isinstance(first, DerivedTable):
+            return first.resolve(column)
+        return column, first
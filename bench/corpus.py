@@ -0,0 +1,152 @@
+import argparse
+import csv
+import random
+
+FUNCTIONS = ["UPPER", "LOWER", "TRIM", "COALESCE", "TO_CHAR", "ROUND"]
+
+
+def make_expression(rng, alias, column, function_nesting):
+    """
+    Wraps a qualified column in ``function_nesting`` levels of function calls.
+    """
+    expression = f"{alias}.{column}"
+    for _ in range(function_nesting):
+        function = rng.choice(FUNCTIONS)
+        if function in ("COALESCE", "TO_CHAR", "ROUND"):
+            expression = f"{function}({expression}, '0')"
+        else:
+            expression = f"{function}({expression})"
+    return expression
+
+
+def make_source(table, width, subquery_depth, newline):
+    """
+    Wraps a table in ``subquery_depth`` levels of FROM subqueries, each selecting every
+    column the outer block may use from the level below.
+    """
+    columns = [f"col_{i}" for i in range(width)] + ["id", "status"]
+    source = table
+    for level in range(subquery_depth):
+        alias = f"s{level}"
+        items = ", ".join(f"{alias}.{column}" for column in columns)
+        source = f"({newline}SELECT {items}{newline}FROM {source} {alias}{newline})"
+    return source
+
+
+def make_branch(rng, width, joins, function_nesting, subquery_depth, newline):
+    """
+    Builds one SELECT ... FROM ... JOIN ... WHERE block.
+    """
+    aliases = [f"t{i}" for i in range(joins + 1)]
+    items = []
+    for i in range(width):
+        alias = rng.choice(aliases)
+        kind = rng.random()
+        if function_nesting and kind < 0.25:
+            items.append(f"{make_expression(rng, alias, f'col_{i}', function_nesting)} AS expr_{i}")
+        elif kind < 0.6:
+            items.append(f"{alias}.col_{i} AS out_{i}")
+        elif kind < 0.8:
+            items.append(f"{alias}.col_{i}")
+        else:
+            items.append(f"col_{i}")
+
+    lines = ["SELECT " + f",{newline}       ".join(items)]
+    table = f"schema_{rng.randrange(5)}.table_{rng.randrange(1000)}"
+    lines.append(f"FROM {make_source(table, width, subquery_depth, newline)} {aliases[0]}")
+    for alias in aliases[1:]:
+        join = rng.choice(["JOIN", "INNER JOIN", "LEFT JOIN", "LEFT OUTER JOIN"])
+        lines.append(f"{join} schema_{rng.randrange(5)}.table_{rng.randrange(1000)} {alias} "
+                     f"ON {aliases[0]}.id = {alias}.id")
+    lines.append(f"WHERE {aliases[0]}.status = 'ACTIVE'")
+    return newline.join(lines)
+
+
+def make_statement(rng, width=20, joins=2, union_depth=0, function_nesting=1, subquery_depth=0, crlf=False):
+    """
+    Builds a synthetic SELECT statement.
+    :param rng: random.Random instance.
+    :param width: Number of select-list items per branch.
+    :param joins: Number of JOINed tables per branch.
+    :param union_depth: Number of extra UNION ALL branches.
+    :param function_nesting: Depth of nested function calls in computed columns.
+    :param subquery_depth: Levels of FROM subqueries around each branch's first table.
+    :param crlf: Use Windows line endings.
+    :return: SQL query string.
+    """
+    newline = "\r\n" if crlf else "\n"
+    branches = [make_branch(rng, width, joins, function_nesting, subquery_depth, newline)
+                for _ in range(union_depth + 1)]
+    return f"{newline}UNION ALL{newline}".join(branches)
+
+
+def generate_corpus(count, seed=0, **options):
+    """
+    Generates ``count`` reproducible (logical_name, select_statement) pairs.
+    :param count: Number of statements.
+    :param seed: Random seed; the same seed and options always give the same corpus.
+    :param options: Keyword arguments for make_statement.
+    :return: List of (logical_name, select_statement) tuples.
+    """
+    rng = random.Random(seed)
+    return [(f"logical_sql_{i}", make_statement(rng, **options)) for i in range(count)]
+
+
+def write_lineage_csv(corpus, path):
+    """
+    Writes a corpus in the process_csv input layout (logical_name, select_statement).
+    """
+    with open(path, mode='w', newline='', encoding='utf-8') as csv_out:
+        writer = csv.writer(csv_out)
+        writer.writerow(["logical_name", "select_statement"])
+        writer.writerows(corpus)
+
+
+def write_splitter_csv(corpus, path):
+    """
+    Writes a corpus in the csv_sql_to_file input layout (RowNum, Logical_SQL_Name, SQL_Select).
+    """
+    with open(path, mode='w', newline='', encoding='utf-8') as csv_out:
+        writer = csv.writer(csv_out)
+        writer.writerow(["RowNum", "Logical_SQL_Name", "SQL_Select"])
+        for row_num, (logical_name, statement) in enumerate(corpus, start=1):
+            writer.writerow([row_num, logical_name, statement])
+
+
+def add_corpus_arguments(parser):
+    parser.add_argument('--statements', type=int, default=1000, help='Number of statements')
+    parser.add_argument('--width', type=int, default=20, help='Select-list items per branch')
+    parser.add_argument('--joins', type=int, default=2, help='JOINed tables per branch')
+    parser.add_argument('--union-depth', type=int, default=0, help='Extra UNION ALL branches')
+    parser.add_argument('--function-nesting', type=int, default=1, help='Nested function call depth')
+    parser.add_argument('--subquery-depth', type=int, default=0,
+                        help='Levels of FROM subqueries around the first table of each branch')
+    parser.add_argument('--crlf', action='store_true', help='Use CRLF line endings')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+
+
+def corpus_options(args):
+    return {
+        "width": args.width,
+        "joins": args.joins,
+        "union_depth": args.union_depth,
+        "function_nesting": args.function_nesting,
+        "subquery_depth": args.subquery_depth,
+        "crlf": args.crlf,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic SQL corpus for the lineage parsers.")
+    parser.add_argument('output_file', help='Output CSV path')
+    parser.add_argument('--splitter-layout', action='store_true',
+                        help='Write RowNum,Logical_SQL_Name,SQL_Select instead of logical_name,select_statement')
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.statements, seed=args.seed, **corpus_options(args))
+    if args.splitter_layout:
+        write_splitter_csv(corpus, args.output_file)
+    else:
+        write_lineage_csv(corpus, args.output_file)
+    print(f"Wrote {len(corpus)} statements to {args.output_file}")
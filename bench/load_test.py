@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from corpus import add_corpus_arguments, corpus_options, generate_corpus
+from lineage_service import DEFAULT_PORT, percentile
+
+
+async def open_connection(args):
+    if args.unix:
+        return await asyncio.open_unix_connection(args.unix)
+    return await asyncio.open_connection(args.host, args.port)
+
+
+async def request(reader, writer, method, path, body=b"", content_type="application/json"):
+    """
+    Sends one HTTP/1.1 request on a keep-alive connection.
+    :return: Tuple (status, headers, body).
+    """
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: lineage\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, await reader.readexactly(int(headers.get("content-length", 0)))
+
+
+async def client(args, payloads, latencies, counts):
+    """
+    One connection sending payloads until the shared list is empty. Rejected (503)
+    requests are retried after the server's Retry-After.
+    """
+    reader, writer = await open_connection(args)
+    try:
+        while payloads:
+            body, content_type, statements = payloads.pop()
+            while True:
+                start = time.perf_counter()
+                status, headers, _ = await request(reader, writer, "POST", "/parse", body, content_type)
+                if status != 503:
+                    break
+                counts["rejected"] += 1
+                await asyncio.sleep(float(headers.get("retry-after", 1)) * args.retry_scale)
+            latencies.append(time.perf_counter() - start)
+            counts["statements" if status == 200 else "failed"] += statements
+    finally:
+        writer.close()
+
+
+def build_payloads(corpus, batch):
+    """
+    Encodes the corpus as single-statement JSON requests, or NDJSON batches of ``batch``.
+    :return: List of (body, content_type, statement count), last request first.
+    """
+    if batch <= 1:
+        payloads = [(json.dumps({"logical_name": name, "statement": statement}).encode("utf-8"),
+                     "application/json", 1) for name, statement in corpus]
+    else:
+        payloads = []
+        for start in range(0, len(corpus), batch):
+            chunk = corpus[start:start + batch]
+            body = "".join(json.dumps({"logical_name": name, "statement": statement}) + "\n" for name, statement in chunk)
+            payloads.append((body.encode("utf-8"), "application/x-ndjson", len(chunk)))
+    return payloads[::-1]
+
+
+async def wait_until_ready(args, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await open_connection(args)
+            status, _, _ = await request(reader, writer, "GET", "/health")
+            writer.close()
+            if status == 200:
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+        await asyncio.sleep(0.1)
+
+
+async def run(args):
+    corpus = generate_corpus(args.statements, seed=args.seed, **corpus_options(args))
+    # Repeat the corpus to exercise the shared parse cache
+    corpus = corpus * args.repeat
+    payloads = build_payloads(corpus, args.batch)
+    latencies, counts = [], {"statements": 0, "failed": 0, "rejected": 0}
+
+    await wait_until_ready(args)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args, payloads, latencies, counts) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await open_connection(args)
+    _, _, body = await request(reader, writer, "GET", "/metrics")
+    writer.close()
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "statements": counts["statements"],
+        "failed_statements": counts["failed"],
+        "rejected_requests": counts["rejected"],
+        "seconds": elapsed,
+        "statements_per_sec": counts["statements"] / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "server": json.loads(body),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the lineage service with a synthetic corpus.")
+    add_corpus_arguments(parser)
+    parser.add_argument('--host', default="127.0.0.1", help='Service address')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Service TCP port')
+    parser.add_argument('--unix', help='Service unix socket path (instead of TCP)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent connections')
+    parser.add_argument('--batch', type=int, default=1,
+                        help='Statements per request; above 1 requests are NDJSON batches')
+    parser.add_argument('--repeat', type=int, default=1, help='Send the corpus this many times')
+    parser.add_argument('--retry-scale', type=float, default=0.05,
+                        help='Fraction of Retry-After to wait before retrying a rejected request')
+    parser.add_argument('--spawn', nargs=argparse.REMAINDER,
+                        help='Start lineage_service.py with these arguments for the run, e.g. --spawn --parser fast')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    service = None
+    if args.spawn is not None:
+        where = ["--unix", args.unix] if args.unix else ["--host", args.host, "--port", str(args.port)]
+        service = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "lineage_service.py")] + where + args.spawn)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+    print(f"{results['statements']} statements in {results['requests']} requests, {results['seconds']:.2f} s: "
+          f"{results['statements_per_sec']:.1f} stmts/sec, p50 {results['p50_ms']:.2f} ms, "
+          f"p99 {results['p99_ms']:.2f} ms, {results['rejected_requests']} rejected")
+    server = results["server"]
+    print(f"Server: {server['statements_per_sec']:.1f} stmts/sec since start, cache {server['cache']}")
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
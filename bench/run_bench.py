@@ -0,0 +1,185 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from corpus import add_corpus_arguments, corpus_options, generate_corpus, write_splitter_csv
+
+
+def load_parser(backend):
+    """
+    Returns the per-statement parse function for a backend name.
+    """
+    if backend == "no_sql_parser":
+        import no_sql_parser
+        return no_sql_parser.parse_select_statement
+    if backend == "fast":
+        import sql_lexer
+        return sql_lexer.parse_select_statement
+    if backend == "with_Sql_parser":
+        import with_Sql_parser
+        return with_Sql_parser.parse_select_statement
+    raise ValueError(f"Unknown backend '{backend}'")
+
+
+PARSER_BACKENDS = ["no_sql_parser", "fast", "with_Sql_parser"]
+BACKENDS = PARSER_BACKENDS + ["csv_sql_to_file"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def bench_parser(backend, corpus):
+    parse_func = load_parser(backend)
+    latencies = []
+    # Keep anything a parser prints (e.g. a run report) out of the timings' output
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        start = time.perf_counter()
+        for _, statement in corpus:
+            t0 = time.perf_counter()
+            parse_func(statement)
+            latencies.append(time.perf_counter() - t0)
+            sink.seek(0)
+            sink.truncate()
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "statements_per_sec": len(corpus) / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def bench_splitter(corpus):
+    import csv_sql_to_file
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, "statements.csv")
+        write_splitter_csv(corpus, csv_path)
+        start = time.perf_counter()
+        csv_sql_to_file.write_files(csv_sql_to_file.iter_sql_rows(csv_path), os.path.join(workdir, "sql_files"),
+                                    incremental=False)
+        elapsed = time.perf_counter() - start
+    # The splitter works on the whole file, so only throughput is meaningful
+    return {
+        "statements_per_sec": len(corpus) / elapsed if elapsed else None,
+        "p50_ms": None,
+        "p99_ms": None,
+    }
+
+
+def run_backend(backend, count, seed, options, queue):
+    """
+    Benchmarks one backend; runs in a fresh process so peak RSS is not shared.
+    """
+    corpus = generate_corpus(count, seed=seed, **options)
+    if backend == "csv_sql_to_file":
+        result = bench_splitter(corpus)
+    else:
+        result = bench_parser(backend, corpus)
+    result["peak_rss_mb"] = peak_rss_mb()
+    queue.put(result)
+
+
+def run_isolated(backend, count, seed, options):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_backend, args=(backend, count, seed, options, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """
+    Compares throughput against a previous results file.
+    :return: List of human-readable regression messages (empty if none).
+    """
+    regressions = []
+    for backend, result in results["backends"].items():
+        previous = baseline.get("backends", {}).get(backend)
+        if not previous or not previous.get("statements_per_sec") or not result.get("statements_per_sec"):
+            continue
+        change = result["statements_per_sec"] / previous["statements_per_sec"] - 1
+        print(f"{backend:>16}: {change:+.1%} vs baseline")
+        if change < -max_regression:
+            regressions.append(f"{backend} throughput dropped {-change:.1%} "
+                               f"(limit {max_regression:.0%})")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'backend':>16} {'stmts/sec':>12} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>9}")
+    for backend, result in results["backends"].items():
+        p50 = f"{result['p50_ms']:.3f}" if result["p50_ms"] is not None else "-"
+        p99 = f"{result['p99_ms']:.3f}" if result["p99_ms"] is not None else "-"
+        print(f"{backend:>16} {result['statements_per_sec']:>12.1f} {p50:>9} {p99:>9} "
+              f"{result['peak_rss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the SQL lineage parsers and splitter.")
+    add_corpus_arguments(parser)
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS,
+                        help='Backends to benchmark (default: all)')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Previous JSON results to compare throughput against')
+    parser.add_argument('--max-regression', type=float, default=0.10,
+                        help='Fail if throughput drops by more than this fraction (default: 0.10)')
+    args = parser.parse_args()
+
+    options = corpus_options(args)
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "corpus": dict(options, statements=args.statements, seed=args.seed),
+        "backends": {},
+    }
+    for backend in args.backends:
+        results["backends"][backend] = run_isolated(backend, args.statements, args.seed, options)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, mode='r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != results["corpus"]:
+            print("Warning: baseline was measured on a different corpus")
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            for message in regressions:
+                print(f"REGRESSION: {message}")
+            sys.exit(1)
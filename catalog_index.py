@@ -0,0 +1,181 @@
+import argparse
+import bisect
+import csv
+import mmap
+import struct
+from array import array
+
+from alias_index import table_key
+
+MAGIC = b"SQLCAT01"
+# magic, string count, blob size, column count, column postings, table count, table postings
+HEADER = struct.Struct("<8s6I")
+
+
+def read_catalog_rows(csv_path):
+    """
+    Streams (table_key, column) pairs from an information_schema-style CSV export with
+    table_name and column_name columns (header match is case-insensitive).
+    """
+    with open(csv_path, mode='r', encoding='utf-8') as csv_file:
+        reader = csv.DictReader(csv_file)
+        fields = {name.lower(): name for name in reader.fieldnames or []}
+        if "table_name" not in fields or "column_name" not in fields:
+            raise ValueError(f"Catalog '{csv_path}' needs table_name and column_name columns")
+        for row in reader:
+            yield table_key(row[fields["table_name"]]), row[fields["column_name"]].lower()
+
+
+def compile_catalog(csv_path, index_path):
+    """
+    Compiles a catalog export into a compact binary index for CatalogIndex.
+
+    All names are interned into one sorted string table; tables and columns are stored
+    as sorted arrays of string ids, each with a postings list (column -> tables and
+    table -> columns) so lookups are binary searches over the mapped file.
+    :param csv_path: information_schema-style CSV with table_name and column_name.
+    :param index_path: Output index file.
+    :return: Tuple (table count, column count).
+    """
+    table_columns = {}
+    for table, column in read_catalog_rows(csv_path):
+        table_columns.setdefault(table, set()).add(column)
+
+    encoded = {name: name.encode("utf-8") for name in set(table_columns).union(*table_columns.values())}
+    strings = sorted(encoded, key=encoded.get)
+    string_id = {name: i for i, name in enumerate(strings)}
+
+    offsets = array("I", [0])
+    for name in strings:
+        offsets.append(offsets[-1] + len(encoded[name]))
+    blob = b"".join(encoded[name] for name in strings)
+
+    column_tables = {}
+    for table, columns in table_columns.items():
+        for column in columns:
+            column_tables.setdefault(string_id[column], []).append(string_id[table])
+
+    def postings(mapping):
+        ids, starts, values = array("I"), array("I", [0]), array("I")
+        for key in sorted(mapping):
+            ids.append(key)
+            values.extend(sorted(mapping[key]))
+            starts.append(len(values))
+        return ids, starts, values
+
+    column_ids, column_starts, column_values = postings(column_tables)
+    table_ids, table_starts, table_values = postings(
+        {string_id[table]: [string_id[column] for column in columns] for table, columns in table_columns.items()})
+
+    with open(index_path, mode='wb') as f:
+        f.write(HEADER.pack(MAGIC, len(strings), len(blob), len(column_ids), len(column_values),
+                            len(table_ids), len(table_values)))
+        for part in (offsets, column_ids, column_starts, column_values, table_ids, table_starts, table_values):
+            f.write(part.tobytes())
+        f.write(blob)
+    return len(table_ids), len(column_ids)
+
+
+def is_catalog_index(path):
+    with open(path, mode='rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class CatalogIndex:
+    """
+    Read-only schema catalog backed by a memory-mapped index from compile_catalog().
+    Opening it only maps the file, so startup cost does not depend on catalog size.
+    Provides the same tables_for()/has_column() interface as alias_index.SchemaCatalog.
+    Pickles as its path, so worker processes re-map the file instead of copying it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._open()
+
+    def _open(self):
+        with open(self.path, mode='rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_strings, blob_size, n_columns, n_column_values, n_tables, n_table_values = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{self.path}' is not a compiled catalog index")
+
+        words = memoryview(self._map)[HEADER.size:].cast("B")
+        position = 0
+
+        def take(count):
+            nonlocal position
+            view = words[position * 4:(position + count) * 4].cast("I")
+            position += count
+            return view
+
+        self._offsets = take(n_strings + 1)
+        self._column_ids = take(n_columns)
+        self._column_starts = take(n_columns + 1)
+        self._column_values = take(n_column_values)
+        self._table_ids = take(n_tables)
+        self._table_starts = take(n_tables + 1)
+        self._table_values = take(n_table_values)
+        self._blob_start = HEADER.size + position * 4
+        self._lookups = {}
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self._open()
+
+    def string(self, string_id):
+        start = self._blob_start + self._offsets[string_id]
+        end = self._blob_start + self._offsets[string_id + 1]
+        return self._map[start:end]
+
+    def _find(self, ids, name):
+        """
+        Binary-searches a sorted id array for a name; returns its position or -1.
+        """
+        encoded = name.encode("utf-8")
+        low, high = 0, len(ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(ids[middle]) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(ids) and self.string(ids[low]) == encoded:
+            return low
+        return -1
+
+    def tables_for(self, column):
+        column = column.lower()
+        tables = self._lookups.get(column)
+        if tables is None:
+            position = self._find(self._column_ids, column)
+            if position < 0:
+                tables = ()
+            else:
+                start, end = self._column_starts[position], self._column_starts[position + 1]
+                tables = tuple(self.string(self._column_values[i]).decode("utf-8") for i in range(start, end))
+            self._lookups[column] = tables
+        return tables
+
+    def has_column(self, table, column):
+        table_position = self._find(self._table_ids, table_key(table))
+        column_position = self._find(self._column_ids, column.lower())
+        if table_position < 0 or column_position < 0:
+            return False
+        column_id = self._column_ids[column_position]
+        start, end = self._table_starts[table_position], self._table_starts[table_position + 1]
+        i = bisect.bisect_left(self._table_values, column_id, start, end)
+        return i < end and self._table_values[i] == column_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile an information_schema export into a catalog index.")
+    parser.add_argument('csv_file', help='CSV with table_name and column_name columns')
+    parser.add_argument('index_file', help='Output index path (pass it to --catalog)')
+    args = parser.parse_args()
+    tables, columns = compile_catalog(args.csv_file, args.index_file)
+    print(f"Indexed {tables} tables and {columns} distinct columns into {args.index_file}")
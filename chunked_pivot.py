@@ -0,0 +1,296 @@
+import numpy as np
+import pandas as pd
+
+from excel_stream import DEFAULT_CHUNK_ROWS, columnar_format, iter_columnar_frames, iter_frames
+
+# Partial statistics kept per group, and how partials from different chunks merge
+MERGE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+# Aggregations and the partial statistics they are computed from
+AGGREGATIONS = {
+    "sum": ("sum",),
+    "count": ("count",),
+    "mean": ("sum", "count"),
+    "min": ("min",),
+    "max": ("max",),
+    "size": (),
+    "nunique": (),
+    "approx_nunique": (),
+}
+# numpy/builtin callables accepted as aggfunc, by __name__
+CALLABLE_NAMES = {"sum": "sum", "mean": "mean", "amin": "min", "min": "min", "amax": "max", "max": "max",
+                  "len": "size", "count_nonzero": "count"}
+SIZE = ("", "size")
+# Value of an aggregation over an empty group, as pandas shows it for unobserved categories
+EMPTY_GROUP = {"sum": 0, "count": 0, "size": 0, "nunique": 0, "approx_nunique": 0}
+HLL_PRECISION = 12
+
+
+def iter_source_chunks(source, chunk_rows=DEFAULT_CHUNK_ROWS, columns=None):
+    """
+    Yields DataFrame chunks from a DataFrame, an iterable of DataFrames, a pyarrow
+    Table, or a CSV, Parquet or Arrow file path (only the requested columns are read
+    from files and tables).
+    """
+    if columnar_format(source) or hasattr(source, "to_batches"):
+        yield from iter_columnar_frames(source, chunk_rows, columns)
+    elif isinstance(source, str):
+        yield from pd.read_csv(source, chunksize=chunk_rows, usecols=columns)
+    else:
+        yield from iter_frames(source, chunk_rows)
+
+
+def aggregation_name(func):
+    name = func if isinstance(func, str) else CALLABLE_NAMES.get(getattr(func, "__name__", None))
+    if name not in AGGREGATIONS:
+        raise ValueError(f"Unsupported aggfunc {func!r}, expected one of {list(AGGREGATIONS)}")
+    return name
+
+
+def aggregation_plan(targets, aggfunc):
+    """
+    Maps each value column to the aggregation applied to it by one (non-list) aggfunc.
+    """
+    if isinstance(aggfunc, dict):
+        return {value: aggregation_name(aggfunc[value]) for value in targets if value in aggfunc}
+    return {value: aggregation_name(aggfunc) for value in targets}
+
+
+def plan_specs(plans):
+    """
+    Unique (value column, aggregation name) pairs needed by a list of aggregation plans.
+    """
+    return list(dict.fromkeys(spec for plan in plans for spec in plan.items()))
+
+
+def as_list(keys):
+    return [] if keys is None else [keys] if not isinstance(keys, list) else keys
+
+
+def bit_length(values):
+    """
+    Vectorized int.bit_length() for a uint64 array.
+    """
+    result = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = values >> np.uint64(shift)
+        mask = high != 0
+        result[mask] += shift
+        values = np.where(mask, high, values)
+    return result + (values != 0)
+
+
+class PivotAccumulator:
+    """
+    Mergeable per-group aggregates for a pivot, built one chunk at a time. Memory grows
+    with the number of groups (and, for exact nunique, distinct values per group), never
+    with the number of rows.
+
+    sum, count, min and max are kept as partial statistics and mean is derived from sum
+    and count. nunique keeps the distinct (group, value) pairs; approx_nunique keeps a
+    sparse HyperLogLog sketch per group instead, bounded by 2**hll_precision registers.
+    """
+
+    def __init__(self, keys, specs, dropna=True, hll_precision=HLL_PRECISION):
+        """
+        :param keys: Grouping columns (pivot index + columns).
+        :param specs: List of (value column, aggregation name) pairs to compute.
+        :param dropna: Drop rows whose keys are missing, as groupby(dropna=True) does.
+        :param hll_precision: Register bits for approx_nunique sketches.
+        """
+        self.keys = keys
+        self.specs = specs
+        self.dropna = dropna
+        self.hll_precision = hll_precision
+        self.stats = {}
+        for value, func in specs:
+            for stat in AGGREGATIONS[func]:
+                self.stats.setdefault(value, [])
+                if stat not in self.stats[value]:
+                    self.stats[value].append(stat)
+        self.distinct_columns = sorted({value for value, func in specs if func == "nunique"}, key=str)
+        self.sketch_columns = sorted({value for value, func in specs if func == "approx_nunique"}, key=str)
+        self.state = None
+        self.distinct = {}
+        self.sketches = {}
+
+    def _merge(self, previous, partial, how):
+        if previous is None:
+            return partial
+        return pd.concat([previous, partial]).groupby(
+            level=list(range(partial.index.nlevels)), sort=False, dropna=False).agg(how)
+
+    def update(self, chunk):
+        grouped = chunk.groupby(self.keys, sort=False, dropna=self.dropna, observed=True)
+        parts = [grouped.size().rename(SIZE)]
+        if self.stats:
+            parts.insert(0, grouped.agg(self.stats))
+        partial = pd.concat(parts, axis=1)
+        partial.columns = pd.MultiIndex.from_tuples(list(partial.columns))
+        self.state = self._merge(self.state, partial,
+                                 {column: MERGE.get(column[1], "sum") for column in partial.columns})
+
+        key_frame = chunk[self.keys]
+        present = key_frame.notna().all(axis=1) if self.dropna else pd.Series(True, index=chunk.index)
+        for value in self.distinct_columns:
+            pairs = chunk.loc[present & chunk[value].notna(), self.keys + [value]].drop_duplicates()
+            previous = self.distinct.get(value)
+            self.distinct[value] = pairs if previous is None else \
+                pd.concat([previous, pairs], ignore_index=True).drop_duplicates()
+        for value in self.sketch_columns:
+            self.sketches[value] = self._merge(self.sketches.get(value),
+                                               self._sketch(chunk.loc[present & chunk[value].notna()], value), "max")
+
+    def _sketch(self, chunk, value):
+        """
+        HyperLogLog registers touched by one chunk: for each (group, register) the
+        maximum rank (leading zeros + 1) of the hashed values that fall into it.
+        """
+        precision = self.hll_precision
+        hashes = pd.util.hash_pandas_object(chunk[value], index=False).to_numpy()
+        registers = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+        ranks = (64 - precision) - bit_length(rest) + 1
+        frame = chunk[self.keys].assign(__register=registers, __rank=ranks)
+        return frame.groupby(self.keys + ["__register"], sort=False, dropna=False)[["__rank"]].max()
+
+    def _estimate(self, sketch):
+        m = 1 << self.hll_precision
+        levels = list(range(sketch.index.nlevels - 1))
+        inverse = pd.Series(np.exp2(-sketch["__rank"].to_numpy(dtype=float)), index=sketch.index)
+        grouped = inverse.groupby(level=levels, sort=False, dropna=False)
+        harmonic, touched = grouped.sum(), grouped.size()
+        zeros = m - touched
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / (harmonic + zeros)
+        # Linear counting is far more accurate while many registers are still empty
+        linear = m * np.log(m / zeros.clip(lower=1))
+        estimate = np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+        return pd.Series(np.round(estimate).astype(np.int64), index=harmonic.index)
+
+    def result(self, value, func):
+        """
+        Returns the final aggregate of one (value, aggregation) pair as a Series
+        indexed by the group keys.
+        """
+        state = self.state
+        if func == "mean":
+            return state[(value, "sum")] / state[(value, "count")]
+        if func == "size":
+            return state[SIZE]
+        if func == "nunique":
+            pairs = self.distinct[value]
+            counts = pairs.groupby(self.keys, sort=False, dropna=False).size()
+            return counts.reindex(state.index, fill_value=0)
+        if func == "approx_nunique":
+            sketch = self.sketches.get(value)
+            if sketch is None:
+                return pd.Series(0, index=state.index)
+            return self._estimate(sketch).reindex(state.index, fill_value=0)
+        return state[(value, func)]
+
+
+def chunked_pivot_table(source, values=None, index=None, columns=None, aggfunc="mean", fill_value=None,
+                        dropna=True, observed=True, sort=True, margins=False, chunk_rows=DEFAULT_CHUNK_ROWS,
+                        hll_precision=HLL_PRECISION):
+    """
+    Out-of-core equivalent of pd.pivot_table. The source is read in chunks and reduced
+    to mergeable per-group aggregates, so peak memory is proportional to the number of
+    groups rather than the number of rows. The result has the same shape, labels and
+    dtypes as pd.pivot_table on the fully loaded data, so the function can be passed
+    as pivot_func (e.g. functools.partial(chunked_pivot_table, values=..., index=...)).
+
+    Parameters:
+    source (pandas.DataFrame, iterable, pyarrow.Table or str): The data, DataFrame chunks, or a
+               CSV/Parquet/Arrow path
+    values, index, columns, fill_value, dropna, observed, sort: As for pd.pivot_table
+    aggfunc (str, callable, list or dict): sum, count, mean, min, max, size (len), nunique,
+               or approx_nunique (HyperLogLog estimate, memory bounded per group); a list
+               of those, or a dict mapping value columns to one of those
+    margins (bool): Not supported, since margins need a second aggregation pass
+    chunk_rows (int): Rows read per chunk
+    hll_precision (int): Register bits for approx_nunique (relative error about 1.04 / sqrt(2**bits))
+    """
+    if margins:
+        raise ValueError("margins are not supported by the chunked pivot engine")
+    index, columns = as_list(index), as_list(columns)
+    keys = index + columns
+    if not keys:
+        raise ValueError("No group keys passed!")
+
+    aggfuncs = aggfunc if isinstance(aggfunc, list) else [aggfunc]
+    value_list = None if values is None else list(values) if isinstance(values, list) else [values]
+    if value_list is not None:
+        read_columns = keys + value_list
+    elif all(isinstance(func, dict) for func in aggfuncs):
+        read_columns = keys + list(dict.fromkeys(value for func in aggfuncs for value in func))
+    else:
+        read_columns = None
+
+    # One scan feeds every aggregation function
+    accumulator = plans = None
+    for chunk in iter_source_chunks(source, chunk_rows, read_columns):
+        if accumulator is None:
+            targets = value_list if value_list is not None else [col for col in chunk.columns if col not in keys]
+            plans = [aggregation_plan(targets, func) for func in aggfuncs]
+            accumulator = PivotAccumulator(keys, plan_specs(plans), dropna=dropna, hll_precision=hll_precision)
+        accumulator.update(chunk)
+    if accumulator is None:
+        raise ValueError("No data to pivot.")
+
+    return reshape_pivot(accumulator, aggfunc, plans, values, index, columns, fill_value, dropna, observed, sort)
+
+
+def add_unobserved_groups(reduced, keys, plan):
+    """
+    Adds a row for each key combination pd.pivot_table(observed=False) shows but no row
+    fell into, holding the aggregation of an empty group (0 for sum and count, missing
+    for mean, min and max), so pivoting the reduced frame fills unobserved categories
+    the same way pivoting the raw rows does.
+    """
+    categorical = [isinstance(reduced[key].dtype, pd.CategoricalDtype) for key in keys]
+    if not any(categorical):
+        return reduced
+    levels = [reduced[key].cat.categories if is_categorical else reduced[key].unique()
+              for key, is_categorical in zip(keys, categorical)]
+    combinations = pd.MultiIndex.from_product(levels, names=keys)
+    missing = combinations[~combinations.isin(pd.MultiIndex.from_frame(reduced[keys]))].to_frame(index=False)
+    if missing.empty:
+        return reduced
+    for key in keys:
+        missing[key] = missing[key].astype(reduced[key].dtype)
+    for value, name in plan.items():
+        missing[value] = EMPTY_GROUP.get(name, np.nan)
+    return pd.concat([reduced, missing], ignore_index=True)
+
+
+def reshape_pivot(accumulator, aggfunc, plans, values, index, columns, fill_value=None, dropna=True,
+                  observed=True, sort=True, labels=None):
+    """
+    Turns accumulated per-group aggregates into the table pd.pivot_table would return.
+    Each aggregation becomes one row per group holding its final values, and
+    pd.pivot_table over that frame produces the same reshaping, sorting and filling as
+    over the raw rows.
+    :param accumulator: PivotAccumulator fed with every chunk.
+    :param aggfunc: The aggfunc as passed by the caller (single, list or dict).
+    :param plans: aggregation_plan() of each function in aggfunc.
+    :param labels: Optional {key: pd.Index} to decode keys that were accumulated as
+                   integer codes (-1 decodes to a missing label).
+    """
+    aggfuncs = aggfunc if isinstance(aggfunc, list) else [aggfunc]
+    pieces = []
+    for func, plan in zip(aggfuncs, plans):
+        reduced = pd.DataFrame({value: accumulator.result(value, name) for value, name in plan.items()},
+                               index=accumulator.state.index).reset_index()
+        for key, key_labels in (labels or {}).items():
+            codes = reduced[key].to_numpy()
+            reduced[key] = key_labels.take(codes, allow_fill=True, fill_value=np.nan) if (codes < 0).any() \
+                else key_labels.take(codes)
+        if not observed:
+            reduced = add_unobserved_groups(reduced, list(accumulator.keys), plan)
+        inner = {value: "max" for value in plan} if isinstance(func, dict) else "max"
+        pieces.append(pd.pivot_table(reduced, values=values, index=index or None, columns=columns or None,
+                                     aggfunc=inner, fill_value=fill_value, dropna=dropna, observed=observed,
+                                     sort=sort))
+    if not isinstance(aggfunc, list):
+        return pieces[0]
+    return pd.concat(pieces, keys=[getattr(func, "__name__", func) for func in aggfunc], axis=1)
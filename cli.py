@@ -0,0 +1,201 @@
+import argparse
+import sys
+
+LINEAGE_PARSERS = ("sqlparse", "regex", "fast")
+# Subcommands whose remaining arguments are handed to the module's own parse_args
+FORWARDED = ("lineage", "split-sql", "graph")
+
+
+def build_parser():
+    """
+    Builds the command-line parser. Only argparse is imported here; every subcommand
+    imports its (pandas, openpyxl, sqlparse, ...) dependencies when it runs, so --help
+    and argument errors return without loading any of them.
+    """
+    parser = argparse.ArgumentParser(prog="cli.py", description="SQL lineage and Excel reporting tools.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    lineage = commands.add_parser(
+        "lineage", add_help=False, allow_abbrev=False,
+        help='Extract column lineage from a CSV of SELECT statements; --parser picks sqlparse (default), '
+             'regex or fast (see "lineage -h")')
+    lineage.add_argument('--parser', choices=LINEAGE_PARSERS, default="sqlparse",
+                         help='"sqlparse" (with_Sql_parser), or the "regex" or "fast" no_sql_parser backend')
+
+    commands.add_parser(
+        "split-sql", add_help=False,
+        help='Split a CSV of SQL statements into .sql files or a tar archive (see "split-sql -h")')
+
+    commands.add_parser(
+        "graph", add_help=False,
+        help='Compile lineage output into a dependency graph and run impact queries (see "graph -h")')
+
+    excel = commands.add_parser("excel", help="Stream a CSV, Parquet or Arrow file into an Excel sheet")
+    excel.add_argument('source', help='Input CSV, Parquet or Arrow file')
+    excel.add_argument('output', help='Output .xlsx file')
+    excel.add_argument('--sheet-name', default="Data", help='Worksheet name (default: Data)')
+    add_excel_arguments(excel)
+
+    pivot = commands.add_parser("pivot", help="Pivot a CSV, Parquet or Arrow file out of core into an Excel sheet")
+    pivot.add_argument('source', help='Input CSV, Parquet or Arrow file')
+    pivot.add_argument('output', help='Output .xlsx file')
+    pivot.add_argument('--index', nargs='+', default=[], help='Row key columns')
+    pivot.add_argument('--columns', nargs='+', default=[], help='Column key columns')
+    pivot.add_argument('--values', nargs='+', help='Value columns (default: every non-key column)')
+    pivot.add_argument('--aggfunc', nargs='+', default=["mean"],
+                       help='sum, count, mean, min, max, size, nunique or approx_nunique (default: mean)')
+    pivot.add_argument('--fill-value', type=float, help='Value for empty cells')
+    pivot.add_argument('--sheet-name', default="Pivot", help='Pivot worksheet name (default: Pivot)')
+    pivot.add_argument('--data-sheet-name',
+                       help='Also stream the source rows into a worksheet of this name, before the pivot')
+    add_excel_arguments(pivot)
+
+    batch = commands.add_parser(
+        "batch", help="Run many jobs in one process from a manifest of JSON argument lists")
+    batch.add_argument('manifest',
+                       help='File with one JSON array of arguments per line, e.g. ["lineage", "in.csv", "out.csv"], '
+                            'or - to read jobs from stdin as they arrive')
+    batch.add_argument('--results', help='Append one JSON line per finished job to this file')
+    batch.add_argument('--stop-on-error', action='store_true', help='Stop at the first failed job')
+    return parser
+
+
+def add_excel_arguments(parser):
+    parser.add_argument('--backend', choices=("openpyxl", "xlsxwriter"), default="openpyxl",
+                        help='Streaming backend: openpyxl write_only (default) or xlsxwriter constant_memory')
+    # Same default as excel_stream.DEFAULT_CHUNK_ROWS, which is not imported until a command runs
+    parser.add_argument('--chunk-rows', type=int, default=50000, help='Rows read and converted per chunk')
+
+
+def run_lineage(args, argv):
+    # Failures propagate like every other command's, so batch jobs record them
+    if args.parser == "sqlparse":
+        import with_Sql_parser
+        return with_Sql_parser.main(argv, raise_errors=True)
+    import no_sql_parser
+    return no_sql_parser.main(["--backend", args.parser] + argv, raise_errors=True)
+
+
+def run_split_sql(args, argv):
+    import csv_sql_to_file
+    csv_sql_to_file.main(argv)
+
+
+def run_graph(args, argv):
+    import lineage_graph
+    lineage_graph.main(argv)
+
+
+def run_excel(args, argv):
+    from chunked_pivot import iter_source_chunks
+    from excel_stream import write_sheets_streaming
+
+    write_sheets_streaming(args.output, [(args.sheet_name, iter_source_chunks(args.source, args.chunk_rows))],
+                           backend=args.backend, chunk_rows=args.chunk_rows)
+    print(f"Wrote '{args.source}' to sheet '{args.sheet_name}' of '{args.output}'")
+
+
+def run_pivot(args, argv):
+    from chunked_pivot import chunked_pivot_table, iter_source_chunks
+    from excel_stream import write_sheets_streaming
+    from pivot_report import pivot_sheet_frame
+
+    aggfunc = args.aggfunc[0] if len(args.aggfunc) == 1 else args.aggfunc
+    values = args.values[0] if args.values and len(args.values) == 1 else args.values
+    table = chunked_pivot_table(args.source, values=values, index=args.index, columns=args.columns,
+                                aggfunc=aggfunc, fill_value=args.fill_value, chunk_rows=args.chunk_rows)
+    sheets = [(args.sheet_name, pivot_sheet_frame(table))]
+    if args.data_sheet_name:
+        sheets.insert(0, (args.data_sheet_name, iter_source_chunks(args.source, args.chunk_rows)))
+    write_sheets_streaming(args.output, sheets, backend=args.backend, chunk_rows=args.chunk_rows)
+    print(f"Wrote a {len(table)}-row pivot of '{args.source}' to sheet '{args.sheet_name}' of '{args.output}'")
+
+
+def iter_manifest(path):
+    """
+    Reads batch jobs: one JSON array of command-line arguments per line. Blank lines
+    and lines starting with # are skipped.
+    :return: Generator of (line_number, argv) tuples.
+    """
+    import json
+
+    stream = sys.stdin if path == "-" else open(path, mode='r', encoding='utf-8')
+    try:
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            argv = json.loads(line)
+            if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+                raise ValueError(f"Line {line_number} of '{path}' is not a JSON array of strings")
+            yield line_number, argv
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def run_batch(args, argv):
+    """
+    Runs every job of a manifest in this process, so interpreter start-up and imports
+    are paid once for the whole batch instead of once per job. A failed job is reported
+    and the batch continues unless --stop-on-error is given.
+    :return: Number of failed jobs.
+    """
+    import json
+    import time
+
+    results = open(args.results, mode='a', encoding='utf-8') if args.results else None
+    failed = total = 0
+    try:
+        for line_number, job in iter_manifest(args.manifest):
+            total += 1
+            start = time.perf_counter()
+            error = None
+            try:
+                if job and job[0] == "batch":
+                    raise ValueError("batch jobs cannot be nested")
+                status = main(job)
+                if status:
+                    error = f"exit status {status}"
+            except SystemExit as e:
+                if e.code not in (None, 0):
+                    error = f"exit status {e.code}"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            seconds = time.perf_counter() - start
+            if error is not None:
+                failed += 1
+                print(f"Job on line {line_number} failed after {seconds:.2f} s: {error}", file=sys.stderr)
+            if results is not None:
+                results.write(json.dumps({"line": line_number, "argv": job, "ok": error is None,
+                                          "error": error, "seconds": seconds}) + "\n")
+                results.flush()
+            if error is not None and args.stop_on_error:
+                break
+    finally:
+        if results is not None:
+            results.close()
+    print(f"Batch finished: {total - failed} of {total} jobs succeeded", file=sys.stderr)
+    return failed
+
+
+COMMANDS = {
+    "lineage": run_lineage,
+    "split-sql": run_split_sql,
+    "graph": run_graph,
+    "excel": run_excel,
+    "pivot": run_pivot,
+    "batch": run_batch,
+}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if rest and args.command not in FORWARDED:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    return COMMANDS[args.command](args, rest)
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main() else 0)
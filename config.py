@@ -0,0 +1,298 @@
+import functools
+import os
+import re
+import sys
+import threading
+import time
+
+DEFAULT_CHECK_INTERVAL = 1.0
+# argparse accepts "-1" or "-.5" as an option value, but not "-x"
+NEGATIVE_NUMBER = re.compile(r"^-\d+$|^-\d*\.\d+$")
+TRUE_VALUES = frozenset({"1", "true", "yes", "y", "on"})
+FALSE_VALUES = frozenset({"0", "false", "no", "n", "off"})
+
+SOURCE_ARGUMENT = "command line argument"
+SOURCE_ENVIRONMENT = "environment variable"
+SOURCE_DOTENV = ".env file"
+
+
+class ConfigError(LookupError):
+    """
+    Raised when a required variable has no value and there is no terminal to prompt on.
+    """
+
+
+def parse_options(argv):
+    """
+    Collects every ``--name value`` and ``--name=value`` option from a command line in
+    one pass. As with argparse, a later repeat of an option wins, a value may not look
+    like another option (negative numbers excepted) and ``--`` ends the options.
+    :param argv: Command-line arguments, without the program name.
+    :return: Dictionary mapping option names (without dashes) to values.
+    """
+    options = {}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--":
+            break
+        if arg.startswith("--"):
+            name, separator, value = arg[2:].partition("=")
+            if separator:
+                options[name] = value
+            elif i + 1 < len(argv) and (not argv[i + 1].startswith("-") or NEGATIVE_NUMBER.match(argv[i + 1])):
+                options[name] = argv[i + 1]
+                i += 1
+        i += 1
+    return options
+
+
+def find_env_file():
+    """
+    Locates the .env file the way load_dotenv() does when called from this directory.
+    :return: Path, or None when there is no .env file.
+    """
+    from dotenv import find_dotenv
+    return find_dotenv() or None
+
+
+def read_env_file(path):
+    """
+    Parses a .env file without changing os.environ.
+    :return: Dictionary of variables; keys without a value are left out.
+    """
+    from dotenv import dotenv_values
+    return {name: value for name, value in dotenv_values(path).items() if value is not None}
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+
+def to_bool(value):
+    lowered = value.strip().lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise ValueError(f"'{value}' is not a boolean")
+
+
+class ConfigSnapshot:
+    """
+    Immutable view of the parsed command line. The process environment is read live,
+    since the program itself may set variables while it runs, and the .env variables
+    come from a callable, so the file is only located and read when a lookup gets that
+    far. Every lookup is a dictionary probe per source.
+    """
+    __slots__ = ("_options", "_dotenv", "_environ")
+
+    def __init__(self, options, dotenv, environ):
+        """
+        :param options: Command-line options from parse_options().
+        :param dotenv: Variables read from the .env file, or a callable returning them.
+        :param environ: Environment mapping (normally os.environ).
+        """
+        if not callable(dotenv):
+            dotenv = functools.partial(dict, dotenv)
+        object.__setattr__(self, "_options", dict(options))
+        object.__setattr__(self, "_dotenv", dotenv)
+        object.__setattr__(self, "_environ", environ)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    def lookup(self, name):
+        """
+        Finds a variable in precedence order: ``--name`` (lower-case) on the command
+        line, a non-empty environment variable, then the .env file. Like load_dotenv(),
+        the .env file never overrides a variable that is set in the environment, even
+        to an empty value.
+        :return: Tuple (value, source), or (None, None) when the variable is not set.
+        """
+        value = self._options.get(name.lower())
+        if value is not None:
+            return value, SOURCE_ARGUMENT
+        value = self._environ.get(name)
+        if value:
+            return value, SOURCE_ENVIRONMENT
+        if value is None:
+            value = self._dotenv().get(name)
+            if value:
+                return value, SOURCE_DOTENV
+        return None, None
+
+    def get(self, name, default=None):
+        value, _ = self.lookup(name)
+        return default if value is None else value
+
+    def _convert(self, name, default, convert, kind):
+        value, source = self.lookup(name)
+        if value is None:
+            return default
+        try:
+            return convert(value)
+        except ValueError:
+            raise ValueError(f"{name} from {source} is not {kind}: '{value}'") from None
+
+    def get_int(self, name, default=None):
+        return self._convert(name, default, int, "an integer")
+
+    def get_float(self, name, default=None):
+        return self._convert(name, default, float, "a number")
+
+    def get_bool(self, name, default=None):
+        return self._convert(name, default, to_bool, "a boolean")
+
+    def get_list(self, name, default=None, separator=","):
+        return self._convert(name, default,
+                             lambda value: [item.strip() for item in value.split(separator) if item.strip()], "a list")
+
+
+class Config:
+    """
+    Resolves configuration variables from the command line, the environment and a .env
+    file. The command line is parsed once. The .env file is located and read on the
+    first lookup that reaches it, so python-dotenv is not imported while every variable
+    comes from the command line or the environment, and read again only when its
+    modification time changes, which is checked at most every ``check_interval`` seconds.
+    """
+
+    def __init__(self, argv=None, env_file=None, environ=None, check_interval=DEFAULT_CHECK_INTERVAL,
+                 interactive=None):
+        """
+        :param argv: Command-line arguments (default: sys.argv[1:]).
+        :param env_file: .env file path (default: found like load_dotenv() does).
+        :param environ: Environment mapping (default: os.environ).
+        :param check_interval: Seconds between checks of the .env file's modification time.
+        :param interactive: Whether missing values may be prompted for (default: when
+                            stdin is a terminal).
+        """
+        self._env_file = env_file
+        self._env_path = None
+        self._env_mtime = None
+        self._dotenv = None
+        self.check_interval = check_interval
+        self.interactive = interactive
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._reported = set()
+        self._snapshot = ConfigSnapshot(parse_options(sys.argv[1:] if argv is None else argv), self.dotenv,
+                                        os.environ if environ is None else environ)
+
+    @property
+    def env_path(self):
+        """
+        Path of the .env file (None when there is none), located on first use.
+        """
+        if self._dotenv is None:
+            self.dotenv()
+        return self._env_path
+
+    def dotenv(self):
+        """
+        :return: Variables of the .env file, reading it on first use and again when it changed.
+        """
+        dotenv = self._dotenv
+        now = time.monotonic()
+        if dotenv is not None and now - self._checked < self.check_interval:
+            return dotenv
+        with self._lock:
+            if self._dotenv is None and self._env_path is None:
+                self._env_path = self._env_file if self._env_file is not None else find_env_file()
+            mtime = file_mtime(self._env_path)
+            if self._dotenv is None or mtime != self._env_mtime:
+                self._dotenv = read_env_file(self._env_path) if mtime is not None else {}
+                self._env_mtime = mtime
+            self._checked = now
+            return self._dotenv
+
+    def snapshot(self):
+        """
+        :return: The ConfigSnapshot all lookups go through.
+        """
+        return self._snapshot
+
+    def reload(self):
+        """
+        Forces the .env file to be read again on the next lookup that reaches it.
+        """
+        with self._lock:
+            self._dotenv = None
+
+    def get(self, name, default=None):
+        return self.snapshot().get(name, default)
+
+    def get_int(self, name, default=None):
+        return self.snapshot().get_int(name, default)
+
+    def get_float(self, name, default=None):
+        return self.snapshot().get_float(name, default)
+
+    def get_bool(self, name, default=None):
+        return self.snapshot().get_bool(name, default)
+
+    def get_list(self, name, default=None, separator=","):
+        return self.snapshot().get_list(name, default, separator)
+
+    def is_interactive(self):
+        if self.interactive is not None:
+            return self.interactive
+        return sys.stdin is not None and sys.stdin.isatty()
+
+    def resolve(self, name, prompt_message, default_value=None):
+        """
+        Returns a variable from the command line, the environment or the .env file, in
+        that order. Otherwise the user is prompted (a blank answer takes the default)
+        when running interactively; without a terminal the default is used, and a
+        variable with no default raises ConfigError instead of waiting for input.
+        Where a value came from is printed the first time each variable is resolved.
+        """
+        value, source = self.snapshot().lookup(name)
+        if value is not None:
+            self._report(name, f"Using {name} from {source}.")
+            return value
+
+        if not self.is_interactive():
+            if default_value is not None:
+                self._report(name, f"Using default value for {name}; no terminal to prompt on.")
+                return default_value
+            raise ConfigError(f"{name} is not set: pass --{name.lower()}, set the {name} environment variable "
+                              f"or add it to the .env file")
+
+        prompt_suffix = f" (default: '{default_value}')" if default_value is not None else ""
+        while True:
+            user_input = input(f"{prompt_message}{prompt_suffix}").strip()
+
+            if user_input:
+                print(f"Using {name} from user input.")
+                return user_input
+            elif default_value is not None:
+                print(f"Using default value for {name} due to blank user input.")
+                return default_value
+            else:
+                print("Input cannot be empty and no default value is provided. Please provide a value.")
+
+    def _report(self, name, message):
+        if name not in self._reported:
+            self._reported.add(name)
+            print(message)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_config():
+    """
+    :return: The process-wide Config, created on first use from sys.argv and os.environ.
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Config()
+    return _default
@@ -1,34 +1,241 @@
+import argparse
 import csv
+import hashlib
+import io
+import itertools
 import os
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-# Define the input CSV file and output directory
-csv_file = "your_file.csv"  # Replace with your actual CSV file path
-output_dir = "sql_files"  # Directory to store the SQL files
+MANIFEST_NAME = ".sql_manifest.tsv"
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 256
 
-# Create the output directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
 
-# Open the CSV file and process it
-with open(csv_file, mode="r", encoding="utf-8") as file:
-    reader = csv.reader(file)
-    
-    # Skip the header row
-    next(reader)
+def iter_sql_rows(csv_file):
+    """
+    Streams (file_name, sql_select) pairs from a RowNum, Logical_SQL_Name, SQL_Select CSV.
+    :param csv_file: Path to the input CSV.
+    :return: Generator of (file_name, sql_select) tuples.
+    """
+    with open(csv_file, mode="r", encoding="utf-8") as file:
+        reader = csv.reader(file)
 
-    for row in reader:
-        if len(row) < 3:
-            continue  # Skip if the row doesn't have enough columns
+        # Skip the header row
+        next(reader, None)
 
-        row_num = row[0].strip()  # Get RowNum
-        logical_sql_name = row[1].strip().replace(" ", "_")  # Get Logical_SQL_Name and replace spaces with underscores
-        sql_select = row[2].strip()  # Get SQL_Select
+        for row in reader:
+            if len(row) < 3:
+                continue  # Skip if the row doesn't have enough columns
 
-        # Define the SQL file name
-        file_name = f"{row_num}_{logical_sql_name}.sql"
-        file_path = os.path.join(output_dir, file_name)
+            row_num = row[0].strip()  # Get RowNum
+            logical_sql_name = row[1].strip().replace(" ", "_")  # Get Logical_SQL_Name and replace spaces with underscores
+            sql_select = row[2].strip()  # Get SQL_Select
 
-        # Write the SQL statement to a file
+            yield f"{row_num}_{logical_sql_name}.sql", sql_select
+
+
+def content_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def shard_prefix(file_name, shard_depth):
+    """
+    Returns the hash-prefix subdirectory for a file, e.g. "3f/a2" for shard_depth=2,
+    so no single directory has to hold every file.
+    """
+    if shard_depth <= 0:
+        return ""
+    digest = hashlib.md5(file_name.encode("utf-8")).hexdigest()
+    return os.path.join(*(digest[i * 2:i * 2 + 2] for i in range(shard_depth)))
+
+
+def load_manifest(path):
+    """
+    Reads a tab-separated name -> content hash manifest from a previous run.
+    """
+    manifest = {}
+    try:
+        with open(path, mode="r", encoding="utf-8") as f:
+            for line in f:
+                name, _, digest = line.rstrip("\n").partition("\t")
+                manifest[name] = digest
+    except FileNotFoundError:
+        pass
+    return manifest
+
+
+def save_manifest(path, manifest):
+    with open(path + ".tmp", mode="w", encoding="utf-8") as f:
+        for name, digest in manifest.items():
+            f.write(f"{name}\t{digest}\n")
+    os.replace(path + ".tmp", path)
+
+
+def write_batch(batch):
+    for file_path, sql_select in batch:
         with open(file_path, mode="w", encoding="utf-8") as sql_file:
             sql_file.write(sql_select)
+    return len(batch)
+
+
+def write_files(rows, output_dir, workers=DEFAULT_WORKERS, shard_depth=0, incremental=True,
+                batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Writes each SQL statement to its own file using a thread pool. Files are handed to
+    the pool in batches to keep per-task overhead low, and at most ``2 * workers`` batches
+    are queued at a time.
+    :param rows: Iterable of (file_name, sql_select) tuples.
+    :param output_dir: Directory to store the SQL files.
+    :param workers: Number of writer threads.
+    :param shard_depth: Number of hash-prefix directory levels (0 writes a flat directory).
+    :param incremental: Skip files whose content hash matches the previous run's manifest.
+    :param batch_size: Number of files per writer task.
+    :return: Tuple (written, skipped).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path) if incremental else {}
+    manifest = {}
+    created_dirs = set()
+    skipped = 0
+
+    def pending_writes():
+        nonlocal skipped
+        for file_name, sql_select in rows:
+            relative_path = os.path.join(shard_prefix(file_name, shard_depth), file_name)
+            file_path = os.path.join(output_dir, relative_path)
+            digest = content_hash(sql_select)
+            manifest[relative_path] = digest
+            if previous.get(relative_path) == digest and os.path.exists(file_path):
+                skipped += 1
+                continue
+            directory = os.path.dirname(file_path)
+            if directory not in created_dirs:
+                os.makedirs(directory, exist_ok=True)
+                created_dirs.add(directory)
+            yield file_path, sql_select
+
+    written = 0
+    writes = pending_writes()
+    batches = iter(lambda: list(itertools.islice(writes, batch_size)), [])
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for batch in batches:
+            in_flight.append(executor.submit(write_batch, batch))
+            if len(in_flight) >= 2 * workers:
+                written += in_flight.popleft().result()
+        for future in in_flight:
+            written += future.result()
+
+    save_manifest(manifest_path, manifest)
+    return written, skipped
+
+
+def index_path_for(archive_path):
+    return archive_path + ".idx"
+
+
+def load_archive_index(archive_path):
+    """
+    Reads the offset index written next to a tar archive.
+    :return: Dictionary file_name -> (data_offset, size, content_hash).
+    """
+    index = {}
+    try:
+        with open(index_path_for(archive_path), mode="r", encoding="utf-8") as f:
+            for line in f:
+                name, offset, size, digest = line.rstrip("\n").split("\t")
+                index[name] = (int(offset), int(size), digest)
+    except FileNotFoundError:
+        pass
+    return index
+
+
+def write_archive(rows, archive_path, incremental=True):
+    """
+    Writes every SQL statement into one uncompressed tar archive plus an offset index
+    (``<archive>.idx``: name, data offset, size, content hash). Incremental runs append
+    only new or changed statements; the index always points at the latest copy.
+    :param rows: Iterable of (file_name, sql_select) tuples.
+    :param archive_path: Path of the .tar archive.
+    :param incremental: Append to an existing archive, skipping unchanged statements.
+    :return: Tuple (written, skipped).
+    """
+    exists = os.path.exists(archive_path)
+    previous = load_archive_index(archive_path) if incremental and exists else {}
+    index = {}
+    written = skipped = 0
+
+    with tarfile.open(archive_path, mode="a" if incremental and exists else "w") as archive:
+        for file_name, sql_select in rows:
+            digest = content_hash(sql_select)
+            if previous.get(file_name, (None, None, None))[2] == digest:
+                index[file_name] = previous[file_name]
+                skipped += 1
+                continue
+            data = sql_select.encode("utf-8")
+            info = tarfile.TarInfo(file_name)
+            info.size = len(data)
+            # addfile() does not record where the data lands; it follows the header block
+            data_offset = archive.offset + len(info.tobuf(archive.format, archive.encoding, archive.errors))
+            archive.addfile(info, io.BytesIO(data))
+            index[file_name] = (data_offset, info.size, digest)
+            written += 1
+
+    with open(index_path_for(archive_path) + ".tmp", mode="w", encoding="utf-8") as f:
+        for name, (offset, size, digest) in index.items():
+            f.write(f"{name}\t{offset}\t{size}\t{digest}\n")
+    os.replace(index_path_for(archive_path) + ".tmp", index_path_for(archive_path))
+    return written, skipped
+
+
+def read_archived_sql(archive_path, file_name, index=None):
+    """
+    Reads one statement from an archive by seeking straight to its indexed offset.
+    :param archive_path: Path of the .tar archive.
+    :param file_name: Name of the SQL file inside the archive.
+    :param index: Optional index from load_archive_index(), to avoid reloading it.
+    :return: The SQL text.
+    """
+    index = index if index is not None else load_archive_index(archive_path)
+    offset, size, _ = index[file_name]
+    with open(archive_path, mode="rb") as f:
+        f.seek(offset)
+        return f.read(size).decode("utf-8")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Split a CSV of SQL statements into one .sql file per row.")
+    parser.add_argument('csv_file', nargs='?', default="your_file.csv",
+                        help='Input CSV with RowNum, Logical_SQL_Name and SQL_Select columns')
+    parser.add_argument('output_dir', nargs='?', default="sql_files",
+                        help='Directory to store the SQL files')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Number of writer threads (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--shard-depth', type=int, default=0,
+                        help='Spread files over N levels of hash-prefix subdirectories (default: 0, flat)')
+    parser.add_argument('--archive',
+                        help='Write all statements into this tar archive with an offset index instead of files')
+    parser.add_argument('--full', action='store_true',
+                        help='Rewrite everything instead of skipping statements unchanged since the last run')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = iter_sql_rows(args.csv_file)
+    if args.archive:
+        written, skipped = write_archive(rows, args.archive, incremental=not args.full)
+        print(f"SQL statements have been successfully written to the '{args.archive}' archive "
+              f"({written} written, {skipped} unchanged).")
+    else:
+        written, skipped = write_files(rows, args.output_dir, workers=args.workers,
+                                       shard_depth=args.shard_depth, incremental=not args.full)
+        print(f"SQL files have been successfully created in the '{args.output_dir}' directory "
+              f"({written} written, {skipped} unchanged).")
+
 
-print(f"SQL files have been successfully created in the '{output_dir}' directory.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+import datetime
+import math
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.pivot.cache import CacheDefinition, CacheField, CacheSource, SharedItems, WorksheetSource
+from openpyxl.pivot.fields import Boolean, DateTimeField, Index, Missing, Number, Text
+from openpyxl.pivot.record import RecordList
+from openpyxl.pivot.table import (DataField, FieldItem, Location, PivotField, PivotTableStyle, RowColField,
+                                  RowColItem, TableDefinition)
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.xml.constants import SHEET_MAIN_NS
+
+from excel_stream import DEFAULT_CHUNK_ROWS, append_rows, iter_sheet_rows
+
+# Excel subtotal name -> (pandas aggregation, caption prefix)
+AGGREGATIONS = {
+    "sum": ("sum", "Sum"),
+    "count": ("count", "Count"),
+    "average": ("mean", "Average"),
+    "max": ("max", "Max"),
+    "min": ("min", "Min"),
+}
+BLANK_LABEL = "(blank)"
+GRAND_TOTAL_LABEL = "Grand Total"
+VALUES_FIELD = -2  # Excel's field index for the "Values" pseudo-field
+RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+# StreamedRecords overrides RecordList._write, which openpyxl calls but does not document,
+# so the pivot cache is only written with the openpyxl releases it was verified against
+SUPPORTED_OPENPYXL = ("3.1.",)
+
+
+def check_openpyxl():
+    if not openpyxl.__version__.startswith(SUPPORTED_OPENPYXL):
+        raise RuntimeError(f"write_pivot_workbook supports openpyxl {', '.join(v + 'x' for v in SUPPORTED_OPENPYXL)}, "
+                           f"not {openpyxl.__version__}")
+
+
+def normalize_values(values):
+    """
+    Normalizes value specs into (field, subtotal, caption) tuples. A spec is a column
+    name (summed), a (field, aggfunc) pair or a (field, aggfunc, caption) triple.
+    """
+    specs = []
+    for spec in values:
+        if isinstance(spec, str):
+            spec = (spec, "sum")
+        field, aggfunc, *caption = spec
+        aggfunc = "average" if aggfunc == "mean" else aggfunc
+        if aggfunc not in AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation '{aggfunc}', expected one of {list(AGGREGATIONS)}")
+        specs.append((field, aggfunc, caption[0] if caption else f"{AGGREGATIONS[aggfunc][1]} of {field}"))
+    return specs
+
+
+def factorize(series):
+    """
+    Maps a column to sorted unique items and one integer code per row. Missing values
+    get the code after the last item, matching where Excel keeps its (blank) item.
+    :return: Tuple (codes, items, has_missing).
+    """
+    try:
+        codes, uniques = pd.factorize(series, sort=True)
+    except TypeError:
+        # Mixed types that cannot be ordered keep their first-seen order
+        codes, uniques = pd.factorize(series, sort=False)
+    items = list(uniques.to_pydatetime()) if isinstance(uniques, pd.DatetimeIndex) else uniques.tolist()
+    has_missing = bool((codes < 0).any())
+    if has_missing:
+        codes = np.where(codes < 0, len(items), codes)
+    return codes, items, has_missing
+
+
+def shared_items(items, has_missing):
+    """
+    Builds the <sharedItems> element for a field stored by index, with the type flags
+    Excel expects to match the items.
+    """
+    parts, numbers, dates = [], [], []
+    has_string = has_bool = False
+    for item in items:
+        if isinstance(item, bool):
+            parts.append(Boolean(v=item))
+            has_bool = True
+        elif isinstance(item, (int, float)):
+            parts.append(Number(v=item))
+            numbers.append(item)
+        elif isinstance(item, datetime.date):
+            if not isinstance(item, datetime.datetime):
+                item = datetime.datetime.combine(item, datetime.time())
+            parts.append(DateTimeField(v=item))
+            dates.append(item)
+        else:
+            parts.append(Text(v=str(item)))
+            has_string = True
+    if has_missing:
+        parts.append(Missing())
+    kinds = has_string + has_bool + bool(numbers) + bool(dates)
+    return SharedItems(
+        _fields=parts,
+        containsSemiMixedTypes=None if has_string or has_missing else False,
+        containsNonDate=None if has_string or has_bool or numbers or not dates else False,
+        containsDate=True if dates else None,
+        containsString=None if has_string else False,
+        containsBlank=True if has_missing else None,
+        containsMixedTypes=True if kinds > 1 else None,
+        containsNumber=True if numbers else None,
+        containsInteger=True if numbers and all(float(n).is_integer() for n in numbers) else None,
+        minValue=min(numbers) if numbers else None,
+        maxValue=max(numbers) if numbers else None,
+        minDate=min(dates) if dates else None,
+        maxDate=max(dates) if dates else None,
+    )
+
+
+class SourceField:
+    """
+    One pivot cache field. Axis and non-numeric columns are stored as indexes into
+    their shared items; other numeric columns are stored inline in each record.
+    """
+
+    def __init__(self, name, series, shared):
+        self.name = name
+        self.shared = shared
+        if shared:
+            self.codes, self.items, has_missing = factorize(series)
+            self.shared_items = shared_items(self.items, has_missing)
+            self.labels = [BLANK_LABEL if i == len(self.items) else item
+                           for i, item in enumerate(self.items + [None] * has_missing)]
+            self._fragments = np.array([f'<x v="{i}"/>' for i in range(len(self.labels))], dtype=object)
+        else:
+            self.values = series.to_numpy(dtype="float64", na_value=np.nan)
+            present = self.values[~np.isnan(self.values)]
+            self.integer = bool(np.all(present == np.floor(present)))
+            self.shared_items = SharedItems(
+                containsSemiMixedTypes=False, containsString=False,
+                containsBlank=True if len(present) < len(self.values) else None,
+                containsNumber=True if len(present) else None,
+                containsInteger=True if len(present) and self.integer else None,
+                minValue=float(present.min()) if len(present) else None,
+                maxValue=float(present.max()) if len(present) else None,
+            )
+
+    def cache_field(self):
+        return CacheField(name=self.name, numFmtId=0, sharedItems=self.shared_items)
+
+    def record_xml(self, start, stop):
+        """
+        Returns the record XML fragment of this field for rows [start, stop).
+        """
+        if self.shared:
+            return self._fragments[self.codes[start:stop]].tolist()
+        if self.integer:
+            return ['<m/>' if math.isnan(v) else f'<n v="{int(v)}"/>' for v in self.values[start:stop].tolist()]
+        return ['<m/>' if math.isnan(v) else f'<n v="{v!r}"/>' for v in self.values[start:stop].tolist()]
+
+
+class StreamedRecords(RecordList):
+    """
+    pivotCacheRecords part written straight into the workbook archive in chunks instead
+    of as one element tree, so the cache can hold millions of records.
+    """
+
+    def __init__(self, fields, row_count, chunk_rows=DEFAULT_CHUNK_ROWS):
+        super().__init__()
+        self.fields = fields
+        self.row_count = row_count
+        self.chunk_rows = chunk_rows
+
+    @property
+    def count(self):
+        return self.row_count
+
+    def _write(self, archive, manifest):
+        with archive.open(self.path[1:], mode="w", force_zip64=True) as f:
+            f.write(f'<pivotCacheRecords xmlns="{SHEET_MAIN_NS}" xmlns:r="{RELATIONSHIPS_NS}" '
+                    f'count="{self.row_count}">'.encode("utf-8"))
+            for start in range(0, self.row_count, self.chunk_rows):
+                stop = min(start + self.chunk_rows, self.row_count)
+                columns = [field.record_xml(start, stop) for field in self.fields]
+                f.write("".join("<r>" + "".join(parts) + "</r>" for parts in zip(*columns)).encode("utf-8"))
+            f.write(b"</pivotCacheRecords>")
+        manifest.append(self)
+
+
+def build_cache(df, axis_fields, data_sheet_name, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Builds a fully populated pivot cache (shared items and records) for a DataFrame
+    written with its header in row 1 of data_sheet_name.
+    :return: Tuple (CacheDefinition, list of SourceField).
+    """
+    fields = []
+    for name in df.columns:
+        series = df[name]
+        inline = (name not in axis_fields and pd.api.types.is_numeric_dtype(series)
+                  and not pd.api.types.is_bool_dtype(series))
+        fields.append(SourceField(str(name), series, shared=not inline))
+
+    ref = f"A1:{get_column_letter(len(fields))}{len(df) + 1}"
+    cache = CacheDefinition(
+        refreshOnLoad=False,
+        recordCount=len(df),
+        createdVersion=6,
+        refreshedVersion=6,
+        minRefreshableVersion=3,
+        cacheSource=CacheSource(type="worksheet", worksheetSource=WorksheetSource(ref=ref, sheet=data_sheet_name)),
+        cacheFields=[field.cache_field() for field in fields],
+    )
+    cache.records = StreamedRecords(fields, len(df), chunk_rows)
+    return cache, fields
+
+
+def index_tuples(index):
+    return [key if isinstance(key, tuple) else (key,) for key in index]
+
+
+def aggregate(df, fields, rows, columns, specs):
+    """
+    Computes every cell of the pivot from the factorized codes with pandas group-bys:
+    leaf cells, row totals, column totals and the grand total.
+    :return: Tuple (row keys, column keys, cell function) where cell(row_key, column_key)
+             returns the list of aggregated values (one per value spec), or None.
+    """
+    by_name = {field.name: field for field in fields}
+    work = {f"r{i}": by_name[name].codes for i, name in enumerate(rows)}
+    work.update({f"c{i}": by_name[name].codes for i, name in enumerate(columns)})
+    work.update({f"v{k}": df[field].to_numpy() for k, (field, _, _) in enumerate(specs)})
+    work = pd.DataFrame(work)
+    agg = {f"v{k}": AGGREGATIONS[aggfunc][0] for k, (_, aggfunc, _) in enumerate(specs)}
+    row_keys = [f"r{i}" for i in range(len(rows))]
+    column_keys = [f"c{i}" for i in range(len(columns))]
+
+    def grouped(keys):
+        if not keys:
+            return {(): work.agg(agg).tolist()}
+        result = work.groupby(keys, sort=True).agg(agg)
+        return dict(zip(index_tuples(result.index), result.to_numpy().tolist()))
+
+    by_row = grouped(row_keys)
+    by_column = grouped(column_keys)
+    leaves = grouped(row_keys + column_keys) if rows and columns else None
+    grand = grouped([])[()]
+
+    def cell(row_key, column_key):
+        if row_key is None and column_key is None:
+            return grand
+        if column_key is None or not columns:
+            return by_row[row_key] if row_key is not None else grand
+        if row_key is None or not rows:
+            return by_column[column_key]
+        return leaves.get(row_key + column_key)
+
+    return list(by_row), list(by_column), cell
+
+
+def repeated_prefix(key, previous):
+    """
+    Number of leading levels a pivot row/column item shares with the previous one
+    (the <i r="..."> attribute); the shared labels are not repeated on the sheet.
+    """
+    if previous is None:
+        return 0
+    count = 0
+    for current, before in zip(key, previous):
+        if current != before:
+            break
+        count += 1
+    return count
+
+
+def clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def write_pivot_workbook(df, file_name, rows, values, columns=(), data_sheet_name="DataSource",
+                         pivot_sheet_name="PivotTable", pivot_name="PivotTable1", style="PivotStyleMedium9",
+                         chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Writes a DataFrame and a native Excel pivot table over it. The aggregates are computed
+    up front and saved in the pivot cache and on the pivot sheet, so Excel opens the
+    workbook with the pivot already rendered instead of recomputing it from the raw rows.
+    Both sheets and the cache records are streamed, so memory stays flat for large sources.
+
+    Parameters:
+    df (pandas.DataFrame): The source data
+    file_name (str): Name of the Excel file (e.g., 'output.xlsx')
+    rows (list): Column names used as pivot row fields, outermost first
+    values (list): Value fields: column names (summed), (column, aggfunc) or (column, aggfunc, caption),
+                   where aggfunc is one of sum, count, average, max, min
+    columns (list): Column names used as pivot column fields
+    data_sheet_name (str): Name of the sheet holding the source rows
+    pivot_sheet_name (str): Name of the sheet holding the pivot table
+    pivot_name (str): Name of the pivot table
+    style (str): Built-in pivot table style name
+    chunk_rows (int): Rows converted per chunk while streaming the source and cache records
+    """
+    check_openpyxl()
+    rows, columns, specs = list(rows), list(columns), normalize_values(values)
+    if not rows and not columns:
+        raise ValueError("A pivot table needs at least one row or column field")
+    if not specs:
+        raise ValueError("A pivot table needs at least one value field")
+    missing = [name for name in rows + columns + [field for field, _, _ in specs] if name not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found in the DataFrame: {missing}")
+
+    cache, fields = build_cache(df, set(rows) | set(columns), data_sheet_name, chunk_rows)
+    position = {field.name: i for i, field in enumerate(fields)}
+    by_name = {field.name: field for field in fields}
+    row_keys, column_keys, cell = aggregate(df, fields, rows, columns, specs)
+    multiple_values = len(specs) > 1
+
+    # Column layout: one entry per rendered data column
+    col_fields = [position[name] for name in columns] + ([VALUES_FIELD] if multiple_values else [])
+    data_columns = []
+    if columns:
+        data_columns += [(key, k) for key in column_keys for k in range(len(specs))]
+        data_columns += [(None, k) for k in range(len(specs))]
+    else:
+        data_columns += [((), k) for k in range(len(specs))]
+
+    label_width = max(len(rows), 1)
+    header_rows = len(col_fields) + 1 if col_fields else 1
+    top = 3  # leave room above the pivot, as Excel does for report filters
+    width = label_width + len(data_columns)
+    height = header_rows + len(row_keys) + (1 if rows else 0)
+
+    # Header rows
+    header = [[None] * width for _ in range(header_rows)]
+    if col_fields:
+        header[0][0] = specs[0][2] if not multiple_values else None
+        for j, field_index in enumerate(col_fields):
+            header[0][label_width + j] = "Values" if field_index == VALUES_FIELD else fields[field_index].name
+        previous = None
+        for offset, (key, k) in enumerate(data_columns):
+            column = label_width + offset
+            if key is None:
+                header[1][column] = GRAND_TOTAL_LABEL if not multiple_values else f"Total {specs[k][2]}"
+                continue
+            labels = [by_name[name].labels[code] for name, code in zip(columns, key)]
+            if multiple_values:
+                labels.append(specs[k][2])
+            current = tuple(key) + ((k,) if multiple_values else ())
+            for level in range(repeated_prefix(current, previous), len(labels)):
+                header[1 + level][column] = labels[level]
+            previous = current
+    else:
+        header[0][label_width] = specs[0][2]
+    for i, name in enumerate(rows):
+        header[-1][i] = name
+
+    # Data rows and the grand total row
+    body = []
+    previous = None
+    for key in row_keys:
+        line = [None] * width
+        if rows:
+            for level in range(repeated_prefix(key, previous), len(rows)):
+                line[level] = by_name[rows[level]].labels[key[level]]
+        else:
+            line[0] = specs[0][2] if not multiple_values else "Values"
+        for offset, (column_key, k) in enumerate(data_columns):
+            result = cell(key if rows else None, column_key)
+            line[label_width + offset] = clean(result[k]) if result is not None else None
+        body.append(line)
+        previous = key
+    if rows:
+        line = [GRAND_TOTAL_LABEL] + [None] * (width - 1)
+        for offset, (column_key, k) in enumerate(data_columns):
+            line[label_width + offset] = clean(cell(None, column_key)[k])
+        body.append(line)
+
+    # Pivot table definition
+    pivot_fields = []
+    for i, field in enumerate(fields):
+        axis = "axisRow" if field.name in rows else "axisCol" if field.name in columns else None
+        pivot_fields.append(PivotField(
+            axis=axis,
+            dataField=True if any(field.name == name for name, _, _ in specs) else None,
+            items=[FieldItem(x=x) for x in range(len(field.labels))] if axis else (),
+            showAll=False, compact=False, outline=False, defaultSubtotal=False if axis else None,
+        ))
+
+    row_items, previous = [], None
+    for key in row_keys:
+        repeated = repeated_prefix(key, previous)
+        row_items.append(RowColItem(r=repeated, x=[Index(v=code) for code in key[repeated:]]))
+        previous = key
+    if rows:
+        row_items.append(RowColItem(t="grand", x=[Index(v=0)]))
+
+    col_items, previous = [], None
+    if col_fields:
+        for key, k in data_columns:
+            if key is None:
+                col_items.append(RowColItem(t="grand", i=k, x=[Index(v=0)]))
+                continue
+            current = tuple(key) + ((k,) if multiple_values else ())
+            repeated = repeated_prefix(current, previous)
+            col_items.append(RowColItem(r=repeated, i=k, x=[Index(v=code) for code in current[repeated:]]))
+            previous = current
+    else:
+        col_items.append(RowColItem())
+
+    ref = f"A{top}:{get_column_letter(width)}{top + height - 1}"
+    pivot = TableDefinition(
+        name=pivot_name,
+        cacheId=1,
+        dataCaption="Values",
+        updatedVersion=6,
+        createdVersion=6,
+        minRefreshableVersion=3,
+        applyNumberFormats=False,
+        applyBorderFormats=False,
+        applyFontFormats=False,
+        applyPatternFormats=False,
+        applyAlignmentFormats=False,
+        applyWidthHeightFormats=True,
+        itemPrintTitles=True,
+        indent=0,
+        compact=False,
+        compactData=False,
+        outline=False,
+        outlineData=False,
+        gridDropZones=False,
+        location=Location(ref=ref, firstHeaderRow=1, firstDataRow=header_rows if col_fields else 1,
+                          firstDataCol=label_width),
+        pivotFields=pivot_fields,
+        rowFields=[RowColField(x=position[name]) for name in rows],
+        rowItems=row_items,
+        colFields=[RowColField(x=x) for x in col_fields],
+        colItems=col_items,
+        dataFields=[DataField(name=caption, fld=position[field], subtotal=aggfunc, baseField=0, baseItem=0)
+                    for field, aggfunc, caption in specs],
+        pivotTableStyleInfo=PivotTableStyle(name=style, showRowHeaders=True, showColHeaders=True,
+                                            showRowStripes=False, showColStripes=False, showLastColumn=True),
+    )
+    pivot.cache = cache
+
+    workbook = Workbook(write_only=True)
+    data_sheet = workbook.create_sheet(title=data_sheet_name)
+    append_rows(data_sheet, iter_sheet_rows(df, chunk_rows))
+    pivot_sheet = workbook.create_sheet(title=pivot_sheet_name)
+    for _ in range(top - 1):
+        pivot_sheet.append([])
+    append_rows(pivot_sheet, header + body)
+    # Write-only sheets borrow Worksheet methods (add_table, add_chart, ...) but not
+    # add_pivot, so it is called the same way
+    Worksheet.add_pivot(pivot_sheet, pivot)
+    workbook.save(file_name)
@@ -0,0 +1,199 @@
+import datetime
+import os
+
+import pandas as pd
+
+BACKENDS = ("openpyxl", "xlsxwriter")
+DEFAULT_CHUNK_ROWS = 50000
+# Same number formats pd.ExcelWriter applies to date and datetime cells
+DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+DATE_FORMAT = "YYYY-MM-DD"
+# File suffixes read with pyarrow instead of pandas' CSV reader
+COLUMNAR_FORMATS = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+
+def columnar_format(source):
+    """
+    :return: "parquet" or "arrow" when source is a path to such a file, else None.
+    """
+    if not isinstance(source, str):
+        return None
+    return COLUMNAR_FORMATS.get(os.path.splitext(source)[1].lower())
+
+
+def import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet or Arrow files requires the pyarrow package") from e
+    return pa, pq
+
+
+def open_columnar(path, columns=None):
+    """
+    Opens a Parquet or Arrow IPC (Feather v2) file as a pyarrow Table. Both are
+    memory-mapped; uncompressed Arrow buffers are used in place without copying.
+    """
+    pa, pq = import_pyarrow()
+    if columnar_format(path) == "parquet":
+        return pq.read_table(path, columns=columns, memory_map=True)
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return table if columns is None else table.select(columns)
+
+
+def iter_columnar_frames(source, chunk_rows=DEFAULT_CHUNK_ROWS, columns=None):
+    """
+    Yields DataFrame chunks of a pyarrow Table or of a Parquet/Arrow file, converting
+    one record batch at a time so the whole table is never a DataFrame at once.
+    """
+    if columnar_format(source) == "parquet":
+        _, pq = import_pyarrow()
+        parquet_file = pq.ParquetFile(source, memory_map=True)
+        batches = parquet_file.iter_batches(batch_size=chunk_rows, columns=columns)
+        schema = parquet_file.schema_arrow
+    else:
+        table = open_columnar(source, columns) if isinstance(source, str) else \
+            source if columns is None else source.select(columns)
+        batches = table.to_batches(max_chunksize=chunk_rows)
+        schema = table.schema
+    empty = True
+    for batch in batches:
+        empty = False
+        yield batch.to_pandas()
+    if empty:
+        # Keep the header of empty inputs, like an empty DataFrame
+        yield schema.empty_table().to_pandas()
+
+
+def as_frame(source):
+    """
+    Returns source as a DataFrame: DataFrames pass through, pyarrow Tables and
+    Parquet/Arrow file paths are converted.
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+    if columnar_format(source):
+        source = open_columnar(source)
+    if hasattr(source, "to_pandas"):
+        return source.to_pandas()
+    raise TypeError(f"Expected a DataFrame, pyarrow Table or Parquet/Arrow path, got {type(source).__name__}")
+
+
+def iter_frames(source, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Yields DataFrame chunks from a DataFrame, a pyarrow Table, a Parquet or Arrow file
+    path, or an iterable of DataFrames (e.g. pd.read_csv(..., chunksize=N)).
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, max(len(source), 1), chunk_rows):
+            yield source.iloc[start:start + chunk_rows]
+    elif columnar_format(source) or hasattr(source, "to_batches"):
+        yield from iter_columnar_frames(source, chunk_rows)
+    else:
+        yield from source
+
+
+def iter_sheet_rows(source, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Converts a DataFrame (or DataFrame chunks) into plain Python rows, header first,
+    the way df.to_excel(index=False) would write them: missing values become empty cells.
+    Only one chunk is materialized at a time.
+    :return: Generator of row lists.
+    """
+    header_written = False
+    for frame in iter_frames(source, chunk_rows):
+        if not header_written:
+            yield [str(column) for column in frame.columns]
+            header_written = True
+        values = frame.astype(object).where(frame.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            yield list(row)
+
+
+def append_rows(worksheet, rows):
+    """
+    Appends rows to an openpyxl write_only worksheet, giving date and datetime values
+    the same number formats pd.ExcelWriter uses.
+    """
+    from openpyxl.cell import WriteOnlyCell
+
+    for row in rows:
+        for i, value in enumerate(row):
+            if isinstance(value, datetime.date):
+                cell = WriteOnlyCell(worksheet, value=value)
+                cell.number_format = DATETIME_FORMAT if isinstance(value, datetime.datetime) else DATE_FORMAT
+                row[i] = cell
+        worksheet.append(row)
+
+
+def write_openpyxl(file_name, sheets, chunk_rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, source in sheets:
+        worksheet = workbook.create_sheet(title=sheet_name)
+        append_rows(worksheet, iter_sheet_rows(source, chunk_rows))
+    workbook.save(file_name)
+
+
+def write_xlsxwriter(file_name, sheets, chunk_rows):
+    try:
+        import xlsxwriter
+    except ImportError as e:
+        raise ImportError("The xlsxwriter backend requires the xlsxwriter package") from e
+
+    workbook = xlsxwriter.Workbook(file_name, {"constant_memory": True})
+    datetime_format = workbook.add_format({"num_format": DATETIME_FORMAT})
+    date_format = workbook.add_format({"num_format": DATE_FORMAT})
+    try:
+        for sheet_name, source in sheets:
+            worksheet = workbook.add_worksheet(sheet_name)
+            for row_number, row in enumerate(iter_sheet_rows(source, chunk_rows)):
+                for column_number, value in enumerate(row):
+                    if value is None:
+                        continue
+                    if isinstance(value, datetime.datetime):
+                        worksheet.write_datetime(row_number, column_number, value, datetime_format)
+                    elif isinstance(value, datetime.date):
+                        worksheet.write_datetime(row_number, column_number, value, date_format)
+                    else:
+                        worksheet.write(row_number, column_number, value)
+    finally:
+        workbook.close()
+
+
+def write_sheets_streaming(file_name, sheets, backend="openpyxl", chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Writes several sheets to one workbook without building the workbook in memory.
+    Rows are streamed to disk as they are produced (openpyxl write_only workbook, or
+    xlsxwriter in constant_memory mode), so memory stays flat as the row count grows.
+    The sheets contain the same values as df.to_excel(writer, sheet_name, index=False).
+
+    Parameters:
+    file_name (str): Name of the Excel file (e.g., 'output.xlsx')
+    sheets (list): (sheet_name, source) pairs in workbook order, where source is a
+                   DataFrame or an iterable of DataFrame chunks
+    backend (str): "openpyxl" or "xlsxwriter"
+    chunk_rows (int): Rows converted per chunk when a source is a single DataFrame
+    """
+    if backend == "openpyxl":
+        write_openpyxl(file_name, sheets, chunk_rows)
+    elif backend == "xlsxwriter":
+        write_xlsxwriter(file_name, sheets, chunk_rows)
+    else:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+
+def write_df_to_excel_streaming(source, file_name, sheet_name, backend="openpyxl", chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Streaming equivalent of write_df_to_excel for a single sheet.
+
+    Parameters:
+    source (pandas.DataFrame or iterable): The DataFrame, or DataFrame chunks, to write
+    file_name (str): Name of the Excel file (e.g., 'output.xlsx')
+    sheet_name (str): Name of the worksheet
+    backend (str): "openpyxl" or "xlsxwriter"
+    chunk_rows (int): Rows converted per chunk when source is a single DataFrame
+    """
+    write_sheets_streaming(file_name, [(sheet_name, source)], backend=backend, chunk_rows=chunk_rows)
@@ -3,6 +3,8 @@ from openpyxl import Workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 import uuid
 
+from chunked_pivot import chunked_pivot_table
+
 # Sample DataFrame
 data = {
     'Region': ['North', 'South', 'East', 'West', 'North', 'South', 'East', 'West'],
@@ -20,11 +22,14 @@ writer = pd.ExcelWriter(excel_file, engine='openpyxl')
 df.to_excel(writer, sheet_name='RawData', index=False)
 
 # Create pivot table
-pivot_df = df.pivot_table(values='Sales', 
-                         index='Region', 
-                         columns=['Year', 'Product'], 
-                         aggfunc='sum', 
-                         fill_value=0)
+# (chunked_pivot_table returns the same table as df.pivot_table, but also accepts a
+# CSV/Parquet path or DataFrame chunks and aggregates them without loading every row)
+pivot_df = chunked_pivot_table(df,
+                               values='Sales',
+                               index='Region',
+                               columns=['Year', 'Product'],
+                               aggfunc='sum',
+                               fill_value=0)
 
 # Write pivot table to new sheet
 pivot_df.to_excel(writer, sheet_name='PivotTable')
@@ -0,0 +1,351 @@
+import collections
+import contextlib
+import heapq
+import json
+import sys
+import threading
+import time
+
+DEFAULT_SLOWEST = 10
+DEFAULT_DIAGNOSTIC_LIMIT = 5
+DEFAULT_SAMPLE_INTERVAL = 0.005
+PROFILERS = ("cprofile", "sample")
+# Returned by stage() while no Instrumentation is active; nullcontext is reusable
+NULL_STAGE = contextlib.nullcontext()
+_END = object()
+
+_active = None
+
+
+class Diagnostics:
+    """
+    Structured, rate-limited parser diagnostics. Every event is counted by kind; only
+    the first ``limit`` of each kind are printed (to stderr) and kept as samples, so a
+    token the parser does not understand cannot flood the output of a large run.
+    """
+
+    def __init__(self, limit=DEFAULT_DIAGNOSTIC_LIMIT, stream=None, echo=True):
+        """
+        :param limit: Events printed and kept per kind (0 keeps counts only).
+        :param stream: Where printed events go (default: sys.stderr at print time).
+        :param echo: Print events; worker processes only collect them for merge().
+        """
+        self.limit = limit
+        self.stream = stream
+        self.echo = echo
+        self.counts = collections.Counter()
+        self.samples = collections.defaultdict(list)
+
+    def report(self, kind, message, **fields):
+        self.counts[kind] += 1
+        count = self.counts[kind]
+        if count <= self.limit:
+            self.samples[kind].append({"message": message, **fields})
+            if self.echo:
+                print(message, file=self.stream or sys.stderr)
+                if count == self.limit:
+                    print(f"Further '{kind}' diagnostics are counted but not printed", file=self.stream or sys.stderr)
+
+    def summary(self):
+        return {kind: {"count": count, "samples": self.samples[kind]} for kind, count in self.counts.items()}
+
+    def merge(self, summary):
+        """
+        Adds events collected elsewhere, e.g. in a worker process, from their summary().
+        Samples are reported (and printed) within this collector's limit; events beyond
+        the samples are only counted.
+        """
+        for kind, entry in summary.items():
+            for sample in entry["samples"]:
+                self.report(kind, **sample)
+            self.counts[kind] += entry["count"] - len(entry["samples"])
+
+
+# Used when no Instrumentation is active, e.g. when the parsers are called directly
+_default_diagnostics = Diagnostics()
+
+
+class SamplingProfiler:
+    """
+    Low-overhead statistical profiler: a background thread samples the stack of the
+    profiled thread every ``interval`` seconds and counts, per function, how often it
+    was running (self) or on the stack (total).
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = collections.Counter()
+        self.total_counts = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.self_counts[frame_label(frame)] += 1
+            seen = set()
+            while frame is not None:
+                label = frame_label(frame)
+                if label not in seen:
+                    seen.add(label)
+                    self.total_counts[label] += 1
+                frame = frame.f_back
+
+    def summary(self, limit):
+        def share(counter):
+            return [{"function": label, "samples": count, "share": round(count / max(self.samples, 1), 4)}
+                    for label, count in counter.most_common(limit)]
+        return {"interval": self.interval, "samples": self.samples,
+                "self": share(self.self_counts), "total": share(self.total_counts)}
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+
+
+class Instrumentation:
+    """
+    Collects per-stage timers, counters, the slowest statements and diagnostics for one
+    lineage run, with optional cProfile or sampling-profiler capture. While active
+    (see activate), the module-level stage() and diagnostic() helpers record into it.
+
+    Stage times are inclusive: a stage entered inside another (e.g. sqlparse inside a
+    derived table's extract_tables) counts towards both. With a process pool, each
+    worker batch runs under its own Instrumentation, whose stage times and diagnostics
+    are merged back with partial() and merge(); stage times are then summed over all
+    processes. The profilers only cover this process.
+    """
+
+    def __init__(self, slowest=DEFAULT_SLOWEST, profile=None, profile_path=None,
+                 diagnostic_limit=DEFAULT_DIAGNOSTIC_LIMIT, sample_interval=DEFAULT_SAMPLE_INTERVAL,
+                 echo_diagnostics=True):
+        """
+        :param slowest: Number of slowest statements to keep.
+        :param profile: None, "cprofile" or "sample".
+        :param profile_path: Where cProfile stats are dumped (readable with pstats/snakeviz).
+        :param diagnostic_limit: Diagnostics printed and kept per kind.
+        :param sample_interval: Seconds between samples of the sampling profiler.
+        :param echo_diagnostics: Print diagnostics as they are reported.
+        """
+        if profile not in (None,) + PROFILERS:
+            raise ValueError(f"Unknown profiler '{profile}', expected one of {PROFILERS}")
+        self.slowest = slowest
+        self.profile = profile
+        self.profile_path = profile_path
+        self.sample_interval = sample_interval
+        self.stages = collections.defaultdict(lambda: [0.0, 0])
+        self.counters = collections.Counter()
+        self.diagnostics = Diagnostics(diagnostic_limit, echo=echo_diagnostics)
+        self._slowest = []
+        self._sequence = 0
+        self._profiler = None
+        self._started = None
+        self.elapsed = 0.0
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        totals = self.stages[name]
+        totals[0] += seconds
+        totals[1] += calls
+
+    def timed_iter(self, name, iterable):
+        """
+        Yields from iterable, charging the time spent producing each item to a stage.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def partial(self):
+        """
+        :return: Picklable stage timings and diagnostics, for merge() in another process.
+        """
+        return {"stages": {name: tuple(totals) for name, totals in self.stages.items()},
+                "diagnostics": self.diagnostics.summary()}
+
+    def merge(self, partial):
+        for name, (seconds, calls) in partial["stages"].items():
+            self.add_time(name, seconds, calls)
+        self.diagnostics.merge(partial["diagnostics"])
+
+    def record_statement(self, logical_name, seconds, columns=None):
+        """
+        Keeps the ``slowest`` statements seen so far in a min-heap.
+        """
+        if self.slowest <= 0:
+            return
+        self._sequence += 1
+        entry = (seconds, self._sequence, logical_name, columns)
+        if len(self._slowest) < self.slowest:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.profile == "cprofile":
+            # Profiling modules are imported only when a profile is requested
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "sample":
+            self._profiler = SamplingProfiler(self.sample_interval)
+            self._profiler.start()
+
+    def stop(self):
+        if self._profiler is not None:
+            if self.profile == "cprofile":
+                self._profiler.disable()
+            else:
+                self._profiler.stop()
+        if self._started is not None:
+            self.elapsed += time.perf_counter() - self._started
+            self._started = None
+
+    def profile_summary(self, limit=25):
+        if self._profiler is None:
+            return None
+        if self.profile == "sample":
+            return self._profiler.summary(limit)
+        if self.profile_path:
+            self._profiler.dump_stats(self.profile_path)
+        import io
+        import pstats
+        output = io.StringIO()
+        pstats.Stats(self._profiler, stream=output).sort_stats("cumulative").print_stats(limit)
+        return {"path": self.profile_path, "top": output.getvalue()}
+
+    def report(self):
+        """
+        :return: JSON-serializable dictionary of everything collected.
+        """
+        slowest = sorted(self._slowest, key=lambda entry: (-entry[0], entry[1]))
+        report = {
+            "elapsed": self.elapsed,
+            "stages": {name: {"seconds": seconds, "calls": calls, "mean": seconds / calls if calls else 0.0}
+                       for name, (seconds, calls) in sorted(self.stages.items(), key=lambda item: -item[1][0])},
+            "counters": dict(self.counters),
+            "slowest_statements": [{"logical_name": logical_name, "seconds": seconds, "columns": columns}
+                                   for seconds, _, logical_name, columns in slowest],
+            "diagnostics": self.diagnostics.summary(),
+        }
+        profile = self.profile_summary()
+        if profile is not None:
+            report["profile"] = profile
+        return report
+
+    def publish(self, report_path=None, callback=None):
+        """
+        Writes the report as JSON and/or hands it to a metrics callback.
+        :return: The report dictionary.
+        """
+        report = self.report()
+        if report_path:
+            with open(report_path, mode="w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        if callback is not None:
+            callback(report)
+        return report
+
+
+@contextlib.contextmanager
+def activate(instrumentation):
+    """
+    Makes an Instrumentation the target of stage() and diagnostic() and runs its
+    profiler for the duration of the block. None is accepted and does nothing.
+    """
+    global _active
+    if instrumentation is None:
+        yield None
+        return
+    previous, _active = _active, instrumentation
+    instrumentation.start()
+    try:
+        yield instrumentation
+    finally:
+        instrumentation.stop()
+        _active = previous
+
+
+def stage(name):
+    """
+    Times a block as part of the named stage of the active Instrumentation; a shared
+    no-op context when none is active.
+    """
+    return _active.stage(name) if _active is not None else NULL_STAGE
+
+
+def diagnostic(kind, message, **fields):
+    """
+    Reports a parser diagnostic to the active Instrumentation, or to a process-wide
+    rate-limited fallback when none is active.
+    """
+    (_active.diagnostics if _active is not None else _default_diagnostics).report(kind, message, **fields)
+
+
+def format_report(report, limit=10):
+    """
+    Renders the main parts of a report as text, for runs without a --report file.
+    """
+    lines = [f"Run took {report['elapsed']:.2f} s"]
+    for name, stage_totals in list(report["stages"].items())[:limit]:
+        lines.append(f"  {name}: {stage_totals['seconds']:.3f} s in {stage_totals['calls']} calls")
+    for entry in report["slowest_statements"][:limit]:
+        lines.append(f"  slow: {entry['logical_name']} {entry['seconds'] * 1000:.1f} ms")
+    for kind, entry in report["diagnostics"].items():
+        lines.append(f"  diagnostics: {entry['count']} x {kind}")
+    profile = report.get("profile")
+    if profile is not None:
+        if "top" in profile:
+            lines.append(profile["top"])
+        else:
+            lines.append(f"Sampled {profile['samples']} stacks every {profile['interval'] * 1000:g} ms; "
+                         "most time in (self):")
+            lines += [f"  {entry['share']:6.1%}  {entry['function']}" for entry in profile["self"][:limit]]
+    return "\n".join(lines)
+
+
+def add_instrumentation_arguments(parser):
+    parser.add_argument('--report',
+                        help='Write per-stage timings, counters, slowest statements and diagnostics to this JSON file')
+    parser.add_argument('--slowest', type=int, default=DEFAULT_SLOWEST,
+                        help='Number of slowest statements listed in the report')
+    parser.add_argument('--profile', choices=PROFILERS,
+                        help='Profile the run with cProfile or a low-overhead sampling profiler')
+    parser.add_argument('--profile-output',
+                        help='With --profile cprofile, dump the raw stats to this file')
+
+
+def instrumentation_from_args(args):
+    if not (args.report or args.profile):
+        return None
+    return Instrumentation(slowest=args.slowest, profile=args.profile, profile_path=args.profile_output)
@@ -0,0 +1,418 @@
+import argparse
+import bisect
+import csv
+import mmap
+import struct
+from array import array
+
+from alias_index import UNKNOWN, table_key
+from lineage_io import FIELDNAMES, OUTPUT_FORMATS, iter_lineage_rows
+
+MAGIC = b"SQLLIN02"
+# magic, string count, blob size, logical count, forward edges, table count, column node count, reverse edges,
+# bare table name count, bare name -> table references
+HEADER = struct.Struct("<8s9I")
+
+
+def table_name_key(table):
+    """
+    Normalizes a table name for graph nodes: lower-case, keeping any schema, so the
+    same table name in two schemas stays two nodes.
+    """
+    return table.lower()
+
+
+class DependencyGraph:
+    """
+    In-memory bipartite graph between logical SQL names and the physical columns they
+    read. Table names (with their schema) and column names are lower-cased and every
+    name is interned, so repeated lineage rows from overlapping views collapse into a
+    single edge. Keeps forward (logical -> columns) and reverse (column -> logicals)
+    adjacency sets; save() writes them as a LineageGraphIndex file. Tables are looked
+    up by their qualified name, or by the bare name across every schema.
+
+    Rows without a known source table (functions and expressions) have no column node
+    to point at. They are not graph edges, but are kept, deduplicated, for
+    iter_rows(include_unresolved=True) and so for the deduplicated lineage CSV.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._strings = []
+        self._nodes = {}
+        self._node_keys = []
+        self._table_nodes = {}
+        self._bare_tables = {}
+        self._forward = {}
+        self._reverse = []
+        self._unresolved = set()
+        self.rows = 0
+        self.skipped = 0
+
+    def intern(self, name):
+        string_id = self._ids.get(name)
+        if string_id is None:
+            string_id = self._ids[name] = len(self._strings)
+            self._strings.append(name)
+        return string_id
+
+    def add(self, logical_name, output_column, source_column, source_table):
+        """
+        Adds one lineage row. Rows without a known source table are counted as skipped
+        and kept as unresolved rows instead of edges.
+        """
+        self.rows += 1
+        logical = self.intern(logical_name)
+        if not source_table or source_table == UNKNOWN or not source_column:
+            self.skipped += 1
+            self._unresolved.add((logical, self.intern(output_column or ""), self.intern(source_column or ""),
+                                  self.intern(source_table or "")))
+            return
+        key = (self.intern(table_name_key(source_table)), self.intern(source_column.lower()))
+        node = self._nodes.get(key)
+        if node is None:
+            node = self._nodes[key] = len(self._reverse)
+            self._node_keys.append(key)
+            self._reverse.append(set())
+            table_nodes = self._table_nodes.get(key[0])
+            if table_nodes is None:
+                table_nodes = self._table_nodes[key[0]] = []
+                self._bare_tables.setdefault(self.intern(table_key(source_table)), []).append(key[0])
+            table_nodes.append(node)
+        self._forward.setdefault(logical, set()).add((node, self.intern(output_column or "")))
+        self._reverse[node].add(logical)
+
+    @property
+    def logical_count(self):
+        return len(self._forward)
+
+    @property
+    def column_count(self):
+        return len(self._nodes)
+
+    @property
+    def unresolved_count(self):
+        return len(self._unresolved)
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add(*row)
+        return self
+
+    def logicals_for(self, table, column=None):
+        """
+        :param table: schema.table, or a bare table name to match it in every schema.
+        :return: Sorted logical names that read ``table.column``, or any column of the
+                 table when column is None.
+        """
+        if "." in table:
+            table_ids = (self._ids.get(table_name_key(table)),)
+        else:
+            table_ids = self._bare_tables.get(self._ids.get(table_key(table)), ())
+        column_id = None if column is None else self._ids.get(column.lower())
+        logicals = set()
+        for table_id in table_ids:
+            if column is None:
+                nodes = self._table_nodes.get(table_id, ())
+            else:
+                node = self._nodes.get((table_id, column_id))
+                nodes = () if node is None else (node,)
+            for node in nodes:
+                logicals.update(self._reverse[node])
+        return tuple(sorted(self._strings[logical] for logical in logicals))
+
+    def sources_for(self, logical_name):
+        """
+        :return: Sorted (output_column, source_column, source_table) tuples of a logical name.
+        """
+        edges = self._forward.get(self._ids.get(logical_name), ())
+        return sorted((self._strings[output], self._strings[self._node_keys[node][1]],
+                       self._strings[self._node_keys[node][0]]) for node, output in edges)
+
+    def iter_rows(self, include_unresolved=False):
+        """
+        Yields the deduplicated graph edges as lineage rows sorted by logical name, then
+        output column.
+        :param include_unresolved: Also yield the rows without a known source table,
+                                   so every distinct input row appears once.
+        """
+        unresolved = {}
+        if include_unresolved:
+            for logical, output, source_column, source_table in self._unresolved:
+                unresolved.setdefault(logical, []).append(
+                    (self._strings[output], self._strings[source_column], self._strings[source_table]))
+        for logical_name, logical in sorted((self._strings[logical], logical)
+                                            for logical in self._forward.keys() | unresolved.keys()):
+            for output_column, source_column, source_table in sorted(self.sources_for(logical_name) +
+                                                                     unresolved.get(logical, [])):
+                yield logical_name, output_column, source_column, source_table
+
+    def save(self, path):
+        """
+        Writes the graph as a compact binary index for LineageGraphIndex. All names are
+        interned into one sorted string table; logical names, tables and each table's
+        columns are stored as sorted id arrays with postings lists for both directions,
+        plus the tables under each bare table name, so every lookup is a binary search
+        over the mapped file. Unresolved rows are not stored.
+        :return: Tuple (logical count, column count, edge count).
+        """
+        encoded = [name.encode("utf-8") for name in self._strings]
+        order = sorted(range(len(encoded)), key=encoded.__getitem__)
+        new_id = array("I", bytes(4 * len(order)))
+        for position, string_id in enumerate(order):
+            new_id[string_id] = position
+        offsets = array("I", [0])
+        for string_id in order:
+            offsets.append(offsets[-1] + len(encoded[string_id]))
+        blob = b"".join(encoded[string_id] for string_id in order)
+
+        # Column nodes grouped by table, both in string order
+        nodes = sorted(self._nodes.items(), key=lambda item: (new_id[item[0][0]], new_id[item[0][1]]))
+        node_position = {node: position for position, (_, node) in enumerate(nodes)}
+        table_ids, table_starts, node_columns = array("I"), array("I"), array("I")
+        for position, ((table, column), _) in enumerate(nodes):
+            if not table_ids or table_ids[-1] != new_id[table]:
+                table_ids.append(new_id[table])
+                table_starts.append(position)
+            node_columns.append(new_id[column])
+        table_starts.append(len(nodes))
+
+        logicals = sorted(self._forward, key=new_id.__getitem__)
+        logical_position = {logical: position for position, logical in enumerate(logicals)}
+        logical_ids, logical_starts, edge_nodes, edge_outputs = array("I"), array("I", [0]), array("I"), array("I")
+        for logical in logicals:
+            logical_ids.append(new_id[logical])
+            for node, output in sorted((node_position[node], new_id[output]) for node, output in self._forward[logical]):
+                edge_nodes.append(node)
+                edge_outputs.append(output)
+            logical_starts.append(len(edge_nodes))
+
+        node_starts, node_logicals = array("I", [0]), array("I")
+        for _, node in nodes:
+            node_logicals.extend(sorted(logical_position[logical] for logical in self._reverse[node]))
+            node_starts.append(len(node_logicals))
+
+        table_position = {string_id: position for position, string_id in enumerate(table_ids)}
+        bare_ids, bare_starts, bare_tables = array("I"), array("I", [0]), array("I")
+        for bare in sorted(self._bare_tables, key=new_id.__getitem__):
+            bare_ids.append(new_id[bare])
+            bare_tables.extend(sorted(table_position[new_id[table]] for table in self._bare_tables[bare]))
+            bare_starts.append(len(bare_tables))
+
+        with open(path, mode='wb') as f:
+            f.write(HEADER.pack(MAGIC, len(encoded), len(blob), len(logical_ids), len(edge_nodes), len(table_ids),
+                                len(nodes), len(node_logicals), len(bare_ids), len(bare_tables)))
+            for part in (offsets, logical_ids, logical_starts, edge_nodes, edge_outputs, table_ids, table_starts,
+                         node_columns, node_starts, node_logicals, bare_ids, bare_starts, bare_tables):
+                f.write(part.tobytes())
+            f.write(blob)
+        return len(logical_ids), len(nodes), len(edge_nodes)
+
+
+def build_graph(lineage_path, input_format=None):
+    """
+    Aggregates lineage output (CSV, Parquet or Arrow) into a DependencyGraph.
+    """
+    return DependencyGraph().add_rows(iter_lineage_rows(lineage_path, input_format))
+
+
+def compile_lineage_graph(lineage_path, graph_path, input_format=None, csv_path=None):
+    """
+    Builds the dependency graph of a lineage output file and saves it for
+    LineageGraphIndex.
+    :param lineage_path: Lineage output from process_csv.
+    :param graph_path: Output graph file.
+    :param input_format: One of lineage_io.OUTPUT_FORMATS (default: from the suffix).
+    :param csv_path: Also write the deduplicated, sorted lineage rows to this CSV,
+                     including the rows without a known source table.
+    :return: The DependencyGraph.
+    """
+    graph = build_graph(lineage_path, input_format)
+    graph.save(graph_path)
+    if csv_path:
+        with open(csv_path, mode='w', newline='', encoding='utf-8') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(FIELDNAMES)
+            writer.writerows(graph.iter_rows(include_unresolved=True))
+    return graph
+
+
+class LineageGraphIndex:
+    """
+    Read-only dependency graph backed by a memory-mapped file from DependencyGraph.save().
+    Opening it only maps the file, and impact queries are binary searches plus a slice
+    of a postings list, so they take microseconds however many lineage rows were
+    aggregated. Provides the same query methods as DependencyGraph. Pickles as its
+    path, like catalog_index.CatalogIndex.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._open()
+
+    def _open(self):
+        with open(self.path, mode='rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_strings, blob_size, n_logicals, n_edges, n_tables, n_nodes, n_reverse, n_bare, n_bare_tables = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{self.path}' is not a compiled lineage graph")
+
+        words = memoryview(self._map)[HEADER.size:].cast("B")
+        position = 0
+
+        def take(count):
+            nonlocal position
+            view = words[position * 4:(position + count) * 4].cast("I")
+            position += count
+            return view
+
+        self._offsets = take(n_strings + 1)
+        self._logical_ids = take(n_logicals)
+        self._logical_starts = take(n_logicals + 1)
+        self._edge_nodes = take(n_edges)
+        self._edge_outputs = take(n_edges)
+        self._table_ids = take(n_tables)
+        self._table_starts = take(n_tables + 1)
+        self._node_columns = take(n_nodes)
+        self._node_starts = take(n_nodes + 1)
+        self._node_logicals = take(n_reverse)
+        self._bare_ids = take(n_bare)
+        self._bare_starts = take(n_bare + 1)
+        self._bare_tables = take(n_bare_tables)
+        self._blob_start = HEADER.size + position * 4
+        self._n_strings = n_strings
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self._open()
+
+    def _bytes(self, string_id):
+        start = self._blob_start + self._offsets[string_id]
+        end = self._blob_start + self._offsets[string_id + 1]
+        return self._map[start:end]
+
+    def string(self, string_id):
+        return self._bytes(string_id).decode("utf-8")
+
+    def _string_id(self, name):
+        """
+        Binary-searches the sorted string table; returns the id of a name or -1.
+        """
+        encoded = name.encode("utf-8")
+        low, high = 0, self._n_strings
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._n_strings and self._bytes(low) == encoded:
+            return low
+        return -1
+
+    @staticmethod
+    def _position(ids, string_id, start=0, end=None):
+        end = len(ids) if end is None else end
+        i = bisect.bisect_left(ids, string_id, start, end)
+        return i if string_id >= 0 and i < end and ids[i] == string_id else -1
+
+    def _node_table(self, node):
+        return bisect.bisect_right(self._table_starts, node) - 1
+
+    def logicals_for(self, table, column=None):
+        """
+        :param table: schema.table, or a bare table name to match it in every schema.
+        :return: Sorted logical names that read ``table.column``, or any column of the
+                 table when column is None.
+        """
+        if "." in table:
+            table_position = self._position(self._table_ids, self._string_id(table_name_key(table)))
+            table_positions = () if table_position < 0 else (table_position,)
+        else:
+            bare = self._position(self._bare_ids, self._string_id(table_key(table)))
+            table_positions = () if bare < 0 else self._bare_tables[self._bare_starts[bare]:self._bare_starts[bare + 1]]
+        column_id = None if column is None else self._string_id(column.lower())
+        logicals = set()
+        for table_position in table_positions:
+            start, end = self._table_starts[table_position], self._table_starts[table_position + 1]
+            if column is not None:
+                node = self._position(self._node_columns, column_id, start, end)
+                if node < 0:
+                    continue
+                start, end = node, node + 1
+            for node in range(start, end):
+                logicals.update(self._node_logicals[self._node_starts[node]:self._node_starts[node + 1]])
+        # Logical positions follow string order, so sorting them sorts the names
+        return tuple(self.string(self._logical_ids[logical]) for logical in sorted(logicals))
+
+    def sources_for(self, logical_name):
+        """
+        :return: Sorted (output_column, source_column, source_table) tuples of a logical name.
+        """
+        logical = self._position(self._logical_ids, self._string_id(logical_name))
+        if logical < 0:
+            return []
+        sources = []
+        for edge in range(self._logical_starts[logical], self._logical_starts[logical + 1]):
+            node = self._edge_nodes[edge]
+            sources.append((self.string(self._edge_outputs[edge]), self.string(self._node_columns[node]),
+                            self.string(self._table_ids[self._node_table(node)])))
+        return sorted(sources)
+
+    def iter_rows(self):
+        """
+        Yields the deduplicated graph edges as lineage rows sorted by logical name, then
+        output column.
+        """
+        for logical_id in self._logical_ids:
+            logical_name = self.string(logical_id)
+            for output_column, source_column, source_table in self.sources_for(logical_name):
+                yield logical_name, output_column, source_column, source_table
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate lineage output into a column-level dependency graph.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="Build a graph file from lineage output")
+    compile_parser.add_argument('lineage_file', help='Lineage output from process_csv (CSV, Parquet or Arrow)')
+    compile_parser.add_argument('graph_file', help='Output graph path')
+    compile_parser.add_argument('--input-format', choices=OUTPUT_FORMATS,
+                                help='Lineage format (default: from the file suffix)')
+    compile_parser.add_argument('--csv', help='Also write the deduplicated, sorted lineage rows to this CSV, '
+                                              'including those without a source table')
+    query_parser = commands.add_parser("query", help="Impact and lineage queries against a graph file")
+    query_parser.add_argument('graph_file', help='Graph file from "compile"')
+    query_parser.add_argument('--table',
+                              help='List logical SQLs reading this table (schema.table, or a bare name for any schema)')
+    query_parser.add_argument('--column', help='With --table, only those reading this column')
+    query_parser.add_argument('--logical', help='List the source columns of this logical SQL')
+    args = parser.parse_args(argv)
+    if args.command == "query" and not (args.table or args.logical):
+        parser.error("query needs --table or --logical")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "compile":
+        graph = compile_lineage_graph(args.lineage_file, args.graph_file, args.input_format, args.csv)
+        print(f"Aggregated {graph.rows} lineage rows into {args.graph_file}: {graph.logical_count} logical SQLs, "
+              f"{graph.column_count} columns; {graph.skipped} rows ({graph.unresolved_count} distinct) have no "
+              f"source table and are not graph edges")
+        return
+
+    index = LineageGraphIndex(args.graph_file)
+    if args.table:
+        for logical_name in index.logicals_for(args.table, args.column):
+            print(logical_name)
+    if args.logical:
+        for output_column, source_column, source_table in index.sources_for(args.logical):
+            print(f"{output_column}\t{source_table}.{source_column}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,461 @@
+import csv
+import functools
+import itertools
+import os
+import time
+from collections import deque
+
+from alias_index import load_schema_catalog
+from instrumentation import Instrumentation, activate
+
+FIELDNAMES = [
+    "logical_name",
+    "output_column_name",
+    "source_column_name",
+    "source_table_name"
+]
+
+DEFAULT_CHUNK_ROWS = 10000
+DEFAULT_BATCH_SIZE = 256
+OUTPUT_FORMATS = ("csv", "parquet", "arrow")
+# Highly repetitive columns stored as dictionary codes in columnar output
+DICTIONARY_FIELDS = ("logical_name", "source_table_name")
+# File suffixes of columnar lineage output
+FORMAT_SUFFIXES = {".parquet": "parquet", ".pq": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+
+# Parse function of a pool worker, installed once per process by init_worker
+worker_parse_func = None
+
+
+def iter_statements(input_file, start_row=0):
+    """
+    Streams (logical_name, select_statement) pairs from the input CSV.
+    :param input_file: Path to input CSV with logical_name and select_statement columns.
+    :param start_row: Number of data rows to skip (used when resuming).
+    :return: Generator of (logical_name, select_statement) tuples.
+    """
+    with open(input_file, mode='r', encoding='utf-8') as csv_file:
+        reader = csv.DictReader(csv_file)
+        for row in itertools.islice(reader, start_row, None):
+            yield row['logical_name'], row['select_statement']
+
+
+def iter_lineage_rows(path, input_format=None):
+    """
+    Streams rows back from lineage output written by stream_lineage, one record batch
+    at a time for Parquet and Arrow files.
+    :param path: Lineage output file.
+    :param input_format: One of OUTPUT_FORMATS (default: from the file suffix, else csv).
+    :return: Generator of (logical_name, output_column_name, source_column_name,
+             source_table_name) tuples.
+    """
+    if input_format is None:
+        input_format = FORMAT_SUFFIXES.get(os.path.splitext(path)[1].lower(), "csv")
+    if input_format == "csv":
+        with open(path, mode='r', newline='', encoding='utf-8') as csv_file:
+            for row in csv.DictReader(csv_file):
+                yield tuple(row[name] for name in FIELDNAMES)
+        return
+    if input_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown lineage format '{input_format}', expected one of {OUTPUT_FORMATS}")
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(f"Reading {input_format} lineage requires the pyarrow package") from e
+    if input_format == "parquet":
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(columns=FIELDNAMES)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        columns = batch.to_pydict()
+        yield from zip(*(columns[name] for name in FIELDNAMES))
+
+
+def lineage_rows(logical_name, columns):
+    """
+    Builds output rows for one parsed statement.
+    :param logical_name: Logical SQL name the statement belongs to.
+    :param columns: List of (output_column, source_column, source_table) tuples.
+    :return: Generator of row dictionaries keyed by FIELDNAMES.
+    """
+    for output_column, source_column, source_table in columns:
+        yield {
+            "logical_name": logical_name,
+            "output_column_name": output_column,
+            "source_column_name": source_column,
+            "source_table_name": source_table
+        }
+
+
+def parse_serial(statements, parse_func, cache=None, metrics=None):
+    """
+    Parses statements in-process, consulting the parse cache when one is given.
+    :param statements: Iterable of (logical_name, select_statement) tuples.
+    :param parse_func: Function returning (output_column, source_column, source_table) tuples.
+    :param cache: Optional ParseCache.
+    :param metrics: Optional Instrumentation that records parse time per statement.
+    :return: Generator of (logical_name, columns) tuples in input order.
+    """
+    for logical_name, statement in statements:
+        start = time.perf_counter()
+        if cache is None:
+            columns = parse_func(statement)
+        else:
+            columns = cache.parse(statement, parse_func)
+        if metrics is not None:
+            seconds = time.perf_counter() - start
+            metrics.add_time("parse", seconds)
+            metrics.record_statement(logical_name, seconds, len(columns))
+        yield logical_name, columns
+
+
+def parse_batch(parse_func, statements, timed=False, diagnostic_limit=None):
+    """
+    Parses a batch of statements; runs inside worker processes.
+    :param parse_func: Module-level (picklable) parse function.
+    :param statements: List of SQL query strings.
+    :param timed: Also time each statement, and collect stage timings and diagnostics
+                  for the parent's Instrumentation.
+    :param diagnostic_limit: Diagnostics kept per kind when timed.
+    :return: List of column lists, one per statement, in batch order. When timed, a
+             tuple of a list of (columns, seconds) tuples and Instrumentation.partial().
+    """
+    if not timed:
+        return [parse_func(statement) for statement in statements]
+    metrics = Instrumentation(slowest=0, diagnostic_limit=diagnostic_limit, echo_diagnostics=False)
+    results = []
+    with activate(metrics):
+        for statement in statements:
+            start = time.perf_counter()
+            columns = parse_func(statement)
+            results.append((columns, time.perf_counter() - start))
+    return results, metrics.partial()
+
+
+def with_catalog(parse_func, catalog_path=None):
+    """
+    Binds the schema catalog at catalog_path to parse_func's catalog argument.
+    """
+    if not catalog_path:
+        return parse_func
+    return functools.partial(parse_func, catalog=load_schema_catalog(catalog_path))
+
+
+def init_worker(parse_func, catalog_path=None):
+    """
+    Process pool initializer: installs the parse function in the worker and loads its
+    schema catalog there, once per process, so batches only carry statements.
+    """
+    global worker_parse_func
+    worker_parse_func = with_catalog(parse_func, catalog_path)
+
+
+def parse_worker_batch(statements, timed=False, diagnostic_limit=None):
+    """
+    parse_batch with the parse function installed by init_worker.
+    """
+    return parse_batch(worker_parse_func, statements, timed, diagnostic_limit)
+
+
+def iter_batches(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def parallel_parse(statements, parse_func, workers, batch_size=DEFAULT_BATCH_SIZE, ordered=True, cache=None,
+                   metrics=None, catalog_path=None):
+    """
+    Parses statements in a process pool, keeping at most ``2 * workers`` batches in flight
+    so memory stays bounded. Cache lookups happen in this process; only misses are sent
+    to the workers and their results are stored back into the cache. A statement that
+    is already being parsed by an in-flight batch is not sent again: it takes the
+    result of the first batch when that completes, and counts as a memory hit.
+    :param statements: Iterable of (logical_name, select_statement) tuples.
+    :param parse_func: Module-level (picklable) parse function.
+    :param workers: Number of worker processes.
+    :param batch_size: Number of statements sent to a worker at a time.
+    :param ordered: Yield results in input order; otherwise yield batches as they finish.
+    :param cache: Optional ParseCache.
+    :param metrics: Optional Instrumentation; workers then report per-statement parse
+                    times, stage timings and diagnostics, which are merged into it.
+    :param catalog_path: Optional schema catalog passed to parse_func as catalog=. Each
+                         worker loads it once (see init_worker) instead of receiving
+                         a pickled copy with every batch.
+    :return: Generator of (logical_name, columns) tuples.
+    """
+    # The process pool (and multiprocessing) is only imported by parallel runs
+    from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+    def submit(batch):
+        results = [None] * len(batch)
+        misses = []
+        # (index, future or None for this batch's own, position in that future's result)
+        waiting = []
+        batch_keys = {}
+        for i, (_, statement) in enumerate(batch):
+            if cache is None:
+                misses.append((i, None, statement))
+                continue
+            key = cache.key(statement)
+            source = in_flight.get(key)
+            if source is None and key in batch_keys:
+                source = (None, batch_keys[key])
+            if source is not None:
+                cache.hits += 1
+                waiting.append((i,) + source)
+                continue
+            columns = cache.get(key)
+            if columns is None:
+                batch_keys[key] = len(misses)
+                misses.append((i, key, statement))
+            else:
+                results[i] = columns
+        if misses:
+            future = executor.submit(parse_worker_batch, [statement for _, _, statement in misses],
+                                     metrics is not None, diagnostic_limit)
+        else:
+            future = Future()
+            future.set_result([] if metrics is None else ([], None))
+        for key, position in batch_keys.items():
+            in_flight[key] = (future, position)
+        jobs[future] = (batch, results, misses, waiting)
+        return future
+
+    def batch_results(future):
+        return future.result() if metrics is None else future.result()[0]
+
+    def collect(future):
+        batch, results, misses, waiting = jobs.pop(future)
+        if metrics is not None and future.result()[1] is not None:
+            metrics.merge(future.result()[1])
+        for (i, key, _), columns in zip(misses, batch_results(future)):
+            if metrics is not None:
+                columns, seconds = columns
+                metrics.add_time("parse", seconds)
+                metrics.record_statement(batch[i][0], seconds, len(columns))
+            results[i] = columns
+            if cache is not None:
+                cache.put(key, columns)
+                if in_flight[key][0] is future:
+                    del in_flight[key]
+        for i, source, position in waiting:
+            # Blocks only when an unordered run collects a batch before its source
+            columns = batch_results(source or future)[position]
+            results[i] = columns[0] if metrics is not None else columns
+        return [(logical_name, columns) for (logical_name, _), columns in zip(batch, results)]
+
+    max_in_flight = 2 * workers
+    diagnostic_limit = metrics.diagnostics.limit if metrics is not None else None
+    jobs = {}
+    # Cache key -> (future, position in its result) for statements being parsed
+    in_flight = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(parse_func, catalog_path)) as executor:
+        pending = deque()
+        for batch in iter_batches(statements, batch_size):
+            pending.append(submit(batch))
+            if len(pending) < max_in_flight:
+                continue
+            if ordered:
+                yield from collect(pending.popleft())
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield from collect(future)
+        while pending:
+            yield from collect(pending.popleft())
+
+
+class ColumnarLineageWriter:
+    """
+    Writes lineage rows to Parquet or to an Arrow IPC file (Feather v2), one record batch
+    (Parquet row group) per flush. logical_name and source_table_name are dictionary
+    encoded against dictionaries that only grow, so Arrow files carry dictionary deltas
+    instead of repeating every name, and readers get categorical columns back.
+    """
+
+    def __init__(self, output_file, output_format):
+        """
+        :param output_file: Path to the output file.
+        :param output_format: "parquet" or "arrow".
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(f"{output_format} output requires the pyarrow package") from e
+        self.pa = pa
+        self.schema = pa.schema([
+            pa.field(name, pa.dictionary(pa.int32(), pa.string()) if name in DICTIONARY_FIELDS else pa.string())
+            for name in FIELDNAMES
+        ])
+        if output_format == "parquet":
+            self.writer = pq.ParquetWriter(output_file, self.schema, compression="zstd")
+        else:
+            # Uncompressed so readers can memory-map the file and use its buffers in place
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self.writer = pa.ipc.new_file(output_file, self.schema, options=options)
+        self.columns = {name: [] for name in FIELDNAMES}
+        self.dictionaries = {name: {} for name in DICTIONARY_FIELDS}
+
+    def writerows(self, rows):
+        for row in rows:
+            for name in FIELDNAMES:
+                value = row[name]
+                if name in self.dictionaries and value is not None:
+                    value = self.dictionaries[name].setdefault(value, len(self.dictionaries[name]))
+                self.columns[name].append(value)
+
+    def flush(self):
+        if not self.columns[FIELDNAMES[0]]:
+            return
+        pa = self.pa
+        arrays = []
+        for name in FIELDNAMES:
+            if name in self.dictionaries:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(self.columns[name], type=pa.int32()),
+                                                             pa.array(list(self.dictionaries[name]), type=pa.string())))
+            else:
+                arrays.append(pa.array(self.columns[name], type=pa.string()))
+            self.columns[name] = []
+        self.writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def checkpoint_path(output_file):
+    return f"{output_file}.checkpoint"
+
+
+def read_checkpoint(output_file):
+    """
+    Reads the resume checkpoint written next to the output file.
+    :return: Tuple (rows_done, byte_offset), or (0, 0) if there is no checkpoint.
+    """
+    try:
+        with open(checkpoint_path(output_file), mode='r', encoding='utf-8') as f:
+            rows_done, offset = f.read().split(",")
+            return int(rows_done), int(offset)
+    except (FileNotFoundError, ValueError):
+        return 0, 0
+
+
+def write_checkpoint(output_file, rows_done, offset):
+    # Write to a temp file and rename so a crash never leaves a torn checkpoint
+    path = checkpoint_path(output_file)
+    with open(path + ".tmp", mode='w', encoding='utf-8') as f:
+        f.write(f"{rows_done},{offset}")
+    os.replace(path + ".tmp", path)
+
+
+def stream_lineage(input_file, output_file, parse_func, chunk_rows=DEFAULT_CHUNK_ROWS, resume=False,
+                   workers=1, ordered=True, batch_size=DEFAULT_BATCH_SIZE, cache=None, output_format="csv",
+                   metrics=None, catalog_path=None):
+    """
+    Parses the input CSV and writes lineage rows to the output CSV as they are produced,
+    keeping memory bounded regardless of input size.
+
+    Every ``chunk_rows`` input rows the output is flushed and a checkpoint recording the
+    number of input rows processed and the output byte offset is written to
+    ``<output_file>.checkpoint``. With ``resume=True`` the output is truncated back to
+    the last checkpoint and processing continues from the next input row.
+
+    With ``workers > 1`` statements are parsed in a process pool. Ordered output is
+    identical to a single-process run; unordered output writes batches as soon as they
+    finish and does not write checkpoints, since completed rows are not contiguous.
+
+    With ``output_format`` "parquet" or "arrow" the rows are written with
+    ColumnarLineageWriter instead, one record batch every ``chunk_rows`` input rows.
+    Columnar output cannot be resumed, since a partly written file has no footer.
+
+    :param input_file: Path to input CSV.
+    :param output_file: Path to output CSV.
+    :param parse_func: Function that parses one SQL statement into column tuples.
+    :param chunk_rows: Number of input rows between flushes/checkpoints.
+    :param resume: Continue from the last checkpoint instead of starting over.
+    :param workers: Number of parser processes; 1 parses in-process.
+    :param ordered: Keep input order when ``workers > 1``.
+    :param batch_size: Number of statements sent to a worker at a time.
+    :param cache: Optional ParseCache shared by all statements in the run.
+    :param output_format: One of OUTPUT_FORMATS.
+    :param metrics: Optional Instrumentation. It is active for the whole run and gets
+                    the "read", "parse" and "write" stages plus statement and row counts.
+    :param catalog_path: Optional schema catalog passed to parse_func as catalog=,
+                         loaded once per process.
+    :return: Total number of input rows processed.
+    """
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be at least 1")
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}")
+    columnar = output_format != "csv"
+    checkpoints = (ordered or workers == 1) and not columnar
+    if resume and columnar:
+        raise ValueError("resume is only supported for csv output")
+    if resume and not checkpoints:
+        raise ValueError("resume requires ordered output")
+
+    rows_done, offset = read_checkpoint(output_file) if resume else (0, 0)
+    if columnar:
+        rows_done = 0
+        out = writer = ColumnarLineageWriter(output_file, output_format)
+    elif rows_done and os.path.exists(output_file):
+        out = open(output_file, mode='r+', newline='', encoding='utf-8')
+        out.seek(offset)
+        out.truncate()
+        print(f"Resuming from input row {rows_done}")
+    else:
+        rows_done = 0
+        out = open(output_file, mode='w', newline='', encoding='utf-8')
+
+    with out, activate(metrics):
+        if not columnar:
+            writer = csv.DictWriter(out, fieldnames=FIELDNAMES)
+            if rows_done == 0:
+                writer.writeheader()
+
+        statements = iter_statements(input_file, start_row=rows_done)
+        if metrics is not None:
+            statements = metrics.timed_iter("read", statements)
+        if workers == 1:
+            parsed = parse_serial(statements, with_catalog(parse_func, catalog_path), cache, metrics)
+        else:
+            parsed = parallel_parse(statements, parse_func, workers, batch_size, ordered, cache, metrics,
+                                    catalog_path)
+
+        row_number = rows_done
+        for logical_name, columns in parsed:
+            start = time.perf_counter()
+            writer.writerows(lineage_rows(logical_name, columns))
+            row_number += 1
+            if row_number % chunk_rows == 0:
+                out.flush()
+                # Only checkpoint on statement boundaries so a resume never splits a statement
+                if checkpoints:
+                    write_checkpoint(output_file, row_number, out.tell())
+            if metrics is not None:
+                metrics.add_time("write", time.perf_counter() - start)
+                metrics.count("statements")
+                metrics.count("lineage_rows", len(columns))
+
+    if os.path.exists(checkpoint_path(output_file)):
+        os.remove(checkpoint_path(output_file))
+    return row_number
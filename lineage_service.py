@@ -0,0 +1,405 @@
+import argparse
+import asyncio
+import collections
+import functools
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from parse_cache import DEFAULT_CACHE_SIZE, ParseCache
+
+PARSERS = ("regex", "fast", "sqlparse")
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 4096
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_BODY = 64 * 1024 * 1024
+LATENCY_WINDOW = 10000
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def load_parser(parser, catalog_path=None):
+    """
+    Returns a picklable parse function for a parser name, and the parser module's
+    cache_namespace(), which process_csv uses too, so a persistent cache is shared with
+    batch runs however they are started.
+    :param parser: "regex" or "fast" (no_sql_parser backends), or "sqlparse" (with_Sql_parser).
+    :param catalog_path: Optional schema catalog used to resolve unqualified columns.
+    :return: Tuple (parse function, cache namespace).
+    """
+    from alias_index import load_schema_catalog
+
+    catalog = load_schema_catalog(catalog_path) if catalog_path else None
+    if parser == "sqlparse":
+        import with_Sql_parser
+        parse_func = functools.partial(with_Sql_parser.parse_select_statement, catalog=catalog)
+        namespace = with_Sql_parser.cache_namespace(catalog_path)
+    elif parser in ("regex", "fast"):
+        import no_sql_parser
+        parse_func = functools.partial(no_sql_parser.parse_select_statement, backend=parser, catalog=catalog)
+        namespace = no_sql_parser.cache_namespace(parser, catalog_path)
+    else:
+        raise ValueError(f"Unknown parser '{parser}', expected one of {PARSERS}")
+    return parse_func, namespace
+
+
+def parse_statements(parse_func, statements):
+    """
+    Parses a batch of statements inside a worker process. A statement that fails only
+    fails itself, not the rest of its batch.
+    :return: List of (columns, error) pairs in batch order.
+    """
+    results = []
+    for statement in statements:
+        try:
+            results.append((parse_func(statement), None))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class ServiceMetrics:
+    """
+    Request and statement counters plus latency percentiles over the most recent
+    requests.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.monotonic()
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=window)
+
+    def observe(self, seconds, statements):
+        self.counters["requests"] += 1
+        self.counters["statements"] += statements
+        self.latencies.append(seconds)
+
+    def snapshot(self, service):
+        uptime = time.monotonic() - self.started
+        latencies = sorted(self.latencies)
+        cache = service.cache
+        return {
+            "uptime": uptime,
+            "counters": dict(self.counters),
+            "statements_per_sec": self.counters["statements"] / uptime if uptime else 0.0,
+            "latency_ms": {name: None if value is None else value * 1000 for name, value in (
+                ("p50", percentile(latencies, 0.50)), ("p95", percentile(latencies, 0.95)),
+                ("p99", percentile(latencies, 0.99)), ("max", latencies[-1] if latencies else None))},
+            "pending_statements": service.pending,
+            "max_pending": service.max_pending,
+            "cache": {"memory_hits": cache.hits, "disk_hits": cache.disk_hits, "misses": cache.misses,
+                      "shared_in_flight": self.counters["deduplicated"]},
+        }
+
+
+class LineageService:
+    """
+    Parses SQL statements on request. Misses in the shared parse cache are parsed in a
+    bounded process pool, and identical statements that are already being parsed share
+    one result. With a persistent cache every cache call runs on one dedicated thread,
+    which owns the SQLite connection, so disk latency never stalls the event loop. At most ``max_pending`` statements
+    may be waiting for the pool: a request that would exceed that is rejected with
+    503 and Retry-After instead of queueing without limit.
+    """
+
+    def __init__(self, parse_func, workers=None, max_pending=DEFAULT_MAX_PENDING, batch_size=DEFAULT_BATCH_SIZE,
+                 cache_size=DEFAULT_CACHE_SIZE, cache_path=None, namespace="", max_body=DEFAULT_MAX_BODY):
+        """
+        :param parse_func: Module-level (picklable) parse function.
+        :param workers: Number of parser processes (default: CPU count).
+        :param max_pending: Statements allowed to wait for or run in the pool.
+        :param batch_size: Statements sent to a worker at a time.
+        :param cache_size: Number of parsed statements kept in the in-memory LRU.
+        :param cache_path: Optional SQLite file that persists parsed statements.
+        :param namespace: Parser identifier mixed into cache keys.
+        :param max_body: Largest accepted request body in bytes.
+        """
+        self.parse_func = parse_func
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.max_body = max_body
+        self._cache_thread = None
+        if cache_path is None:
+            self.cache = ParseCache(cache_size, namespace=namespace)
+        else:
+            self._cache_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse-cache")
+            self.cache = self._cache_thread.submit(ParseCache, cache_size, cache_path, namespace=namespace).result()
+        self.metrics = ServiceMetrics()
+        self.pending = 0
+        self._in_flight = {}
+        self._tasks = set()
+        self._executor = None
+
+    def start(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._cache_thread is None:
+            self.cache.close()
+        else:
+            self._cache_thread.submit(self.cache.close).result()
+            self._cache_thread.shutdown()
+
+    async def _cache_call(self, func, *args):
+        """
+        Runs a cache operation inline for a memory-only cache, else on the cache thread.
+        """
+        if self._cache_thread is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._cache_thread, func, *args)
+
+    def _lookup(self, keys):
+        return [self.cache.lookup(key) for key in keys]
+
+    def _store(self, items):
+        for key, columns in items:
+            self.cache.put(key, columns)
+
+    async def parse_many(self, statements):
+        """
+        Parses statements through the cache and the process pool.
+        :return: List of (columns, error) pairs in input order.
+        """
+        results = [None] * len(statements)
+        keys = [self.cache.key(statement) for statement in statements]
+        lookups = [i for i, key in enumerate(keys) if key not in self._in_flight]
+        # Lookups are counted only once the request is admitted, so rejected requests
+        # (and their retries) do not inflate the cache statistics
+        sources = []
+        for i, (columns, source) in zip(lookups, await self._cache_call(self._lookup, [keys[i] for i in lookups])):
+            if columns is not None:
+                results[i] = (columns, None)
+                sources.append(source)
+
+        # No awaits from here until the new statements are registered as in flight
+        waiting = {}
+        new = {}
+        shared = 0
+        for i, (statement, key) in enumerate(zip(statements, keys)):
+            if results[i] is not None:
+                continue
+            waiting[i] = key
+            if key in self._in_flight:
+                shared += 1
+            else:
+                sources.append(None)
+                new.setdefault(key, statement)
+
+        if len(new) > self.max_pending:
+            raise HttpError(413, f"{len(new)} new statements exceed the queue size of {self.max_pending}; "
+                                 "split the batch")
+        if self.pending + len(new) > self.max_pending:
+            self.metrics.counters["rejected"] += 1
+            raise HttpError(503, f"Parse queue is full ({self.pending} of {self.max_pending} statements pending)",
+                            {"Retry-After": "1"})
+
+        for source in sources:
+            self.cache.count(source)
+        self.metrics.counters["deduplicated"] += shared
+        loop = asyncio.get_running_loop()
+        for key in new:
+            self._in_flight[key] = loop.create_future()
+        futures = {i: self._in_flight[key] for i, key in waiting.items()}
+        self.pending += len(new)
+        keys = list(new)
+        for start in range(0, len(keys), self.batch_size):
+            # Batches run as their own tasks so a client that disconnects cannot cancel
+            # work other requests are waiting for
+            batch = {key: new[key] for key in keys[start:start + self.batch_size]}
+            task = loop.create_task(self._run_batch(loop, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        for i, future in futures.items():
+            results[i] = await asyncio.shield(future)
+        return results
+
+    async def _run_batch(self, loop, batch):
+        try:
+            parsed = await loop.run_in_executor(self._executor, parse_statements, self.parse_func,
+                                                list(batch.values()))
+        except Exception as e:
+            parsed = [(None, f"{type(e).__name__}: {e}")] * len(batch)
+        finally:
+            self.pending -= len(batch)
+        parsed_keys = []
+        for key, (columns, error) in zip(batch, parsed):
+            if error is None:
+                parsed_keys.append((key, columns))
+            else:
+                self.metrics.counters["errors"] += 1
+            self._in_flight[key].set_result((columns, error))
+        # Finished futures stay in flight until the cache has the results, so requests
+        # arriving meanwhile take them from there instead of parsing again
+        try:
+            await self._cache_call(self._store, parsed_keys)
+        finally:
+            for key in batch:
+                del self._in_flight[key]
+
+    async def handle_parse(self, body, content_type):
+        """
+        POST /parse. A JSON object {"statement": ..., "logical_name": ...} returns one
+        JSON result; an NDJSON body (one such object per line) returns one NDJSON line
+        per input line, in order.
+        """
+        ndjson = "ndjson" in content_type or "jsonlines" in content_type
+        try:
+            lines = body.decode("utf-8").splitlines() if ndjson else [body.decode("utf-8")]
+            requests = [json.loads(line) for line in lines if line.strip()]
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise HttpError(400, f"Invalid JSON: {e}")
+        if not all(isinstance(request, dict) and isinstance(request.get("statement"), str) for request in requests):
+            raise HttpError(400, 'Every request needs a string "statement"')
+
+        results = await self.parse_many([request["statement"] for request in requests])
+        responses = []
+        for request, (columns, error) in zip(requests, results):
+            response = {"logical_name": request.get("logical_name")}
+            if error is None:
+                response["columns"] = [list(column) for column in columns]
+            else:
+                response["error"] = error
+            responses.append(response)
+        if ndjson:
+            return "".join(json.dumps(response) + "\n" for response in responses), "application/x-ndjson", \
+                len(responses)
+        return json.dumps(responses[0] if responses else {}), "application/json", len(responses)
+
+    async def handle_connection(self, reader, writer):
+        """
+        Minimal HTTP/1.1 with keep-alive: GET /health, GET /metrics and POST /parse.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                statements = 0
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                    length = int(headers.get("content-length", 0))
+                    if length > self.max_body:
+                        keep_alive = False
+                        raise HttpError(413, f"Body larger than {self.max_body} bytes")
+                    body = await reader.readexactly(length) if length else b""
+                    extra = {}
+                    if path == "/parse" and method == "POST":
+                        payload, content_type, statements = await self.handle_parse(
+                            body, headers.get("content-type", ""))
+                    elif path == "/metrics" and method == "GET":
+                        payload, content_type = json.dumps(self.metrics.snapshot(self)), "application/json"
+                    elif path == "/health" and method == "GET":
+                        payload, content_type = '{"status": "ok"}', "application/json"
+                    elif path in ("/parse", "/metrics", "/health"):
+                        raise HttpError(405, f"{method} is not allowed on {path}")
+                    else:
+                        raise HttpError(404, f"No route for {path}")
+                    status = 200
+                except HttpError as e:
+                    status, extra = e.status, e.headers
+                    payload, content_type = json.dumps({"error": str(e)}), "application/json"
+                except ValueError as e:
+                    status, extra, keep_alive = 400, {}, False
+                    payload, content_type = json.dumps({"error": f"Malformed request: {e}"}), "application/json"
+
+                data = payload.encode("utf-8")
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", f"Content-Type: {content_type}",
+                        f"Content-Length: {len(data)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if status == 200 and statements:
+                    self.metrics.observe(time.perf_counter() - start, statements)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(service, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None, ready=None):
+    """
+    Runs the service until cancelled or sent SIGTERM, on TCP or, with unix_path, on a
+    unix socket. Either way the process pool is shut down, so no workers are orphaned.
+    :param ready: Optional callable invoked once the socket is listening.
+    """
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    service.start()
+    try:
+        if unix_path:
+            server = await asyncio.start_unix_server(service.handle_connection, path=unix_path)
+        else:
+            server = await asyncio.start_server(service.handle_connection, host, port)
+        async with server:
+            if ready is not None:
+                ready()
+            await server.serve_forever()
+    finally:
+        loop.remove_signal_handler(signal.SIGTERM)
+        service.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve SQL lineage extraction over HTTP.")
+    parser.add_argument('--host', default="127.0.0.1", help='Address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port to listen on')
+    parser.add_argument('--unix', help='Listen on this unix socket path instead of TCP')
+    parser.add_argument('--parser', choices=PARSERS, default="fast",
+                        help='"regex" or "fast" (no_sql_parser), or "sqlparse" (with_Sql_parser)')
+    parser.add_argument('--catalog',
+                        help='Schema catalog for unqualified columns: compiled catalog_index file, JSON, or table_name/column_name CSV')
+    parser.add_argument('--workers', type=int, help='Number of parser processes (default: CPU count)')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help='Statements allowed to wait for a parser before requests get 503')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Statements sent to a parser process at a time')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='Number of parsed statements kept in memory (0 disables the LRU)')
+    parser.add_argument('--cache-path',
+                        help='SQLite file that persists parsed statements between runs')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    parse_func, namespace = load_parser(args.parser, args.catalog)
+    service = LineageService(parse_func, workers=args.workers,
+                             max_pending=args.max_pending, batch_size=args.batch_size,
+                             cache_size=args.cache_size, cache_path=args.cache_path, namespace=namespace)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix,
+                          ready=lambda: print(f"Serving {args.parser} lineage parser on {where}", flush=True)))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
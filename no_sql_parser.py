@@ -1,30 +1,110 @@
-import csv
+import argparse
+import functools
+import os
 import re
+import sys
 
-def parse_from_clause(from_clause):
+from alias_index import AliasIndex
+from instrumentation import (Instrumentation, add_instrumentation_arguments, format_report, instrumentation_from_args,
+                             stage)
+from lineage_io import DEFAULT_CHUNK_ROWS, OUTPUT_FORMATS, stream_lineage
+from lineage_graph import compile_lineage_graph
+from parse_cache import DEFAULT_CACHE_SIZE, ParseCache
+from sql_decompose import decompose, trace_lineage
+import sql_lexer
+
+BACKENDS = ("regex", "fast")
+# Mixed into parse cache keys; bump whenever parse_select_statement output changes so
+# results cached by an older parser are never served
+PARSER_VERSION = 1
+
+SELECT_PATTERN = re.compile(r"SELECT(.*?)FROM", re.IGNORECASE | re.DOTALL)
+FROM_PATTERN = re.compile(r"FROM(.*?)(WHERE|GROUP BY|ORDER BY|$)", re.IGNORECASE | re.DOTALL)
+COLUMN_SPLIT_PATTERN = re.compile(r",(?![^(]*\))")  # Split by commas not inside parentheses
+AS_PATTERN = re.compile(r" AS ", re.IGNORECASE)
+# Table references are separated by commas or any ANSI join keyword
+TABLE_SPLIT_PATTERN = re.compile(
+    r",|\s+(?:NATURAL\s+)?(?:(?:INNER|CROSS|(?:LEFT|RIGHT|FULL)(?:\s+OUTER)?)\s+)?JOIN\s+",
+    re.IGNORECASE)
+JOIN_CONDITION_PATTERN = re.compile(r"\s+(?:ON|USING)\b.*$", re.IGNORECASE | re.DOTALL)
+
+def parse_from_clause(from_clause, catalog=None, ctes=None, derived=None):
     """
     Parses the FROM clause to extract table names and their aliases.
     :param from_clause: The FROM clause as a string.
-    :return: Dictionary mapping aliases to table names.
+    :param catalog: Optional SchemaCatalog used to resolve unqualified columns.
+    :param ctes: Dictionary of lower-case CTE names to DerivedTable objects.
+    :param derived: Dictionary of subquery aliases to DerivedTable objects; the
+                    subqueries themselves appear in the clause as their alias.
+    :return: AliasIndex mapping aliases to table names.
     """
-    table_alias_map = {}
-    # Split the FROM clause by commas to handle multiple tables
-    tables = [table.strip() for table in from_clause.split(",")]
+    table_alias_map = AliasIndex(catalog)
+    # Split the FROM clause by commas and JOINs, dropping ON/USING conditions
+    tables = [JOIN_CONDITION_PATTERN.sub("", table).strip() for table in TABLE_SPLIT_PATTERN.split(from_clause)]
     for table in tables:
         parts = table.split()
+        if len(parts) == 3 and parts[1].upper() == "AS":
+            parts = [parts[0], parts[2]]
         if len(parts) == 2:  # Table with alias
             table_name, alias = parts
-            table_alias_map[alias] = table_name
+            table_alias_map[alias] = resolve_table(table_name, ctes, derived)
         elif len(parts) == 1:  # Table without alias
             table_name = parts[0]
-            table_alias_map[table_name] = table_name
+            table_alias_map[table_name] = resolve_table(table_name, ctes, derived)
     return table_alias_map
+
+
+def resolve_table(table_name, ctes=None, derived=None):
+    """
+    Returns the DerivedTable a FROM reference stands for, or the name itself for a
+    physical table.
+    """
+    if derived and table_name in derived:
+        return derived[table_name]
+    if ctes and "." not in table_name:
+        return ctes.get(table_name.lower(), table_name)
+    return table_name
     
 
-def parse_select_statement(query):
+def parse_select_statement(query, backend="regex", catalog=None):
     """
     Parses a SQL SELECT statement to extract column aliases, original columns, and source tables.
     :param query: SQL query string.
+    :param backend: "regex" for the original pattern-based parser, or "fast" for the
+                    single-pass lexer in sql_lexer. The fast backend matches
+                    with_Sql_parser for column references and unaliased function calls,
+                    but reports every aliased computed item as its expression text and
+                    "Unknown": ("cnt", "COUNT(*)", "Unknown") for ``COUNT(*) AS cnt``,
+                    where with_Sql_parser gives ("cnt", "COUNT", <a FROM table>), and
+                    ("s", "'a UNION b'", "Unknown") for ``'a UNION b' AS s``, where it
+                    gives ("s", "s", <a FROM table>).
+    :param catalog: Optional SchemaCatalog used to resolve unqualified columns.
+    :return: List of tuples (output_column, source_column, source_table).
+    """
+    if backend == "fast":
+        with stage("sql_lexer"):
+            return sql_lexer.parse_select_statement(query, catalog)
+    if backend != "regex":
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    # Split into CTEs, UNION/INTERSECT/EXCEPT branches and FROM subqueries, each
+    # matched on its own
+    with stage("decompose"):
+        decomposition = decompose(query)
+    return trace_lineage(query, decomposition, parse_branch, catalog)
+
+
+def parse_branch(query, branch, catalog=None, ctes=None, derived=None):
+    """
+    Runs the pattern-based parser over one sql_decompose.Branch, with its FROM
+    subqueries replaced by their aliases.
+    """
+    return parse_query_block(branch.masked_text(query), catalog, ctes, derived)
+
+
+def parse_query_block(query, catalog=None, ctes=None, derived=None):
+    """
+    Pattern-based parse of a single SELECT ... FROM block.
     :return: List of tuples (output_column, source_column, source_table).
     """
     result = []
@@ -33,8 +113,9 @@ def parse_select_statement(query):
     query = query.replace('\r\n', ' ').replace('\n', ' ').strip()
 
     # Extract SELECT and FROM parts
-    select_match = re.search(r"SELECT(.*?)FROM", query, re.IGNORECASE | re.DOTALL)
-    from_match = re.search(r"FROM(.*?)(WHERE|GROUP BY|ORDER BY|$)", query, re.IGNORECASE | re.DOTALL)
+    with stage("match_clauses"):
+        select_match = SELECT_PATTERN.search(query)
+        from_match = FROM_PATTERN.search(query)
 
     if not select_match or not from_match:
         return result
@@ -43,83 +124,150 @@ def parse_select_statement(query):
     from_part = from_match.group(1).strip()
 
     # Parse FROM clause to get table and alias mappings
-    table_alias_map = parse_from_clause(from_part)
+    with stage("extract_tables"):
+        table_alias_map = parse_from_clause(from_part, catalog, ctes, derived)
 
     # Parse SELECT columns
     # Match columns, including those with functions like TO_DATE(), TO_CHAR(), etc.
-    columns = re.split(r",(?![^(]*\))", select_part)  # Split by commas not inside parentheses
-    for col in columns:
-        col = col.strip()
-        if " AS " in col.upper():
-            source_column, output_column = map(str.strip, re.split(r" AS ", col, flags=re.IGNORECASE))
-        else:
-            source_column = output_column = col.strip()
-
-        # Determine if the source_column contains a function
-        if "(" in source_column and ")" in source_column:
-            # It's a function, keep it intact
-            column = source_column
-            source_table = "Unknown"  # Table detection for functions is ambiguous
-        elif "." in source_column:
-            # It's in the form alias.column
-            alias, column = source_column.split(".", 1)
-            source_table = table_alias_map.get(alias, "Unknown")
-        else:
-            # No alias, assume it's just a column name
-            column = source_column
-            source_table = next(iter(table_alias_map.values()), "Unknown")  # Default to the first table
-
-        result.append((output_column, column, source_table))
+    with stage("extract_columns"):
+        columns = COLUMN_SPLIT_PATTERN.split(select_part)
+        for col in columns:
+            col = col.strip()
+            if " AS " in col.upper():
+                source_column, output_column = map(str.strip, AS_PATTERN.split(col))
+            else:
+                source_column = output_column = col.strip()
+
+            # Determine if the source_column contains a function
+            if "(" in source_column and ")" in source_column:
+                # It's a function, keep it intact
+                column = source_column
+                source_table = "Unknown"  # Table detection for functions is ambiguous
+            elif "." in source_column:
+                # It's in the form alias.column
+                alias, column = source_column.split(".", 1)
+                column, source_table = table_alias_map.resolve(alias, column)
+            else:
+                # No alias: look the column up in the catalog, else default to the first table
+                column, source_table = table_alias_map.resolve(None, source_column)
+
+            result.append((output_column, column, source_table))
     
     return result
 
 
 
-def process_csv(input_file, output_file):
+def cache_namespace(backend="regex", catalog_path=None):
+    """
+    Returns the parse cache namespace for a backend. It is a fixed module name, not
+    __name__, so a cache file is shared whether the module runs as a script or is
+    imported (cli.py, lineage_service).
+    """
+    namespace = f"no_sql_parser:{PARSER_VERSION}:{backend}"
+    if catalog_path:
+        # Cached results depend on the catalog contents
+        namespace += f":{os.path.abspath(catalog_path)}:{os.path.getmtime(catalog_path)}"
+    return namespace
+
+
+def process_csv(input_file, output_file, chunk_rows=DEFAULT_CHUNK_ROWS, resume=False,
+                cache_size=DEFAULT_CACHE_SIZE, cache_path=None, backend="regex", catalog_path=None,
+                output_format="csv", metrics=None, report_path=None, metrics_callback=None,
+                graph_path=None, raise_errors=False):
     """
     Reads a CSV file and processes SQL queries to extract column and table information.
+    Rows are streamed from input to output so memory use does not grow with the input.
     :param input_file: Path to input CSV.
-    :param output_file: Path to output CSV.
+    :param output_file: Path to output file.
+    :param chunk_rows: Number of input rows between output flushes and resume checkpoints.
+    :param resume: Continue from the last checkpoint left by an interrupted run.
+    :param cache_size: Number of parsed statements kept in the in-memory LRU cache.
+    :param cache_path: Optional SQLite file that persists parsed statements between runs.
+    :param backend: Parser backend, "regex" or "fast".
+    :param catalog_path: Optional schema catalog (compiled index, JSON or CSV) used
+                         to resolve unqualified columns.
+    :param output_format: "csv", or "parquet"/"arrow" for columnar output with
+                          dictionary-encoded logical and table names (needs pyarrow).
+    :param metrics: Optional Instrumentation collecting stage timings, counters, the
+                    slowest statements and diagnostics (see instrumentation).
+    :param report_path: Write the run report as JSON to this path.
+    :param metrics_callback: Callable that receives the run report dictionary.
+    :param graph_path: Also aggregate the output into a lineage_graph dependency graph file.
+    :param raise_errors: Re-raise a failure instead of printing it.
+    :return: True if the run finished, False if it failed and the error was printed.
     """
-    rows = []
     try:
-        with open(input_file, mode='r', encoding='utf-8') as csv_file:
-            reader = csv.DictReader(csv_file)
-
-            for row in reader:
-                logical_name = row['logical_name']
-                select_statement = row['select_statement']
-
-                parsed_columns = parse_select_statement(select_statement)
-                for output_column, source_column, source_table in parsed_columns:
-                    rows.append({
-                        "logical_name": logical_name,
-                        "output_column_name": output_column,
-                        "source_column_name": source_column,
-                        "source_table_name": source_table
-                    })
-
-        # Write results to output CSV
-        with open(output_file, mode='w', newline='', encoding='utf-8') as csv_out:
-            writer = csv.DictWriter(csv_out, fieldnames=[
-                "logical_name",
-                "output_column_name",
-                "source_column_name",
-                "source_table_name"
-            ])
-            writer.writeheader()
-            writer.writerows(rows)
-
-        print(f"Output successfully written to {output_file}")
-
+        namespace = cache_namespace(backend, catalog_path)
+        parse_func = functools.partial(parse_select_statement, backend=backend)
+        if metrics is None and (report_path or metrics_callback):
+            metrics = Instrumentation()
+        with ParseCache(cache_size, cache_path, namespace=namespace) as cache:
+            stream_lineage(input_file, output_file, parse_func,
+                           chunk_rows=chunk_rows, resume=resume, cache=cache, output_format=output_format,
+                           metrics=metrics, catalog_path=catalog_path)
+            print(f"Output successfully written to {output_file}")
+            print(cache.report())
+            if graph_path:
+                graph = compile_lineage_graph(output_file, graph_path, output_format)
+                print(f"Dependency graph of {graph.logical_count} logical SQLs and {graph.column_count} columns "
+                      f"written to {graph_path}")
+            if metrics is not None:
+                metrics.count("cache_memory_hits", cache.hits)
+                metrics.count("cache_disk_hits", cache.disk_hits)
+                metrics.count("cache_misses", cache.misses)
+                report = metrics.publish(report_path, metrics_callback)
+                if report_path:
+                    print(f"Run report written to {report_path}")
+                elif metrics_callback is None:
+                    # e.g. --profile without --report
+                    print(format_report(report))
+        return True
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"An error occurred: {e}")
+        return False
+
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract column lineage from SQL SELECT statements.")
+    parser.add_argument('input_file', nargs='?', default="/mnt/data/sql_column_export_testdata - Sheet1.csv",
+                        help='Input CSV with logical_name and select_statement columns')
+    parser.add_argument('output_file', nargs='?', default="/mnt/data/output_parsed_columns.csv",
+                        help='Output path (CSV, or Parquet/Arrow with --output-format)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='Flush output and write a resume checkpoint every N input rows')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume from the checkpoint left by an interrupted run')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='Number of parsed statements kept in memory (0 disables the LRU)')
+    parser.add_argument('--cache-path',
+                        help='SQLite file that persists parsed statements between runs')
+    parser.add_argument('--backend', choices=BACKENDS, default="regex",
+                        help='Parser backend: "regex" (default) or the single-pass "fast" lexer')
+    parser.add_argument('--catalog',
+                        help='Schema catalog for unqualified columns: compiled catalog_index file, JSON, or table_name/column_name CSV')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default="csv",
+                        help='Lineage output format; parquet and arrow dictionary-encode repeated names (needs pyarrow)')
+    parser.add_argument('--graph',
+                        help='Also aggregate the output into a column-level dependency graph file (see lineage_graph)')
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
 
 
-# File paths
-input_csv_path = "/mnt/data/sql_column_export_testdata - Sheet1.csv"  # Input file
-output_csv_path = "/mnt/data/output_parsed_columns.csv"  # Output file
+def main(argv=None, raise_errors=False):
+    """
+    :param raise_errors: Let a failure propagate instead of printing it (cli.py batch jobs).
+    :return: Exit status, 1 if the run failed.
+    """
+    args = parse_args(argv)
+    ok = process_csv(args.input_file, args.output_file, chunk_rows=args.chunk_rows, resume=args.resume,
+                     cache_size=args.cache_size, cache_path=args.cache_path, backend=args.backend,
+                     catalog_path=args.catalog, output_format=args.output_format,
+                     metrics=instrumentation_from_args(args), report_path=args.report,
+                     graph_path=args.graph, raise_errors=raise_errors)
+    return 0 if ok else 1
+
 
-# Process the CSV file
-process_csv(input_csv_path, output_csv_path)
+if __name__ == "__main__":
+    sys.exit(main())
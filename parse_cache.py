@@ -0,0 +1,122 @@
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 100000
+
+
+class ParseCache:
+    """
+    Content-addressed cache of parsed SELECT statements.
+
+    Statements are keyed by a hash of their normalized text (surrounding whitespace
+    stripped) plus a namespace identifying the parser, so the same text under many
+    logical names is only parsed once. Results are kept in an in-process LRU of
+    ``maxsize`` entries and, when ``path`` is given, in a SQLite file that persists
+    between runs.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, path=None, namespace=""):
+        """
+        :param maxsize: Maximum number of entries in the in-memory LRU (0 disables it).
+        :param path: Optional SQLite file used as a persistent second-level store.
+        :param namespace: Parser identifier mixed into every key (e.g. the module name).
+        """
+        self.maxsize = maxsize
+        self.namespace = namespace
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path)
+            self._db.execute("CREATE TABLE IF NOT EXISTS parse_cache (key BLOB PRIMARY KEY, columns TEXT NOT NULL)")
+
+    def key(self, statement):
+        normalized = f"{self.namespace}\0{statement.strip()}"
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key):
+        """
+        Looks a key up in the LRU, then the disk store, and counts the hit or miss.
+        :return: List of (output_column, source_column, source_table) tuples, or None on a miss.
+        """
+        columns, source = self.lookup(key)
+        self.count(source)
+        return columns
+
+    def lookup(self, key):
+        """
+        Looks a key up like get() without counting it, for callers that only count the
+        lookups they go on to use (see count()).
+        :return: Tuple (columns or None, "memory", "disk" or None for a miss).
+        """
+        columns = self._lru.get(key)
+        if columns is not None:
+            self._lru.move_to_end(key)
+            return columns, "memory"
+
+        if self._db is not None:
+            row = self._db.execute("SELECT columns FROM parse_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                columns = [tuple(column) for column in json.loads(row[0])]
+                self._remember(key, columns)
+                return columns, "disk"
+        return None, None
+
+    def count(self, source):
+        """
+        Counts one lookup() result as a memory hit, disk hit or miss.
+        """
+        if source == "memory":
+            self.hits += 1
+        elif source == "disk":
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+
+    def put(self, key, columns):
+        columns = [tuple(column) for column in columns]
+        self._remember(key, columns)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO parse_cache (key, columns) VALUES (?, ?)",
+                             (key, json.dumps(columns)))
+
+    def parse(self, statement, parse_func):
+        """
+        Returns the cached result for a statement, parsing and storing it on a miss.
+        """
+        key = self.key(statement)
+        columns = self.get(key)
+        if columns is None:
+            columns = parse_func(statement)
+            self.put(key, columns)
+        return columns
+
+    def _remember(self, key, columns):
+        if self.maxsize <= 0:
+            return
+        self._lru[key] = columns
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def report(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        hit_rate = (self.hits + self.disk_hits) / lookups if lookups else 0.0
+        return (f"Parse cache: {self.hits} memory hits, {self.disk_hits} disk hits, "
+                f"{self.misses} misses ({hit_rate:.1%} hit rate)")
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,681 @@
+import datetime
+import json
+import os
+import posixpath
+import re
+import shutil
+import struct
+import tempfile
+import time
+import xml.etree.ElementTree as ElementTree
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from openpyxl.styles.numbers import BUILTIN_FORMATS
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+
+from chunked_pivot import PivotAccumulator, aggregation_plan, plan_specs, reshape_pivot
+from excel_stream import DATE_FORMAT, DATETIME_FORMAT, DEFAULT_CHUNK_ROWS, iter_sheet_rows, write_sheets_streaming
+from pivot_report import PivotSpec, pivot_sheet_frame
+
+STATE_SUFFIX = ".pivotstate"
+JOURNAL_SUFFIX = ".journal"
+STATE_VERSION = 2
+SHEET_DATA_END = b"</sheetData>"
+WORKSHEET_HEAD = '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+WORKSHEET_TAIL = '</sheetData></worksheet>'
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+ILLEGAL_CHARACTERS = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+# Signature and name/extra lengths of a local file header
+LOCAL_HEADER = struct.Struct("<4s22x2H")
+CENTRAL_DIRECTORY = struct.Struct("<4s4B4HL2L5H2L")
+END_ARCHIVE = struct.Struct("<4s4H2LH")
+END_ARCHIVE64 = struct.Struct("<4sQ2H2L4Q")
+END_ARCHIVE64_LOCATOR = struct.Struct("<4sLQL")
+
+
+def state_path_for(file_name):
+    return file_name + STATE_SUFFIX
+
+
+def sheet_parts(archive):
+    """
+    Maps worksheet names to their part names inside an xlsx archive.
+    """
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    relationships = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in relationships.iter(f"{PACKAGE_REL_NS}Relationship")}
+    parts = {}
+    for sheet in workbook.iter(f"{MAIN_NS}sheet"):
+        target = targets[sheet.get(f"{REL_NS}id")]
+        parts[sheet.get("name")] = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+    return parts
+
+
+def date_styles(archive):
+    """
+    Finds the cell style indexes carrying the date and datetime formats excel_stream
+    writes, so appended date cells look like the original ones.
+    :return: Dictionary with "datetime" and "date" style indexes (None when absent).
+    """
+    styles = ElementTree.fromstring(archive.read("xl/styles.xml"))
+    formats = dict(BUILTIN_FORMATS)
+    for number_format in styles.iter(f"{MAIN_NS}numFmt"):
+        formats[int(number_format.get("numFmtId"))] = number_format.get("formatCode")
+    found = {"datetime": None, "date": None}
+    cell_formats = styles.find(f"{MAIN_NS}cellXfs")
+    for i, xf in enumerate(cell_formats if cell_formats is not None else []):
+        code = formats.get(int(xf.get("numFmtId", 0)))
+        if code == DATETIME_FORMAT and found["datetime"] is None:
+            found["datetime"] = i
+        elif code == DATE_FORMAT and found["date"] is None:
+            found["date"] = i
+    return found
+
+
+def cell_xml(ref, value, styles):
+    """
+    Renders one cell the way openpyxl's write_only worksheets do (strings inline).
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}" t="n"><v>{value}</v></c>'
+    if isinstance(value, datetime.date):
+        kind = "datetime" if isinstance(value, datetime.datetime) else "date"
+        if styles[kind] is None:
+            raise ValueError(f"The workbook has no {kind} cell style to append {kind} values with; rebuild it "
+                             "with write_incremental_report")
+        return f'<c r="{ref}" s="{styles[kind]}" t="n"><v>{to_excel(value)}</v></c>'
+    text = str(value)
+    if ILLEGAL_CHARACTERS.search(text):
+        raise ValueError(f"{text!r} cannot be used in worksheets")
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}" t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def rows_xml(rows, first_row, styles):
+    """
+    Renders worksheet rows starting at sheet row number first_row.
+    """
+    parts, letters = [], []
+    for row_number, row in enumerate(rows, first_row):
+        while len(letters) < len(row):
+            letters.append(get_column_letter(len(letters) + 1))
+        cells = "".join(cell_xml(f"{letters[i]}{row_number}", value, styles) for i, value in enumerate(row))
+        parts.append(f'<row r="{row_number}">{cells}</row>')
+    return "".join(parts)
+
+
+def sheet_xml(rows, styles):
+    return WORKSHEET_HEAD + rows_xml(rows, 1, styles) + WORKSHEET_TAIL
+
+
+def deflate(data):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush()
+
+
+def new_entry(name, date_time=None):
+    info = zipfile.ZipInfo(name, date_time=date_time or time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.CRC = info.file_size = info.compress_size = 0
+    return info
+
+
+def write_entry(f, name, data, date_time=None):
+    """
+    Writes one deflated entry (local header and data) at the current position.
+    :return: ZipInfo for the central directory.
+    """
+    info = new_entry(name, date_time)
+    compressed = deflate(data)
+    info.CRC = zlib.crc32(data)
+    info.file_size = len(data)
+    info.compress_size = len(compressed)
+    info.header_offset = f.tell()
+    f.write(info.FileHeader())
+    f.write(compressed)
+    return info
+
+
+def append_deflated(f, chunks, state):
+    """
+    Compresses chunks as flushed (byte-aligned, non-final) deflate blocks that continue
+    the data sheet entry's stream, and counts them into the entry's prefix in state.
+    """
+    for chunk in chunks:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressed = compressor.compress(chunk) + compressor.flush(zlib.Z_FULL_FLUSH)
+        f.write(compressed)
+        state["prefix_size"] += len(compressed)
+        state["prefix_length"] += len(chunk)
+        state["prefix_crc"] = zlib.crc32(chunk, state["prefix_crc"])
+
+
+def finish_data_entry(f, info, state):
+    """
+    Ends the data sheet entry after its prefix with a separately compressed tail
+    ("</sheetData>..."), which the next refresh overwrites, and patches sizes and CRC
+    into its local header. The header is always written in zip64 form so its length
+    never changes.
+    """
+    tail = deflate(state["tail"])
+    f.write(tail)
+    end = f.tell()
+    info.CRC = zlib.crc32(state["tail"], state["prefix_crc"])
+    info.file_size = state["prefix_length"] + len(state["tail"])
+    info.compress_size = state["prefix_size"] + len(tail)
+    f.seek(info.header_offset)
+    f.write(info.FileHeader(zip64=True))
+    f.seek(end)
+
+
+def local_header_length(f, offset):
+    f.seek(offset)
+    header = f.read(LOCAL_HEADER.size)
+    signature, name_length, extra_length = LOCAL_HEADER.unpack(header)
+    if signature != b"PK\003\004":
+        raise ValueError(f"No zip entry at offset {offset}")
+    return LOCAL_HEADER.size + name_length + extra_length
+
+
+def without_zip64_extra(extra):
+    kept = []
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<2H", extra, position)
+        if header_id != 1:
+            kept.append(extra[position:position + 4 + length])
+        position += 4 + length
+    return b"".join(kept)
+
+
+def central_directory_record(info):
+    fields = []
+    file_size, compress_size, header_offset = info.file_size, info.compress_size, info.header_offset
+    if file_size > zipfile.ZIP64_LIMIT or compress_size > zipfile.ZIP64_LIMIT:
+        fields += [file_size, compress_size]
+        file_size = compress_size = 0xFFFFFFFF
+    if header_offset > zipfile.ZIP64_LIMIT:
+        fields.append(header_offset)
+        header_offset = 0xFFFFFFFF
+    extra = without_zip64_extra(info.extra)
+    if fields:
+        extra = struct.pack(f"<2H{len(fields)}Q", 1, 8 * len(fields), *fields) + extra
+    flag_bits = info.flag_bits
+    try:
+        name = info.filename.encode("ascii")
+    except UnicodeEncodeError:
+        name = info.filename.encode("utf-8")
+        flag_bits |= 0x800
+    year, month, day, hour, minute, second = info.date_time
+    extract_version = max(info.extract_version, zipfile.ZIP64_VERSION if fields else 0)
+    record = CENTRAL_DIRECTORY.pack(
+        b"PK\001\002", info.create_version, info.create_system, extract_version, 0, flag_bits,
+        info.compress_type, hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day,
+        info.CRC, compress_size, file_size, len(name), len(extra), len(info.comment), 0,
+        info.internal_attr, info.external_attr, header_offset)
+    return record + name + extra + info.comment
+
+
+def write_central_directory(f, entries):
+    """
+    Writes the central directory and end records for entries at the current position.
+    Only the public ZipInfo fields are used, so no ZipFile internals are touched.
+    """
+    start = f.tell()
+    for info in entries:
+        f.write(central_directory_record(info))
+    end = f.tell()
+    count, size, offset = len(entries), end - start, start
+    if count >= 0xFFFF or size > zipfile.ZIP64_LIMIT or offset > zipfile.ZIP64_LIMIT:
+        f.write(END_ARCHIVE64.pack(b"PK\006\006", END_ARCHIVE64.size - 12, zipfile.ZIP64_VERSION,
+                                   zipfile.ZIP64_VERSION, 0, 0, count, count, size, offset))
+        f.write(END_ARCHIVE64_LOCATOR.pack(b"PK\006\007", 0, end, 1))
+        count, size, offset = min(count, 0xFFFF), min(size, 0xFFFFFFFF), min(offset, 0xFFFFFFFF)
+    f.write(END_ARCHIVE.pack(b"PK\005\006", 0, 0, count, count, size, offset, 0))
+    f.truncate()
+
+
+def iter_split_sheet(stream, state, chunk_size=1 << 20):
+    """
+    Yields a worksheet XML stream up to "</sheetData>" in chunks and stores the rest,
+    the tail, in state["tail"] once the stream is consumed.
+    """
+    pending = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        pending += chunk
+        position = pending.find(SHEET_DATA_END)
+        if position >= 0:
+            yield pending[:position]
+            state["tail"] = pending[position:] + stream.read()
+            return
+        if not chunk:
+            raise ValueError("Worksheet has no </sheetData>")
+        keep = len(SHEET_DATA_END) - 1
+        yield pending[:-keep]
+        pending = pending[-keep:]
+
+
+def build_pivots(states, delta):
+    """
+    Feeds new rows into every pivot's accumulator and reshapes the pivot tables.
+    :return: List of (spec, table, seconds).
+    """
+    results = []
+    for spec, plans, accumulator in states:
+        start = time.perf_counter()
+        columns = list(dict.fromkeys(spec.keys + [value for plan in plans for value in plan]))
+        accumulator.update(delta[columns])
+        table = reshape_pivot(accumulator, spec.aggfunc, plans, spec.values, spec.index, spec.columns,
+                              fill_value=spec.fill_value, dropna=spec.dropna)
+        results.append((spec, table, time.perf_counter() - start))
+    return results
+
+
+def store_values(values, arrays):
+    """
+    Adds an Index or Series to the state arrays as a plain (non-object) NumPy array,
+    with a separate mask for missing values, so the state loads without pickle.
+    :return: JSON reference to the stored arrays.
+    """
+    missing = np.asarray(pd.isna(values))
+    array = np.asarray(values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values)
+    if array.dtype == object:
+        present = array[~missing]
+        if all(isinstance(value, str) for value in present):
+            array = np.where(missing, "", array).astype(str)
+        else:
+            array = np.array(list(np.where(missing, 0, array)))
+            if array.dtype == object:
+                kinds = sorted({type(value).__name__ for value in present})
+                raise ValueError(f"Cannot store {', '.join(kinds)} values in the pivot state")
+    reference = {"values": f"a{len(arrays)}", "missing": None}
+    arrays[reference["values"]] = array
+    if missing.any() and array.dtype.kind not in "fmM":
+        reference["missing"] = f"a{len(arrays)}"
+        arrays[reference["missing"]] = missing
+    return reference
+
+
+def load_values(reference, arrays):
+    array = arrays[reference["values"]]
+    if reference["missing"] is None:
+        return pd.Index(array) if array.dtype.kind == "U" else array
+    values = array.astype(object)
+    values[arrays[reference["missing"]]] = None
+    return pd.Index(values)
+
+
+def store_frame(frame, arrays):
+    """
+    :return: JSON description of a DataFrame (index levels and columns) whose data is
+             stored in the state arrays.
+    """
+    index = frame.index
+    return {
+        "index_names": list(index.names),
+        "index": [store_values(index.get_level_values(level), arrays) for level in range(index.nlevels)],
+        "columns": [list(column) if isinstance(column, tuple) else column for column in frame.columns],
+        "multi_columns": isinstance(frame.columns, pd.MultiIndex),
+        "values": [store_values(frame.iloc[:, i], arrays) for i in range(frame.shape[1])],
+    }
+
+
+def load_frame(description, arrays):
+    levels = [load_values(reference, arrays) for reference in description["index"]]
+    if len(levels) == 1:
+        index = pd.Index(levels[0], name=description["index_names"][0])
+    else:
+        index = pd.MultiIndex.from_arrays(levels, names=description["index_names"])
+    columns = description["columns"]
+    if description["multi_columns"]:
+        columns = pd.MultiIndex.from_tuples([tuple(column) for column in columns])
+    frame = pd.DataFrame({i: load_values(reference, arrays) for i, reference in enumerate(description["values"])},
+                         index=index)
+    frame.columns = columns
+    return frame
+
+
+def function_name(func):
+    # Callables are stored by name; the stored plans say what they compute
+    return func if isinstance(func, str) else func.__name__
+
+
+def store_pivot(spec, plans, accumulator, arrays):
+    aggfunc = spec.aggfunc
+    if isinstance(aggfunc, dict):
+        aggfunc = [[value, function_name(func)] for value, func in aggfunc.items()]
+    elif isinstance(aggfunc, list):
+        aggfunc = [function_name(func) for func in aggfunc]
+    else:
+        aggfunc = function_name(aggfunc)
+    return {
+        "spec": {"sheet_name": spec.sheet_name, "index": spec.index, "columns": spec.columns,
+                 "values": spec.values, "aggfunc": aggfunc, "dict_aggfunc": isinstance(spec.aggfunc, dict),
+                 "fill_value": spec.fill_value, "dropna": spec.dropna, "observed": spec.observed},
+        "plans": [list(plan.items()) for plan in plans],
+        "accumulator": {
+            "keys": accumulator.keys,
+            "specs": accumulator.specs,
+            "dropna": accumulator.dropna,
+            "hll_precision": accumulator.hll_precision,
+            "state": None if accumulator.state is None else store_frame(accumulator.state, arrays),
+            "distinct": [[value, store_frame(frame, arrays)] for value, frame in accumulator.distinct.items()],
+            "sketches": [[value, store_frame(frame, arrays)] for value, frame in accumulator.sketches.items()],
+        },
+    }
+
+
+def load_pivot(description, arrays):
+    arguments = dict(description["spec"])
+    if arguments.pop("dict_aggfunc"):
+        arguments["aggfunc"] = dict(arguments["aggfunc"])
+    spec = PivotSpec(**arguments)
+    plans = [dict(plan) for plan in description["plans"]]
+    stored = description["accumulator"]
+    accumulator = PivotAccumulator(stored["keys"], [tuple(pair) for pair in stored["specs"]],
+                                   dropna=stored["dropna"], hll_precision=stored["hll_precision"])
+    if stored["state"] is not None:
+        accumulator.state = load_frame(stored["state"], arrays)
+    accumulator.distinct = {value: load_frame(frame, arrays) for value, frame in stored["distinct"]}
+    accumulator.sketches = {value: load_frame(frame, arrays) for value, frame in stored["sketches"]}
+    return spec, plans, accumulator
+
+
+def save_state(state, file_name, state_path):
+    """
+    Records the workbook's size and modification time in the state and writes it to a
+    temporary file next to state_path: the aggregates as NumPy arrays and everything
+    else as a JSON header, in one .npz archive that loads without pickle.
+    :return: Path of the temporary state file, to be moved into place with os.replace.
+    """
+    status = os.stat(file_name)
+    arrays = {}
+    header = dict(state, workbook=[status.st_size, status.st_mtime_ns], tail=state["tail"].decode("utf-8"),
+                  pivots=[store_pivot(spec, plans, accumulator, arrays)
+                          for spec, plans, accumulator in state["pivots"]])
+    staging = state_path + ".tmp"
+    with open(staging, mode="wb") as f:
+        np.savez(f, header=np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8), **arrays)
+    return staging
+
+
+def load_state(state_path):
+    with np.load(state_path, allow_pickle=False) as arrays:
+        header = json.loads(arrays["header"].tobytes().decode("utf-8"))
+        if header.get("version") != STATE_VERSION:
+            raise ValueError(f"'{state_path}' was written by an incompatible version")
+        stored = {name: arrays[name] for name in arrays.files}
+    header["workbook"] = tuple(header["workbook"])
+    header["tail"] = header["tail"].encode("utf-8")
+    header["pivots"] = [load_pivot(pivot, stored) for pivot in header["pivots"]]
+    return header
+
+
+def commit_workbook(staging, file_name, state, state_path):
+    """
+    Moves a finished workbook and its state into place. The state is saved against the
+    staged workbook first; os.replace keeps its size and modification time.
+    """
+    state_staging = save_state(state, staging, state_path)
+    os.replace(staging, file_name)
+    os.replace(state_staging, state_path)
+    remove_quietly(journal_path_for(file_name))
+
+
+def journal_path_for(file_name):
+    return file_name + JOURNAL_SUFFIX
+
+
+def write_journal(f, file_name, header_offset, header_length, patch_offset):
+    """
+    Saves what an in-place refresh overwrites: the data entry's local header and every
+    byte from patch_offset to the end (the old tail, pivot sheets and central
+    directory), plus the size and modification time to restore. It is written to a
+    temporary file and moved into place, so it exists only when complete.
+    :return: Path of the journal.
+    """
+    status = os.fstat(f.fileno())
+    f.seek(header_offset)
+    header = f.read(header_length)
+    f.seek(patch_offset)
+    rest = f.read()
+    description = json.dumps({"size": status.st_size, "mtime_ns": status.st_mtime_ns,
+                              "header_offset": header_offset, "header_length": header_length,
+                              "patch_offset": patch_offset}).encode("utf-8")
+    journal = journal_path_for(file_name)
+    with open(journal + ".tmp", mode="wb") as j:
+        j.write(description + b"\n" + header + rest)
+        j.flush()
+        os.fsync(j.fileno())
+    os.replace(journal + ".tmp", journal)
+    return journal
+
+
+def roll_back(file_name):
+    """
+    Restores a workbook from the journal of an interrupted refresh, including its size
+    and modification time so that it matches its saved state again, and removes the
+    journal.
+    """
+    journal = journal_path_for(file_name)
+    with open(journal, mode="rb") as j:
+        description = json.loads(j.readline())
+        header = j.read(description["header_length"])
+        rest = j.read()
+    with open(file_name, mode="r+b") as f:
+        f.seek(description["header_offset"])
+        f.write(header)
+        f.seek(description["patch_offset"])
+        f.write(rest)
+        f.truncate(description["size"])
+        f.flush()
+        os.fsync(f.fileno())
+    os.utime(file_name, ns=(time.time_ns(), description["mtime_ns"]))
+    os.remove(journal)
+
+
+def recover_workbook(file_name, state):
+    """
+    Finishes the bookkeeping of a refresh that was interrupted: if the state was saved
+    the refresh completed and its journal is dropped, otherwise the workbook is rolled
+    back to match the state.
+    """
+    journal = journal_path_for(file_name)
+    if not os.path.exists(journal):
+        return
+    remove_quietly(journal + ".tmp")
+    status = os.stat(file_name)
+    if state["workbook"] == (status.st_size, status.st_mtime_ns):
+        os.remove(journal)
+    else:
+        roll_back(file_name)
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def write_incremental_report(df, file_name, pivots, data_sheet_name="DataSource", state_path=None,
+                             chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Writes the raw data sheet and pivot sheets like write_pivot_report, and saves the
+    pivots' partial aggregates in a sidecar file (<file_name>.pivotstate) so that
+    refresh_pivot_report can later append new rows without reprocessing the history.
+
+    Parameters:
+    df (pandas.DataFrame): The initial data
+    file_name (str): Name of the Excel file (e.g., 'report.xlsx')
+    pivots (list): PivotSpec objects, or dicts of PivotSpec arguments
+    data_sheet_name (str): Name of the worksheet for raw data
+    state_path (str): Sidecar path for the aggregate state (default: <file_name>.pivotstate)
+    chunk_rows (int): Rows converted per chunk while writing
+
+    Returns:
+    dict: Seconds spent per pivot sheet under "pivots", and in "write"
+    """
+    specs = [spec if isinstance(spec, PivotSpec) else PivotSpec(**spec) for spec in pivots]
+    states = []
+    for spec in specs:
+        targets = [spec.values] if isinstance(spec.values, str) else spec.values
+        if targets is None:
+            targets = [column for column in df.columns if column not in spec.keys]
+        aggfuncs = spec.aggfunc if isinstance(spec.aggfunc, list) else [spec.aggfunc]
+        plans = [aggregation_plan(list(targets), func) for func in aggfuncs]
+        states.append((spec, plans, PivotAccumulator(spec.keys, plan_specs(plans), dropna=spec.dropna)))
+    built = build_pivots(states, df)
+    timings = {"pivots": {spec.sheet_name: seconds for spec, _, seconds in built}}
+
+    start = time.perf_counter()
+    staging = file_name + ".tmp"
+    packed = file_name + ".pack.tmp"
+    try:
+        write_sheets_streaming(staging, [(data_sheet_name, df)] +
+                               [(spec.sheet_name, pivot_sheet_frame(table)) for spec, table, _ in built],
+                               chunk_rows=chunk_rows)
+
+        # Repack: data sheet after the static parts and the pivot sheets last, so a
+        # refresh only rewrites the end of the file
+        with zipfile.ZipFile(staging) as source, open(packed, mode="wb") as f:
+            parts = sheet_parts(source)
+            data_part = parts[data_sheet_name]
+            pivot_parts = {spec.sheet_name: parts[spec.sheet_name] for spec in specs}
+            entries = [write_entry(f, entry.filename, source.read(entry.filename))
+                       for entry in source.infolist()
+                       if entry.filename != data_part and entry.filename not in pivot_parts.values()]
+
+            state = {
+                "version": STATE_VERSION,
+                "data_sheet": data_sheet_name,
+                "data_part": data_part,
+                "pivot_parts": pivot_parts,
+                "columns": [str(column) for column in df.columns],
+                "rows": len(df) + 1,
+                "styles": date_styles(source),
+                "prefix_size": 0,
+                "prefix_length": 0,
+                "prefix_crc": 0,
+                "pivots": states,
+            }
+            info = new_entry(data_part)
+            info.header_offset = f.tell()
+            f.write(info.FileHeader(zip64=True))
+            with source.open(data_part) as stream:
+                append_deflated(f, iter_split_sheet(stream, state), state)
+            finish_data_entry(f, info, state)
+            entries.append(info)
+            for spec, table, _ in built:
+                entries.append(write_entry(f, pivot_parts[spec.sheet_name],
+                                           sheet_xml(iter_sheet_rows(pivot_sheet_frame(table)),
+                                                     state["styles"]).encode("utf-8")))
+            write_central_directory(f, entries)
+        commit_workbook(packed, file_name, state, state_path or state_path_for(file_name))
+    finally:
+        remove_quietly(staging)
+        remove_quietly(packed)
+    timings["write"] = time.perf_counter() - start
+    return timings
+
+
+def refresh_pivot_report(delta, file_name, state_path=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Appends new rows to a workbook written by write_incremental_report and updates its
+    pivot sheets from the stored partial aggregates. Only the new rows are aggregated
+    and compressed, and the workbook is patched in place from the end of its data rows,
+    so the work and I/O follow the size of the delta, not the history. The bytes a
+    refresh overwrites are journaled (<file_name>.journal) first, so a failed or
+    interrupted refresh leaves, or on the next refresh restores, the workbook and its
+    state unchanged.
+
+    Parameters:
+    delta (pandas.DataFrame): New rows, with the same columns as the original data
+    file_name (str): Name of the Excel file
+    state_path (str): Sidecar path for the aggregate state (default: <file_name>.pivotstate)
+    chunk_rows (int): Rows rendered per compressed chunk
+
+    Returns:
+    dict: Seconds spent per pivot sheet under "pivots", and in "write"
+    """
+    state_path = state_path or state_path_for(file_name)
+    state = load_state(state_path)
+    recover_workbook(file_name, state)
+    status = os.stat(file_name)
+    if state["workbook"] != (status.st_size, status.st_mtime_ns):
+        raise ValueError(f"'{file_name}' changed since its pivot state was saved; rebuild it with "
+                         "write_incremental_report")
+    columns = [str(column) for column in delta.columns]
+    if sorted(columns) != sorted(state["columns"]):
+        raise ValueError(f"Delta columns {columns} do not match the workbook columns {state['columns']}")
+    delta = delta[[delta.columns[columns.index(column)] for column in state["columns"]]]
+
+    # Render and compress the new rows before anything is written, so a value that
+    # cannot be stored fails the refresh with the workbook untouched
+    start = time.perf_counter()
+    spool = tempfile.TemporaryFile()
+    try:
+        prefix_size = state["prefix_size"]
+        chunks = (rows_xml(list(iter_sheet_rows(delta.iloc[offset:offset + chunk_rows]))[1:],
+                           state["rows"] + 1 + offset, state["styles"]).encode("utf-8")
+                  for offset in range(0, len(delta), chunk_rows))
+        append_deflated(spool, chunks, state)
+        render = time.perf_counter() - start
+
+        built = build_pivots(state["pivots"], delta)
+        timings = {"pivots": {spec.sheet_name: seconds for spec, _, seconds in built}}
+        pivot_sheets = [(state["pivot_parts"][spec.sheet_name],
+                         sheet_xml(iter_sheet_rows(pivot_sheet_frame(table)), state["styles"]).encode("utf-8"))
+                        for spec, table, _ in built]
+
+        # Patch the workbook in place from the end of the data prefix onwards. The bytes
+        # that get overwritten are journaled first, so a failure restores them
+        start = time.perf_counter()
+        with zipfile.ZipFile(file_name) as archive:
+            entries = [entry for entry in archive.infolist()
+                       if entry.filename not in state["pivot_parts"].values()]
+        with open(file_name, mode="r+b") as f:
+            position = next(i for i, entry in enumerate(entries) if entry.filename == state["data_part"])
+            info = new_entry(state["data_part"], entries[position].date_time)
+            info.header_offset = entries[position].header_offset
+            header_length = len(info.FileHeader(zip64=True))
+            if local_header_length(f, info.header_offset) != header_length:
+                raise ValueError(f"'{file_name}' was not written by write_incremental_report")
+            journal = write_journal(f, file_name, info.header_offset, header_length,
+                                    info.header_offset + header_length + prefix_size)
+            try:
+                entries[position] = info
+                f.seek(info.header_offset + header_length + prefix_size)
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+                finish_data_entry(f, info, state)
+                for part, xml in pivot_sheets:
+                    entries.append(write_entry(f, part, xml))
+                write_central_directory(f, entries)
+                f.flush()
+                os.fsync(f.fileno())
+                state["rows"] += len(delta)
+                state_staging = save_state(state, file_name, state_path)
+                os.replace(state_staging, state_path)
+            except BaseException:
+                remove_quietly(state_path + ".tmp")
+                f.close()
+                roll_back(file_name)
+                raise
+        os.remove(journal)
+    finally:
+        spool.close()
+    timings["write"] = render + time.perf_counter() - start
+    return timings
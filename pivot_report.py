@@ -0,0 +1,128 @@
+import time
+
+import pandas as pd
+
+from chunked_pivot import HLL_PRECISION, PivotAccumulator, aggregation_plan, as_list, plan_specs, reshape_pivot
+from excel_stream import DEFAULT_CHUNK_ROWS, as_frame, write_sheets_streaming
+
+
+class PivotSpec:
+    """
+    One pivot of a report: the pd.pivot_table arguments plus the sheet it is written to.
+    """
+
+    def __init__(self, sheet_name, index=None, columns=None, values=None, aggfunc="mean", fill_value=None,
+                 dropna=True, observed=True):
+        self.sheet_name = sheet_name
+        self.index = as_list(index)
+        self.columns = as_list(columns)
+        self.values = values
+        self.aggfunc = aggfunc
+        self.fill_value = fill_value
+        self.dropna = dropna
+        self.observed = observed
+        if not self.index and not self.columns:
+            raise ValueError(f"Pivot '{sheet_name}' needs at least one index or columns key")
+
+    @property
+    def keys(self):
+        return self.index + self.columns
+
+    def __repr__(self):
+        return f"PivotSpec({self.sheet_name!r})"
+
+
+def factorize_columns(df, columns):
+    """
+    Factorizes each grouping column once. Categorical columns reuse their codes and
+    decode through a CategoricalIndex of their own dtype, so pivots keep the category
+    order (and unobserved categories when observed=False) like pd.pivot_table.
+    :return: Dictionary column -> (codes, labels) with -1 codes for missing values.
+    """
+    factorized = {}
+    for column in columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            factorized[column] = (series.cat.codes.to_numpy(),
+                                 pd.CategoricalIndex(series.cat.categories, dtype=series.dtype))
+        else:
+            codes, uniques = pd.factorize(series, sort=True)
+            factorized[column] = (codes, pd.Index(uniques))
+    return factorized
+
+
+def pivot_from_codes(df, factorized, spec, hll_precision=HLL_PRECISION):
+    """
+    Computes one pivot by grouping on the shared integer codes instead of the raw
+    columns; returns the same table as pd.pivot_table with the spec's arguments.
+    """
+    keys = spec.keys
+    value_list = None if spec.values is None else as_list(spec.values)
+    targets = value_list if value_list is not None else [column for column in df.columns if column not in keys]
+    aggfuncs = spec.aggfunc if isinstance(spec.aggfunc, list) else [spec.aggfunc]
+    plans = [aggregation_plan(targets, func) for func in aggfuncs]
+
+    frame = df[list(dict.fromkeys(value for plan in plans for value in plan))].reset_index(drop=True)
+    for key in keys:
+        frame[key] = factorized[key][0]
+    if spec.dropna:
+        frame = frame[(frame[keys] >= 0).all(axis=1)]
+
+    # Codes are never NaN, so missing keys are filtered above (dropna) or kept as -1
+    accumulator = PivotAccumulator(keys, plan_specs(plans), dropna=False, hll_precision=hll_precision)
+    accumulator.update(frame)
+    return reshape_pivot(accumulator, spec.aggfunc, plans, spec.values, spec.index, spec.columns,
+                         fill_value=spec.fill_value, dropna=spec.dropna,
+                         observed=spec.observed, labels={key: factorized[key][1] for key in keys})
+
+
+def pivot_sheet_frame(table):
+    """
+    Flattens a pivot table for writing with index=False: index levels become columns
+    and multi-level column labels are joined with " / ".
+    """
+    frame = table.reset_index()
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame.columns = [" / ".join(str(part) for part in column if part != "") for column in frame.columns]
+    return frame
+
+
+def write_pivot_report(df, file_name, pivots, data_sheet_name="Data", include_data=True, backend="openpyxl",
+                       chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Builds several pivots of one DataFrame and writes them, with the raw data, to one
+    workbook in a single save. Every grouping column used by any pivot is factorized
+    once and the integer codes are shared by all pivots.
+
+    Parameters:
+    df (pandas.DataFrame): The DataFrame to pivot, or a pyarrow Table or Parquet/Arrow file path
+    file_name (str): Name of the Excel file (e.g., 'report.xlsx')
+    pivots (list): PivotSpec objects, or dicts of PivotSpec arguments
+                   (sheet_name, index, columns, values, aggfunc, fill_value, dropna, observed)
+    data_sheet_name (str): Name of the worksheet for raw data
+    include_data (bool): Also write the raw data sheet
+    backend (str): Streaming backend, "openpyxl" (write_only) or "xlsxwriter" (constant_memory)
+    chunk_rows (int): Rows converted per chunk while writing
+
+    Returns:
+    dict: Seconds spent in "factorize", per pivot sheet under "pivots", and in "write"
+    """
+    df = as_frame(df)
+    specs = [spec if isinstance(spec, PivotSpec) else PivotSpec(**spec) for spec in pivots]
+    timings = {"pivots": {}}
+
+    start = time.perf_counter()
+    factorized = factorize_columns(df, list(dict.fromkeys(key for spec in specs for key in spec.keys)))
+    timings["factorize"] = time.perf_counter() - start
+
+    sheets = [(data_sheet_name, df)] if include_data else []
+    for spec in specs:
+        start = time.perf_counter()
+        table = pivot_from_codes(df, factorized, spec)
+        timings["pivots"][spec.sheet_name] = time.perf_counter() - start
+        sheets.append((spec.sheet_name, pivot_sheet_frame(table)))
+
+    start = time.perf_counter()
+    write_sheets_streaming(file_name, sheets, backend=backend, chunk_rows=chunk_rows)
+    timings["write"] = time.perf_counter() - start
+    return timings
@@ -1,17 +1,42 @@
 import pandas as pd
 
-def write_df_to_excel_with_pivot(df, file_name, sheet_name, pivot_sheet_name, pivot_func):
+from chunked_pivot import iter_source_chunks
+from excel_stream import as_frame, write_sheets_streaming
+
+def write_df_to_excel_with_pivot(df, file_name, sheet_name, pivot_sheet_name, pivot_func,
+                                 streaming=False, backend="openpyxl"):
     """
     Write a pandas DataFrame to a named Excel file and worksheet, preserving column names,
     and create a pivot table in another sheet within the same file using a provided pivot function.
     
     Parameters:
-    df (pandas.DataFrame): The DataFrame to write
+    df (pandas.DataFrame, pyarrow.Table or str): The DataFrame to write, or a Parquet/Arrow path; when
+                                  streaming, also a CSV path or an iterable of DataFrame chunks. When
+                                  streaming, a path is passed to pivot_func as is (pass a
+                                  chunked_pivot_table-based pivot_func) and read again in chunks for the
+                                  data sheet; chunks can only be read once, so they are concatenated first
     file_name (str): Name of the Excel file (e.g., 'output.xlsx')
     sheet_name (str): Name of the worksheet for raw data
     pivot_sheet_name (str): Name of the worksheet for pivot table
     pivot_func (callable): Function that takes a DataFrame and returns a pivot table DataFrame
+    streaming (bool): Stream rows to disk with constant memory instead of building the workbook in memory
+    backend (str): Streaming backend, "openpyxl" (write_only) or "xlsxwriter" (constant_memory)
     """
+    if streaming:
+        if isinstance(df, str):
+            pivot_table = pivot_func(df)
+            rows = iter_source_chunks(df)
+        else:
+            if not isinstance(df, pd.DataFrame) and not hasattr(df, "to_batches"):
+                chunks = list(df)
+                df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+            # A pyarrow Table is still streamed to the data sheet batch by batch
+            pivot_table = pivot_func(as_frame(df))
+            rows = df
+        write_sheets_streaming(file_name, [(sheet_name, rows), (pivot_sheet_name, pivot_table)], backend=backend)
+        return
+
+    df = as_frame(df)
     # Create ExcelWriter object
     with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
         # Write original DataFrame to specified sheet, including column names
@@ -0,0 +1,235 @@
+from alias_index import DerivedTable
+from sql_lexer import CLAUSE_KEYWORDS, JOIN_WORDS, SET_OPERATORS, is_name, parse_alias, tokenize, unquote
+
+
+class Branch:
+    """
+    One SELECT block of a decomposed statement: the text from its SELECT keyword up to
+    the next set operator, ';' or the end of the enclosing query.
+    """
+    __slots__ = ("tokens", "depth", "start", "end", "subqueries")
+
+    def __init__(self, tokens, depth, start, end):
+        self.tokens = tokens
+        self.depth = depth
+        self.start = start
+        self.end = end
+        self.subqueries = []
+
+    def text(self, query):
+        return query[self.start:self.end]
+
+    def masked_text(self, query):
+        """
+        Returns the branch text with every FROM subquery replaced by its alias, so
+        pattern-based parsers see a plain table reference in its place.
+        """
+        parts = []
+        position = self.start
+        for subquery in self.subqueries:
+            parts.append(query[position:subquery.start])
+            parts.append(subquery.alias)
+            position = subquery.end
+        parts.append(query[position:self.end])
+        return "".join(parts)
+
+
+class Subquery:
+    """
+    A parenthesized query in a FROM clause, with the alias it is referenced by.
+    """
+    __slots__ = ("alias", "body", "start", "end")
+
+    def __init__(self, alias, body, start, end):
+        self.alias = alias
+        self.body = body
+        self.start = start
+        self.end = end
+
+
+class CommonTableExpression:
+    """
+    A WITH clause entry. ``columns`` is the optional column list after its name.
+    """
+    __slots__ = ("name", "columns", "body")
+
+    def __init__(self, name, columns, body):
+        self.name = name
+        self.columns = columns
+        self.body = body
+
+
+class Decomposition:
+    """
+    A statement split into its CTEs (in definition order) and its UNION/INTERSECT/EXCEPT
+    branches. CTE and subquery bodies are Decompositions of their own.
+    """
+    __slots__ = ("ctes", "branches")
+
+    def __init__(self):
+        self.ctes = []
+        self.branches = []
+
+
+def match_parentheses(tokens):
+    """
+    Pairs every '(' with its ')' in one pass.
+    :return: List where the entry for a '(' is the index of its ')'. Unclosed
+             parentheses pair with the end of the token list.
+    """
+    partner = [None] * len(tokens)
+    stack = []
+    for i, token in enumerate(tokens):
+        if token.value == "(":
+            stack.append(i)
+        elif token.value == ")" and stack:
+            partner[stack.pop()] = i
+    for i in stack:
+        partner[i] = len(tokens)
+    return partner
+
+
+def decompose(query):
+    """
+    Splits a statement into CTEs, set-operation branches and FROM subqueries in a single
+    walk over its tokens. Every token is visited once at its own nesting depth, so
+    long generated views decompose in linear time, and keywords inside string literals,
+    quoted identifiers or nested queries never split a branch.
+    :param query: SQL query string.
+    :return: Decomposition instance.
+    """
+    tokens = tokenize(query)
+    return decompose_range(query, tokens, match_parentheses(tokens), 0, len(tokens), 0)
+
+
+def decompose_range(query, tokens, partner, lo, hi, depth):
+    decomposition = Decomposition()
+    i = lo
+    while i < hi:
+        if tokens[i].upper == "WITH":
+            i = parse_with_clause(query, tokens, partner, i + 1, hi, depth, decomposition)
+        start = i
+        while i < hi and tokens[i].value != ";" and tokens[i].upper not in SET_OPERATORS:
+            i = partner[i] + 1 if tokens[i].value == "(" else i + 1
+        add_branch(query, tokens, partner, start, min(i, hi), depth, decomposition)
+        i += 1
+        if i < hi and tokens[i].upper in ("ALL", "DISTINCT"):
+            i += 1
+    return decomposition
+
+
+def parse_with_clause(query, tokens, partner, i, hi, depth, decomposition):
+    """
+    Adds the CTEs of a WITH clause starting at ``tokens[i]`` to the decomposition.
+    :return: Index of the first token after the WITH clause.
+    """
+    if i < hi and tokens[i].upper == "RECURSIVE":
+        i += 1
+    while i < hi and is_name(tokens[i]):
+        name = unquote(tokens[i])
+        columns = None
+        i += 1
+        if i < hi and tokens[i].value == "(":
+            close = partner[i]
+            columns = [unquote(token) for token in tokens[i + 1:min(close, hi)] if token.value != ","]
+            i = close + 1
+        if i < hi and tokens[i].upper == "AS":
+            i += 1
+        while i < hi and tokens[i].upper in ("NOT", "MATERIALIZED"):
+            i += 1
+        if i >= hi or tokens[i].value != "(":
+            break
+        close = min(partner[i], hi)
+        body = decompose_range(query, tokens, partner, i + 1, close, depth + 1)
+        decomposition.ctes.append(CommonTableExpression(name, columns, body))
+        i = close + 1
+        if i >= hi or tokens[i].value != ",":
+            break
+        i += 1
+    return i
+
+
+def add_branch(query, tokens, partner, lo, hi, depth, decomposition):
+    """
+    Adds the query block in ``tokens[lo:hi]`` to the decomposition, recording the
+    subqueries in its FROM clause. A block that is only a parenthesized query is
+    decomposed one level down instead.
+    """
+    if lo >= hi:
+        return
+    select = None
+    from_seen = in_from = table_position = False
+    subqueries = []
+    i = lo
+    while i < hi:
+        token = tokens[i]
+        if token.value == "(":
+            close = min(partner[i], hi)
+            if table_position and i + 1 < close and tokens[i + 1].upper in ("SELECT", "WITH"):
+                alias = parse_alias(tokens[close + 1:min(close + 3, hi)])
+                if alias is not None:
+                    end = tokens[close].end if close < hi else tokens[hi - 1].end
+                    body = decompose_range(query, tokens, partner, i + 1, close, depth + 1)
+                    subqueries.append(Subquery(alias, body, token.start, end))
+            table_position = False
+            i = close + 1
+            continue
+        if token.kind == "word":
+            if token.upper == "SELECT" and select is None:
+                select = i
+            elif token.upper == "FROM" and select is not None and not from_seen:
+                from_seen = in_from = True
+            elif token.upper in CLAUSE_KEYWORDS:
+                in_from = False
+        table_position = in_from and (token.value == "," or token.upper == "FROM" or token.upper in JOIN_WORDS)
+        i += 1
+
+    if select is None:
+        if tokens[lo].value == "(":
+            inner = decompose_range(query, tokens, partner, lo + 1, min(partner[lo], hi), depth + 1)
+            decomposition.ctes.extend(inner.ctes)
+            decomposition.branches.extend(inner.branches)
+        return
+    branch = Branch(tokens[select:hi], depth, tokens[select].start, tokens[hi - 1].end)
+    branch.subqueries = subqueries
+    decomposition.branches.append(branch)
+
+
+def rename_columns(columns, names):
+    """
+    Applies a CTE column list to its body's output columns, by position in each branch.
+    """
+    return [(names[i % len(names)], source_column, source_table)
+            for i, (_, source_column, source_table) in enumerate(columns)]
+
+
+def trace_lineage(query, decomposition, parse_branch, catalog=None, ctes=None):
+    """
+    Parses each fragment of a decomposed statement exactly once. CTEs are parsed before
+    the branches that reference them and become DerivedTables, so columns selected
+    through a CTE name trace back to the physical tables in its body; FROM subqueries
+    are handled the same way under their alias.
+    :param query: SQL query string the decomposition was built from.
+    :param decomposition: Decomposition from decompose().
+    :param parse_branch: Callable (query, branch, catalog, ctes, derived) returning the
+                         (output_column, source_column, source_table) tuples of one branch.
+                         ``ctes`` maps lower-case CTE names and ``derived`` maps subquery
+                         aliases to DerivedTable objects.
+    :param catalog: Optional SchemaCatalog used to resolve unqualified columns.
+    :param ctes: CTEs visible from an enclosing query.
+    :return: List of tuples (output_column, source_column, source_table).
+    """
+    ctes = dict(ctes) if ctes else {}
+    for cte in decomposition.ctes:
+        columns = trace_lineage(query, cte.body, parse_branch, catalog, ctes)
+        if cte.columns:
+            columns = rename_columns(columns, cte.columns)
+        ctes[cte.name.lower()] = DerivedTable(cte.name, columns)
+
+    result = []
+    for branch in decomposition.branches:
+        derived = {subquery.alias: DerivedTable(subquery.alias,
+                                                trace_lineage(query, subquery.body, parse_branch, catalog, ctes))
+                   for subquery in branch.subqueries}
+        result.extend(parse_branch(query, branch, catalog, ctes, derived))
+    return result
@@ -0,0 +1,329 @@
+import re
+
+from alias_index import AliasIndex, DerivedTable
+
+# One alternation per token kind; the scanner walks the query exactly once.
+TOKEN_PATTERN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>'(?:[^']|'')*(?:'|\Z))
+  | (?P<qident>"(?:[^"]|"")*(?:"|\Z)|`[^`]*(?:`|\Z)|\[[^\]]*(?:\]|\Z))
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<word>[^\W\d]\w*(?:\$\w*)*)
+  | (?P<punct>[(),;.*])
+  | (?P<op><>|!=|<=|>=|\|\||::|[^\s\w])
+""", re.VERBOSE | re.DOTALL)
+
+# Keywords that end a SELECT list / FROM clause at the current nesting depth
+CLAUSE_KEYWORDS = frozenset({
+    "SELECT", "FROM", "WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET", "FETCH",
+    "QUALIFY", "WINDOW", "UNION", "INTERSECT", "EXCEPT", "MINUS", "INTO",
+})
+SET_OPERATORS = frozenset({"UNION", "INTERSECT", "EXCEPT", "MINUS"})
+# Words that can never be a bare (AS-less) alias
+RESERVED = CLAUSE_KEYWORDS | frozenset({
+    "AS", "ON", "AND", "OR", "NOT", "IS", "NULL", "IN", "LIKE", "BETWEEN", "CASE", "WHEN",
+    "THEN", "ELSE", "END", "DISTINCT", "ALL", "JOIN", "INNER", "LEFT", "RIGHT", "FULL",
+    "OUTER", "CROSS", "NATURAL", "USING", "WITH", "BY", "ASC", "DESC",
+})
+# Words that separate table references in a FROM clause
+JOIN_WORDS = frozenset({"JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL"})
+
+
+class Token:
+    __slots__ = ("kind", "value", "upper", "start", "end", "depth")
+
+    def __init__(self, kind, value, start, end, depth):
+        self.kind = kind
+        self.value = value
+        self.upper = value.upper() if kind == "word" else value
+        self.start = start
+        self.end = end
+        self.depth = depth
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r}, depth={self.depth})"
+
+
+def tokenize(query):
+    """
+    Splits a query into significant tokens (whitespace and comments dropped), recording
+    the parenthesis depth of each token. Brackets inside string literals and quoted
+    identifiers are never counted.
+    :param query: SQL query string.
+    :return: List of Token objects.
+    """
+    tokens = []
+    depth = 0
+    for match in TOKEN_PATTERN.finditer(query):
+        kind = match.lastgroup
+        if kind == "ws" or kind == "comment":
+            continue
+        value = match.group()
+        if value == ")":
+            depth = max(depth - 1, 0)
+        tokens.append(Token(kind, value, match.start(), match.end(), depth))
+        if value == "(":
+            depth += 1
+    return tokens
+
+
+def unquote(token):
+    if token.kind == "qident":
+        return token.value[1:-1]
+    return token.value
+
+
+def split_top_level(tokens, separator, depth):
+    """
+    Splits a token list on a punctuation separator that appears at the given depth.
+    """
+    parts = []
+    current = []
+    for token in tokens:
+        if token.depth == depth and token.value == separator:
+            parts.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_branches(tokens, depth=0):
+    """
+    Finds the SELECT list and FROM clause of every query block at the given depth in one
+    pass. Blocks are separated by ';' or by UNION/INTERSECT/EXCEPT. WITH clauses are
+    skipped because their bodies sit one level deeper.
+    :param tokens: Tokens from tokenize(), all at ``depth`` or deeper.
+    :param depth: Parenthesis depth of the query blocks.
+    :return: List of (select_tokens, from_tokens) tuples, one per query block.
+    """
+    branches = []
+    select_tokens = from_tokens = None
+    target = None
+
+    def close():
+        if select_tokens is not None:
+            branches.append((select_tokens, from_tokens or []))
+
+    for token in tokens:
+        if token.depth != depth:
+            if target is not None:
+                target.append(token)
+            continue
+        if token.value == ";" or token.upper in SET_OPERATORS:
+            close()
+            select_tokens = from_tokens = target = None
+        elif token.upper == "SELECT":
+            close()
+            select_tokens, from_tokens = [], None
+            target = select_tokens
+        elif token.upper == "FROM" and select_tokens is not None and from_tokens is None:
+            from_tokens = []
+            target = from_tokens
+        elif token.kind == "word" and token.upper in CLAUSE_KEYWORDS:
+            target = None
+        elif target is not None:
+            target.append(token)
+    close()
+    return branches
+
+
+def split_table_references(from_tokens, depth):
+    """
+    Splits a FROM clause into table references on commas and JOIN keywords, dropping
+    ON/USING join conditions.
+    """
+    items = []
+    current = []
+    in_condition = False
+    for token in from_tokens:
+        if token.depth == depth:
+            if token.value == "," or token.upper in JOIN_WORDS:
+                if current:
+                    items.append(current)
+                current = []
+                in_condition = False
+                continue
+            if token.upper in ("ON", "USING"):
+                in_condition = True
+        if not in_condition:
+            current.append(token)
+    if current:
+        items.append(current)
+    return items
+
+
+def closing_index(tokens, start):
+    """
+    Returns the index of the ')' matching the '(' at ``tokens[start]``.
+    """
+    depth = tokens[start].depth
+    for i in range(start + 1, len(tokens)):
+        if tokens[i].value == ")" and tokens[i].depth == depth:
+            return i
+    return len(tokens)
+
+
+def parse_alias(rest):
+    if rest and rest[0].upper == "AS":
+        rest = rest[1:]
+    if rest and is_name(rest[0]):
+        return unquote(rest[0])
+    return None
+
+
+def parse_table_list(query, from_tokens, depth=0, catalog=None, tables=None, ctes=None, derived=None):
+    """
+    Builds the alias -> table index for a FROM clause, including JOINed tables and
+    subqueries. Schema-qualified names resolve to their last part, matching sqlparse's
+    get_real_name(). Subqueries and CTE references become DerivedTable entries whose
+    columns trace back to the physical tables they select from.
+    :param query: Original SQL text (for slicing subquery text).
+    :param from_tokens: Tokens of the FROM clause.
+    :param depth: Parenthesis depth of the FROM clause.
+    :param catalog: Optional SchemaCatalog for unqualified columns.
+    :param tables: AliasIndex to add to (used for parenthesized joins).
+    :param ctes: Dictionary of lower-case CTE names to DerivedTable objects.
+    :param derived: Dictionary of subquery aliases to already parsed DerivedTable objects.
+    :return: AliasIndex mapping aliases to table names, in FROM order.
+    """
+    if tables is None:
+        tables = AliasIndex(catalog)
+    for item in split_table_references(from_tokens, depth):
+        if item[0].value == "(":
+            close = closing_index(item, 0)
+            inner = item[1:close]
+            alias = parse_alias(item[close + 1:])
+            if inner and inner[0].upper in ("SELECT", "WITH"):
+                if alias is not None and derived and alias in derived:
+                    tables[alias] = derived[alias]
+                elif alias is not None:
+                    tables[alias] = DerivedTable(alias, parse_tokens(query, inner, depth + 1, catalog, ctes))
+            else:
+                # Parenthesized join: (a JOIN b ON ...)
+                parse_table_list(query, inner, depth + 1, catalog, tables, ctes, derived)
+            continue
+
+        position = 0
+        table_name = unquote(item[0])
+        while position + 2 < len(item) and item[position + 1].value == ".":
+            position += 2
+            table_name = unquote(item[position])
+        alias = parse_alias(item[position + 1:]) or table_name
+        # Unqualified names may refer to a CTE rather than a physical table
+        table = ctes.get(table_name.lower(), table_name) if ctes and position == 0 else table_name
+        tables[alias] = table
+        # Also accept the table name itself as a qualifier
+        if table_name not in tables:
+            tables[table_name] = table
+    return tables
+
+
+def is_name(token):
+    return token.kind == "qident" or (token.kind == "word" and token.upper not in RESERVED)
+
+
+def split_alias(item):
+    """
+    Separates a trailing ``AS alias`` or bare alias from a select-list item.
+    :return: Tuple (expression_tokens, alias or None).
+    """
+    if len(item) >= 3 and item[-2].upper == "AS":
+        return item[:-2], unquote(item[-1])
+    if len(item) >= 2 and is_name(item[-1]):
+        previous = item[-2]
+        if (is_name(previous) or previous.kind in ("string", "number")
+                or previous.value == ")" or previous.upper == "END"):
+            return item[:-1], unquote(item[-1])
+    return item, None
+
+
+def is_column_reference(expression):
+    """
+    True for ``name``, ``qualifier.name`` (any number of parts) and ``qualifier.*``.
+    """
+    if len(expression) % 2 == 0:
+        return False
+    last = len(expression) - 1
+    for i, token in enumerate(expression):
+        if i % 2:
+            if token.value != ".":
+                return False
+        elif not (is_name(token) or (token.value == "*" and i == last)):
+            return False
+    return True
+
+
+def is_function_call(expression):
+    """
+    True for ``name(...)`` where the parenthesis opened after the name closes the expression.
+    """
+    if len(expression) < 3 or expression[0].kind != "word" or expression[1].value != "(":
+        return False
+    return closing_index(expression, 1) == len(expression) - 1
+
+
+def parse_select_item(query, item, tables):
+    """
+    Classifies one select-list item as a column reference, a function call or an
+    arbitrary expression. A computed item has no single source column, so its source
+    is the expression text and its table "Unknown" (with_Sql_parser reports an aliased
+    one as its leading name, resolved like an unqualified column).
+    :return: Tuple (output_column, source_column, source_table).
+    """
+    if item and item[0].upper in ("DISTINCT", "ALL"):
+        item = item[1:]
+    expression, alias = split_alias(item)
+    if not expression:
+        return None
+
+    if is_column_reference(expression):
+        column = unquote(expression[-1])
+        qualifier = unquote(expression[-3]) if len(expression) >= 3 else None
+        source_column, source_table = tables.resolve(qualifier, column)
+        return alias or column, source_column, source_table
+
+    text = query[expression[0].start:expression[-1].end]
+    if is_function_call(expression):
+        return alias or expression[0].value, text, "Unknown"
+    return alias or text, text, "Unknown"
+
+
+def parse_tokens(query, tokens, depth=0, catalog=None, ctes=None, derived=None):
+    """
+    Extracts (output_column, source_column, source_table) tuples from every query block
+    at the given depth.
+    """
+    result = []
+    for select_tokens, from_tokens in split_branches(tokens, depth):
+        tables = parse_table_list(query, from_tokens, depth, catalog, ctes=ctes, derived=derived)
+        for item in split_top_level(select_tokens, ",", depth):
+            column_data = parse_select_item(query, item, tables)
+            if column_data:
+                result.append(column_data)
+    return result
+
+
+def parse_branch(query, branch, catalog=None, ctes=None, derived=None):
+    """
+    Parses one sql_decompose.Branch from the tokens the decomposition already produced.
+    """
+    return parse_tokens(query, branch.tokens, branch.depth, catalog, ctes, derived)
+
+
+def parse_select_statement(query, catalog=None):
+    """
+    Single-pass lexer backend for SQL SELECT lineage extraction. Tokenizes the query
+    once, tracking parenthesis depth and string literals, decomposes it into CTEs and
+    set-operation branches, then walks each branch's tokens to find its SELECT list
+    and FROM clause.
+    :param query: SQL query string.
+    :param catalog: Optional SchemaCatalog used to resolve unqualified columns.
+    :return: List of tuples (output_column, source_column, source_table).
+    """
+    # sql_decompose builds on this module's tokenizer, so it is imported here
+    from sql_decompose import decompose, trace_lineage
+    return trace_lineage(query, decompose(query), parse_branch, catalog)
@@ -1,50 +1,166 @@
+import itertools
+import operator
+
+import numpy as np
 import pandas as pd
 
-def pivot_and_count_flexible(df: pd.DataFrame, index_col: str, value_col: str) -> pd.DataFrame:
+
+def is_true_mask(values: pd.Series) -> np.ndarray:
+    """
+    Returns a boolean array that is True where a value is the boolean True.
+    Non-boolean values (1, 'yes', None, ...) are treated as False.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Decide once per category, then broadcast through the codes
+        category_mask = is_true_mask(pd.Series(values.cat.categories.astype(object)))
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes >= 0, category_mask[codes], False)
+    if pd.api.types.is_bool_dtype(values.dtype):
+        return values.to_numpy(dtype=bool, na_value=False)
+    if values.dtype != object:
+        return np.zeros(len(values), dtype=bool)
+
+    # True is a singleton, so an identity test is exact (1, 1.0 and 'yes' stay False) and,
+    # unlike objects == True, never falls back to rich comparisons of arbitrary objects
+    objects = values.to_numpy()
+    return np.fromiter(map(operator.is_, objects, itertools.repeat(True)), dtype=bool, count=len(objects))
+
+
+def group_codes(df: pd.DataFrame, index_cols: list):
+    """
+    Maps the index columns to one integer group id per row. Categorical columns use
+    their codes directly; other columns are factorized. Rows with a missing key get -1.
+    :return: Tuple (group ids, number of groups, key builder) where the key builder turns
+             group ids back into index labels.
+    """
+    level_codes, level_uniques = [], []
+    for col in index_cols:
+        column = df[col]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes, uniques = column.cat.codes.to_numpy().astype(np.int64), column.cat.categories
+        else:
+            codes, uniques = pd.factorize(column, sort=True)
+        level_codes.append(codes)
+        level_uniques.append(uniques)
+
+    shape = tuple(max(len(uniques), 1) for uniques in level_uniques)
+    missing = np.zeros(len(df), dtype=bool)
+    for codes in level_codes:
+        missing |= codes < 0
+    clipped = [np.where(missing, 0, codes) for codes in level_codes]
+    groups = np.ravel_multi_index(clipped, shape) if len(clipped) > 1 else clipped[0]
+    n_groups = int(np.prod(shape))
+    if n_groups > max(len(df), 1) * 4:
+        # Sparse key combinations: compact the ids instead of allocating every combination
+        groups, observed = pd.factorize(groups, sort=True)
+        observed = np.asarray(observed)
+        n_groups = len(observed)
+    else:
+        observed = None
+    groups = np.where(missing, -1, groups)
+
+    def keys(group_ids):
+        flat = group_ids if observed is None else observed[group_ids]
+        levels = np.unravel_index(flat, shape)
+        if len(index_cols) == 1:
+            return pd.Index(level_uniques[0].take(levels[0]), name=index_cols[0])
+        return pd.MultiIndex.from_arrays([uniques.take(codes) for uniques, codes in zip(level_uniques, levels)],
+                                        names=index_cols)
+
+    return groups, n_groups, keys
+
+
+def count_chunk(df: pd.DataFrame, index_cols: list, value_cols: list) -> pd.DataFrame:
+    """
+    Counts True and total values per group for one DataFrame with np.bincount.
+    """
+    for col in value_cols + index_cols:
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found in DataFrame.")
+
+    groups, n_groups, keys = group_codes(df, index_cols)
+    present = groups >= 0
+    groups = groups[present]
+    totals = np.bincount(groups, minlength=n_groups)
+    observed = np.flatnonzero(totals)
+
+    counts = {}
+    for col in value_cols:
+        trues = np.bincount(groups, weights=is_true_mask(df[col])[present], minlength=n_groups).astype(np.int64)
+        counts[(col, 'True')] = trues[observed]
+        counts[(col, 'Total')] = totals[observed]
+    return pd.DataFrame(counts, index=keys(observed))
+
+
+def pivot_and_count_flexible(df, index_col, value_col, chunksize: int = None) -> pd.DataFrame:
     """
     Pivots a DataFrame to count the occurrences of truthy and falsy values
     in a specified column, grouped by another column. Non-boolean values
     are treated as False.
 
+    Counting is vectorized: values are turned into boolean masks, index columns into
+    integer group codes, and the counts come from np.bincount. Several value and index
+    columns are handled in one pass. Passing an iterable of DataFrame chunks (e.g.
+    pd.read_csv(..., chunksize=N)) counts each chunk separately and merges the partial
+    counts, so the full table never has to be in memory.
+
     Args:
-        df: The input pandas DataFrame.
-        index_col: The name of the column to use as the index (grouping column).
-        value_col: The name of the column to count truthy/falsy values in.
-                   Non-boolean values are considered False.
+        df: The input pandas DataFrame, or an iterable of DataFrame chunks.
+        index_col: The name of the column to use as the index (grouping column),
+                   or a list of names.
+        value_col: The name of the column to count truthy/falsy values in,
+                   or a list of names. Non-boolean values are considered False.
+        chunksize: Optional number of rows to count at a time when df is a DataFrame.
 
     Returns:
         A pivoted DataFrame with counts of False, True, and Total values
-        for each group in the index column.
+        for each group in the index column. With several value columns the
+        columns are a (value column, count) MultiIndex.
     """
-    if value_col not in df.columns:
-        raise ValueError(f"Column '{value_col}' not found in DataFrame.")
-    if index_col not in df.columns:
-        raise ValueError(f"Column '{index_col}' not found in DataFrame.")
+    index_cols = [index_col] if isinstance(index_col, str) else list(index_col)
+    value_cols = [value_col] if isinstance(value_col, str) else list(value_col)
+
+    if isinstance(df, pd.DataFrame):
+        step = chunksize or max(len(df), 1)
+        chunks = (df.iloc[start:start + step] for start in range(0, max(len(df), 1), step))
+    else:
+        chunks = df
 
-    # Treat non-boolean values as False
-    processed_values = df[value_col].apply(lambda x: bool(x) if isinstance(x, bool) else False)
+    merged = None
+    for chunk in chunks:
+        partial = count_chunk(chunk, index_cols, value_cols)
+        merged = partial if merged is None else merged.add(partial, fill_value=0)
+    if merged is None:
+        raise ValueError("No data to pivot.")
+    merged = merged.sort_index().astype(np.int64)
 
-    counts = processed_values.groupby(df[index_col]).agg(['sum', 'count'])
-    pivoted_df = counts.rename(columns={'sum': 'True', 'count': 'Total'})
-    pivoted_df['False'] = pivoted_df['Total'] - pivoted_df['True']
-    pivoted_df = pivoted_df[['False', 'True', 'Total']]
+    pivoted_df = pd.DataFrame(index=merged.index)
+    for col in value_cols:
+        pivoted_df[(col, 'False')] = merged[(col, 'Total')] - merged[(col, 'True')]
+        pivoted_df[(col, 'True')] = merged[(col, 'True')]
+        pivoted_df[(col, 'Total')] = merged[(col, 'Total')]
+    if len(value_cols) == 1:
+        pivoted_df.columns = ['False', 'True', 'Total']
+    else:
+        pivoted_df.columns = pd.MultiIndex.from_tuples(pivoted_df.columns)
     return pivoted_df
 
-# Example Usage:
-data_flexible = {'Category': ['X', 'X', 'Y', 'Y', 'X', 'Z', 'Z', 'Y'],
-                 'Status': [1, 0, 'yes', True, None, [], 'ok', False]}
-df_flexible = pd.DataFrame(data_flexible)
 
-try:
-    result_flexible_df = pivot_and_count_flexible(df_flexible, index_col='Category', value_col='Status')
-    print(result_flexible_df)
-except ValueError as e:
-    print(f"Error: {e}")
+if __name__ == "__main__":
+    # Example Usage:
+    data_flexible = {'Category': ['X', 'X', 'Y', 'Y', 'X', 'Z', 'Z', 'Y'],
+                     'Status': [1, 0, 'yes', True, None, [], 'ok', False]}
+    df_flexible = pd.DataFrame(data_flexible)
 
-# Expected Output:
-#           False  True  Total
-# Category
-# X             2     1      3
-# Y             1     2      3
-# Z             2     0      2
+    try:
+        result_flexible_df = pivot_and_count_flexible(df_flexible, index_col='Category', value_col='Status')
+        print(result_flexible_df)
+    except ValueError as e:
+        print(f"Error: {e}")
 
+    # Expected Output:
+    #           False  True  Total
+    # Category
+    # X             3     0      3
+    # Y             2     1      3
+    # Z             2     0      2
@@ -0,0 +1,52 @@
+import csv
+import pickle
+
+import pytest
+
+from alias_index import load_schema_catalog
+from catalog_index import CatalogIndex, compile_catalog
+
+CATALOG = [
+    ("sales.Orders", "ID"),
+    ("sales.orders", "amount"),
+    ("customers", "id"),
+    ("customers", "name"),
+    ("regions", "name"),
+]
+
+
+@pytest.fixture
+def catalog_csv(tmp_path):
+    path = tmp_path / "columns.csv"
+    with open(path, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["TABLE_NAME", "COLUMN_NAME"])
+        writer.writerows(CATALOG)
+    return str(path)
+
+
+def test_index_matches_in_memory_catalog(catalog_csv, tmp_path):
+    index_path = str(tmp_path / "catalog.idx")
+    assert compile_catalog(catalog_csv, index_path) == (3, 3)
+    index = load_schema_catalog(index_path)
+    assert isinstance(index, CatalogIndex)
+
+    catalog = load_schema_catalog(catalog_csv)
+    for column in ("id", "ID", "name", "amount", "missing"):
+        assert sorted(index.tables_for(column)) == sorted(catalog.tables_for(column))
+    for table in ("orders", "other.ORDERS", "customers", "missing"):
+        for column in ("id", "amount", "name"):
+            assert index.has_column(table, column) == catalog.has_column(table, column)
+
+
+def test_index_pickles_as_its_path(catalog_csv, tmp_path):
+    index_path = str(tmp_path / "catalog.idx")
+    compile_catalog(catalog_csv, index_path)
+    index = CatalogIndex(index_path)
+    assert pickle.loads(pickle.dumps(index)).tables_for("name") == index.tables_for("name")
+    assert len(pickle.dumps(index)) < 200
+
+
+def test_rejects_other_files(catalog_csv):
+    with pytest.raises(ValueError, match="not a compiled catalog index"):
+        CatalogIndex(catalog_csv)
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("sqlparse")
+
+import cli
+
+
+@pytest.fixture
+def statements(tmp_path):
+    path = tmp_path / "in.csv"
+    path.write_text('logical_name,select_statement\nq1,"SELECT t.a, t.b AS bb FROM sch.t t"\n', encoding="utf-8")
+    return path
+
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+@pytest.mark.parametrize("parser", ["sqlparse", "regex", "fast"])
+def test_lineage_writes_output(tmp_path, statements, parser):
+    output = tmp_path / "out.csv"
+
+    assert not cli.main(["lineage", "--parser", parser, str(statements), str(output)])
+    assert "bb" in output.read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("parser", ["sqlparse", "regex", "fast"])
+def test_lineage_failure_propagates(tmp_path, parser):
+    with pytest.raises(FileNotFoundError):
+        cli.main(["lineage", "--parser", parser, str(tmp_path / "missing.csv"), str(tmp_path / "out.csv")])
+
+
+def test_standalone_parser_returns_failure_status(tmp_path, capsys):
+    import with_Sql_parser
+
+    assert with_Sql_parser.main([str(tmp_path / "missing.csv"), str(tmp_path / "out.csv")]) == 1
+    assert "An error occurred" in capsys.readouterr().out
+
+
+def test_batch_records_each_job(tmp_path, statements):
+    manifest = tmp_path / "jobs.ndjson"
+    results = tmp_path / "results.ndjson"
+    manifest.write_text("\n".join(json.dumps(job) for job in [
+        ["lineage", str(statements), str(tmp_path / "ok.csv")],
+        ["lineage", "--parser", "fast", str(tmp_path / "missing.csv"), str(tmp_path / "failed.csv")],
+        ["batch", str(manifest)],
+        ["lineage", "--parser", "nope", str(statements), str(tmp_path / "bad.csv")],
+        ["lineage", "--parser", "regex", str(statements), str(tmp_path / "ok2.csv")],
+    ]) + "\n", encoding="utf-8")
+
+    assert cli.main(["batch", str(manifest), "--results", str(results)]) == 3
+
+    records = read_results(results)
+    assert [record["ok"] for record in records] == [True, False, False, False, True]
+    assert records[1]["error"].startswith("FileNotFoundError")
+    assert records[2]["error"] == "ValueError: batch jobs cannot be nested"
+    assert records[3]["error"] == "exit status 2"
+    assert (tmp_path / "ok2.csv").exists()
+
+
+def test_batch_stops_on_error(tmp_path, statements):
+    manifest = tmp_path / "jobs.ndjson"
+    results = tmp_path / "results.ndjson"
+    manifest.write_text("\n".join(json.dumps(job) for job in [
+        ["lineage", str(tmp_path / "missing.csv"), str(tmp_path / "failed.csv")],
+        ["lineage", str(statements), str(tmp_path / "skipped.csv")],
+    ]) + "\n", encoding="utf-8")
+
+    assert cli.main(["batch", str(manifest), "--results", str(results), "--stop-on-error"]) == 1
+
+    assert [record["ok"] for record in read_results(results)] == [False]
+    assert not (tmp_path / "skipped.csv").exists()
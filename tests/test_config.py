@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+import config
+from config import Config, ConfigError
+
+
+def test_precedence_command_line_environment_dotenv(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("A=from_file\nB=from_file\nC=from_file\nD=\n")
+    cfg = Config(argv=["--a", "from_argv"], env_file=str(env_file),
+                 environ={"A": "from_env", "B": "from_env", "D": ""}, interactive=False)
+
+    assert cfg.get("A") == "from_argv"
+    assert cfg.get("B") == "from_env"
+    assert cfg.get("C") == "from_file"
+    # Set in the environment, even if empty: the .env file does not override it
+    assert cfg.get("D", "default") == "default"
+
+
+def test_dotenv_is_only_read_when_a_lookup_reaches_it(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(config, "find_env_file", lambda: calls.append("find") or None)
+    monkeypatch.setattr(config, "read_env_file", lambda path: calls.append("read") or {})
+    cfg = Config(argv=["--a", "1"], environ={"B": "2"}, interactive=False)
+
+    assert (cfg.get("A"), cfg.get("B")) == ("1", "2")
+    assert calls == []
+    assert cfg.get("C") is None
+    assert calls == ["find"]
+
+
+def test_dotenv_is_reread_when_it_changes(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("A=1\n")
+    cfg = Config(argv=[], env_file=str(env_file), environ={}, check_interval=0, interactive=False)
+    assert cfg.get_int("A") == 1
+
+    env_file.write_text("A=22\n")
+    os.utime(env_file, ns=(0, os.stat(env_file).st_mtime_ns + 10 ** 9))
+    assert cfg.get_int("A") == 22
+
+
+def test_resolve_without_terminal(capsys):
+    cfg = Config(argv=[], env_file=os.devnull, environ={"A": "x"}, interactive=False)
+    assert cfg.resolve("A", "A? ") == "x"
+    assert cfg.resolve("A", "A? ") == "x"
+    assert cfg.resolve("B", "B? ", "fallback") == "fallback"
+    with pytest.raises(ConfigError):
+        cfg.resolve("C", "C? ")
+    assert capsys.readouterr().out.count("Using A from environment variable.") == 1
+
+
+def test_typed_values_report_their_source():
+    cfg = Config(argv=["--n", "x"], env_file=os.devnull, environ={"FLAG": "yes", "ITEMS": "a, b,"})
+    assert cfg.get_bool("FLAG") is True
+    assert cfg.get_list("ITEMS") == ["a", "b"]
+    with pytest.raises(ValueError, match="N from command line argument is not an integer"):
+        cfg.get_int("N")
+
+
+def test_command_line_lookups_do_not_import_dotenv(monkeypatch):
+    monkeypatch.delitem(sys.modules, "dotenv", raising=False)
+    cfg = Config(argv=["--a", "1"], environ={}, interactive=False)
+    assert cfg.get("A") == "1"
+    assert "dotenv" not in sys.modules
@@ -0,0 +1,67 @@
+import zipfile
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+openpyxl = pytest.importorskip("openpyxl")
+
+import excel_pivot
+from excel_pivot import write_pivot_workbook
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return pd.DataFrame({"region": ["n", "s", "n", None, "n"], "kind": ["a", "b", "b", "a", "a"],
+                         "amount": [1.5, 2.0, 3.0, 4.0, None], "units": [1, 2, 3, 4, 5]})
+
+
+def record_values(cache):
+    """
+    Decodes the cache records read back by openpyxl: shared item indexes to their
+    items, inline numbers to their values and missing values to None.
+    """
+    items = [[getattr(item, "v", None) for item in field.sharedItems._fields] for field in cache.cacheFields]
+    rows = []
+    for record in cache.records.r:
+        row = []
+        for i, value in enumerate(record._fields):
+            kind = type(value).__name__
+            row.append(items[i][value.v] if kind == "Index" else None if kind == "Missing" else value.v)
+        rows.append(row)
+    return rows
+
+
+def test_saved_workbook_has_pivot_cache_and_records(frame, tmp_path):
+    file_name = str(tmp_path / "pivot.xlsx")
+
+    write_pivot_workbook(frame, file_name, rows=["region"], columns=["kind"], values=["amount", ("units", "count")],
+                         chunk_rows=2)
+
+    with zipfile.ZipFile(file_name) as archive:
+        assert archive.testzip() is None
+        assert {"xl/pivotCache/pivotCacheDefinition1.xml", "xl/pivotCache/pivotCacheRecords1.xml",
+                "xl/pivotTables/pivotTable1.xml"} <= set(archive.namelist())
+    workbook = openpyxl.load_workbook(file_name)
+    try:
+        [pivot] = workbook["PivotTable"]._pivots
+        cache = pivot.cache
+        assert cache.recordCount == cache.records.count == len(frame)
+        assert [field.name for field in cache.cacheFields] == ["region", "kind", "amount", "units"]
+        assert cache.cacheSource.worksheetSource.sheet == "DataSource"
+        assert cache.cacheSource.worksheetSource.ref == "A1:D6"
+        assert record_values(cache) == [["n", "a", 1.5, 1], ["s", "b", 2, 2], ["n", "b", 3, 3], [None, "a", 4, 4],
+                                        ["n", "a", None, 5]]
+        assert [field.name for field in pivot.dataFields] == ["Sum of amount", "Count of units"]
+
+        rendered = list(workbook["PivotTable"].iter_rows(min_row=3, values_only=True))
+        assert rendered[3:] == [("n", 1.5, 2, 3, 1, 4.5, 3), ("s", None, None, 2, 1, 2, 1),
+                                ("(blank)", 4, 1, None, None, 4, 1), ("Grand Total", 5.5, 3, 5, 2, 10.5, 5)]
+    finally:
+        workbook.close()
+
+
+def test_unverified_openpyxl_release_is_rejected(frame, tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_pivot.openpyxl, "__version__", "4.0.0")
+
+    with pytest.raises(RuntimeError, match="openpyxl 3.1.x"):
+        write_pivot_workbook(frame, str(tmp_path / "pivot.xlsx"), rows=["region"], values=["amount"])
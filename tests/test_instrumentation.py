@@ -0,0 +1,38 @@
+import io
+
+from instrumentation import Diagnostics, Instrumentation, diagnostic, stage
+from lineage_io import parallel_parse
+
+
+def parse_with_diagnostic(statement):
+    with stage("inner"):
+        diagnostic("odd_statement", f"Odd statement: {statement}", statement=statement)
+    return [(statement, statement, "t")]
+
+
+def test_merge_counts_everything_but_keeps_samples_within_the_limit():
+    worker = Diagnostics(limit=3, echo=False)
+    for i in range(4):
+        worker.report("kind", f"event {i}")
+    stream = io.StringIO()
+    parent = Diagnostics(limit=2, stream=stream)
+    parent.merge(worker.summary())
+    parent.merge(worker.summary())
+
+    assert parent.summary() == {"kind": {"count": 8, "samples": [{"message": "event 0"}, {"message": "event 1"}]}}
+    assert stream.getvalue().splitlines() == ["event 0", "event 1",
+                                              "Further 'kind' diagnostics are counted but not printed"]
+
+
+def test_worker_diagnostics_and_stages_reach_the_report():
+    metrics = Instrumentation(diagnostic_limit=2, echo_diagnostics=False)
+    statements = [(f"logical_{i}", f"s{i}") for i in range(20)]
+
+    assert len(list(parallel_parse(statements, parse_with_diagnostic, workers=2, batch_size=3,
+                                   metrics=metrics))) == 20
+
+    report = metrics.report()
+    assert report["diagnostics"]["odd_statement"]["count"] == 20
+    assert len(report["diagnostics"]["odd_statement"]["samples"]) == 2
+    assert report["stages"]["inner"]["calls"] == 20
+    assert report["stages"]["parse"]["calls"] == 20
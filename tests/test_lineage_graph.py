@@ -0,0 +1,85 @@
+import csv
+import pickle
+
+import pytest
+
+from lineage_graph import DependencyGraph, LineageGraphIndex, compile_lineage_graph
+from lineage_io import FIELDNAMES
+
+ROWS = [
+    ("view_b", "total", "amount", "schema_0.orders"),
+    ("view_a", "id", "ID", "Schema_0.Orders"),
+    ("view_a", "id", "id", "schema_0.orders"),
+    ("view_c", "id", "id", "schema_2.orders"),
+    ("view_c", "name", "name", "customers"),
+    ("view_c", "label", "UPPER(c.name)", "Unknown"),
+    ("view_c", "label", "UPPER(c.name)", "Unknown"),
+    ("view_d", "one", "1", "Unknown"),
+]
+
+
+@pytest.fixture
+def lineage_csv(tmp_path):
+    path = tmp_path / "lineage.csv"
+    with open(path, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(ROWS)
+    return str(path)
+
+
+@pytest.fixture
+def compiled(lineage_csv, tmp_path):
+    graph = compile_lineage_graph(lineage_csv, str(tmp_path / "graph.bin"), csv_path=str(tmp_path / "dedup.csv"))
+    return graph, LineageGraphIndex(str(tmp_path / "graph.bin"))
+
+
+def test_schemas_are_separate_nodes(compiled):
+    for graph in compiled:
+        assert graph.logicals_for("schema_0.orders") == ("view_a", "view_b")
+        assert graph.logicals_for("SCHEMA_2.ORDERS", "ID") == ("view_c",)
+        assert graph.logicals_for("schema_1.orders") == ()
+        # A bare name matches the table in every schema
+        assert graph.logicals_for("orders") == ("view_a", "view_b", "view_c")
+        assert graph.logicals_for("orders", "amount") == ("view_b",)
+        assert graph.logicals_for("customers", "name") == ("view_c",)
+        assert graph.logicals_for("missing") == ()
+
+
+def test_index_round_trips_the_graph(compiled):
+    graph, index = compiled
+    assert list(index.iter_rows()) == list(graph.iter_rows())
+    for logical_name in ("view_a", "view_b", "view_c", "view_d", "missing"):
+        assert index.sources_for(logical_name) == graph.sources_for(logical_name)
+    assert graph.sources_for("view_a") == [("id", "id", "schema_0.orders")]
+    assert (graph.logical_count, graph.column_count, graph.skipped, graph.unresolved_count) == (3, 4, 3, 2)
+
+    restored = pickle.loads(pickle.dumps(index))
+    assert restored.logicals_for("orders") == index.logicals_for("orders")
+
+
+def test_deduplicated_csv_keeps_rows_without_a_source_table(compiled, tmp_path):
+    with open(tmp_path / "dedup.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == FIELDNAMES
+    assert rows[1:] == [
+        ["view_a", "id", "id", "schema_0.orders"],
+        ["view_b", "total", "amount", "schema_0.orders"],
+        ["view_c", "id", "id", "schema_2.orders"],
+        ["view_c", "label", "UPPER(c.name)", "Unknown"],
+        ["view_c", "name", "name", "customers"],
+        ["view_d", "one", "1", "Unknown"],
+    ]
+
+
+def test_empty_graph_round_trips(tmp_path):
+    path = str(tmp_path / "empty.bin")
+    DependencyGraph().save(path)
+    index = LineageGraphIndex(path)
+    assert index.logicals_for("orders") == ()
+    assert list(index.iter_rows()) == []
+
+
+def test_rejects_other_files(lineage_csv):
+    with pytest.raises(ValueError, match="not a compiled lineage graph"):
+        LineageGraphIndex(lineage_csv)
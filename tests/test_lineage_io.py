@@ -0,0 +1,128 @@
+import csv
+
+import pytest
+
+from lineage_io import checkpoint_path, iter_lineage_rows, read_checkpoint, stream_lineage, write_checkpoint
+
+
+class Interrupted(Exception):
+    pass
+
+
+def parse_words(statement):
+    return [(word, word, "t") for word in statement.split()]
+
+
+def failing_after(count):
+    parsed = []
+
+    def parse(statement):
+        if len(parsed) == count:
+            raise Interrupted
+        parsed.append(statement)
+        return parse_words(statement)
+    return parse
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    path = tmp_path / "input.csv"
+    with open(path, mode="w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["logical_name", "select_statement"])
+        for i in range(23):
+            writer.writerow([f"logical_{i}", " ".join(f"c{i}_{j}" for j in range(i % 4 + 1))])
+    return str(path)
+
+
+@pytest.fixture
+def expected(input_csv, tmp_path):
+    path = str(tmp_path / "expected.csv")
+    assert stream_lineage(input_csv, path, parse_words, chunk_rows=5) == 23
+    with open(path, mode="rb") as f:
+        return f.read()
+
+
+def read(path):
+    with open(path, mode="rb") as f:
+        return f.read()
+
+
+def test_checkpoint_round_trip(tmp_path):
+    output = str(tmp_path / "out.csv")
+    assert read_checkpoint(output) == (0, 0)
+    write_checkpoint(output, 10, 1234)
+    assert read_checkpoint(output) == (10, 1234)
+    with open(checkpoint_path(output), mode="w") as f:
+        f.write("torn")
+    assert read_checkpoint(output) == (0, 0)
+
+
+def test_resume_after_interruption_matches_a_full_run(input_csv, expected, tmp_path):
+    output = str(tmp_path / "out.csv")
+    with pytest.raises(Interrupted):
+        stream_lineage(input_csv, output, failing_after(13), chunk_rows=5)
+    # Only statement boundaries at multiples of chunk_rows are checkpointed
+    assert read_checkpoint(output)[0] == 10
+
+    # Rows written after the checkpoint are truncated away and parsed again
+    with open(output, mode="a", encoding="utf-8") as f:
+        f.write("logical_11,partial")
+    assert stream_lineage(input_csv, output, parse_words, chunk_rows=5, resume=True) == 23
+    assert read(output) == expected
+    assert read_checkpoint(output) == (0, 0)
+
+
+def test_resume_without_checkpoint_starts_over(input_csv, expected, tmp_path):
+    output = str(tmp_path / "out.csv")
+    with open(output, mode="w", encoding="utf-8") as f:
+        f.write("stale output\n")
+    assert stream_lineage(input_csv, output, parse_words, chunk_rows=5, resume=True) == 23
+    assert read(output) == expected
+
+
+def test_parallel_ordered_output_matches_serial(input_csv, expected, tmp_path):
+    output = str(tmp_path / "out.csv")
+    stream_lineage(input_csv, output, parse_words, chunk_rows=5, workers=2, batch_size=4)
+    assert read(output) == expected
+    assert list(iter_lineage_rows(output))[0] == ("logical_0", "c0_0", "c0_0", "t")
+
+
+def test_resume_is_rejected_for_unordered_and_columnar_output(input_csv, tmp_path):
+    output = str(tmp_path / "out.csv")
+    with pytest.raises(ValueError, match="ordered"):
+        stream_lineage(input_csv, output, parse_words, resume=True, workers=2, ordered=False)
+    with pytest.raises(ValueError, match="csv output"):
+        stream_lineage(input_csv, output, parse_words, resume=True, output_format="parquet")
+
+
+def parse_with_catalog(statement, catalog=None):
+    tables = catalog.tables_for(statement.split()[0]) if catalog is not None else []
+    return [(word, word, tables[0] if tables else "Unknown") for word in statement.split()]
+
+
+def test_workers_load_the_catalog_once_instead_of_receiving_it(input_csv, tmp_path, monkeypatch):
+    import json
+    from concurrent.futures import ProcessPoolExecutor
+
+    catalog_path = str(tmp_path / "catalog.json")
+    with open(catalog_path, mode="w", encoding="utf-8") as f:
+        json.dump({"sch.first": ["c0_0", "c4_0"], "sch.other": ["c1_0"]}, f)
+    serial, parallel = str(tmp_path / "serial.csv"), str(tmp_path / "parallel.csv")
+    stream_lineage(input_csv, serial, parse_with_catalog, catalog_path=catalog_path)
+
+    submitted = []
+    submit = ProcessPoolExecutor.submit
+
+    def recording_submit(executor, func, *args):
+        submitted.append(args)
+        return submit(executor, func, *args)
+
+    monkeypatch.setattr(ProcessPoolExecutor, "submit", recording_submit)
+    stream_lineage(input_csv, parallel, parse_with_catalog, workers=2, batch_size=4, catalog_path=catalog_path)
+
+    assert read(parallel) == read(serial)
+    assert b"logical_1,c1_0,c1_0,other" in read(serial)
+    # Batches carry only their statements and flags, never the parse function or catalog
+    assert submitted
+    assert all(len(args) == 3 and all(isinstance(statement, str) for statement in args[0]) for args in submitted)
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from lineage_service import HttpError, LineageService, load_parser
+
+STATEMENTS = [f"SELECT t.c{i} FROM sch.t{i} t" for i in range(6)]
+
+
+@pytest.fixture
+def service(tmp_path):
+    parse_func, namespace = load_parser("regex")
+    service = LineageService(parse_func, workers=1, max_pending=4, batch_size=2,
+                             cache_path=str(tmp_path / "cache.db"), namespace=namespace)
+    service.start()
+    yield service
+    service.close()
+
+
+def parse(service, statements):
+    """
+    Runs parse_many and lets its batches store their results before the loop closes.
+    """
+    async def run():
+        try:
+            return await service.parse_many(statements)
+        finally:
+            await asyncio.gather(*service._tasks)
+    return asyncio.run(run())
+
+
+def cache_counts(service):
+    return service.cache.hits, service.cache.disk_hits, service.cache.misses
+
+
+def test_hits_and_misses_are_counted_per_admitted_statement(service):
+    results = parse(service, STATEMENTS[:3] + STATEMENTS[:1])
+
+    assert results == [(service.parse_func(STATEMENTS[i]), None) for i in (0, 1, 2, 0)]
+    assert cache_counts(service) == (0, 0, 4)
+
+    parse(service, STATEMENTS[:3])
+    assert cache_counts(service) == (3, 0, 4)
+
+
+def test_rejected_requests_do_not_touch_cache_statistics(service):
+    parse(service, STATEMENTS[:1])
+    assert cache_counts(service) == (0, 0, 1)
+
+    # Five new statements never fit in a queue of four
+    with pytest.raises(HttpError) as error:
+        parse(service, STATEMENTS[:6])
+    assert error.value.status == 413
+
+    # A full queue rejects with 503 until statements finish
+    service.pending = 3
+    with pytest.raises(HttpError) as error:
+        parse(service, STATEMENTS[:3])
+    assert (error.value.status, error.value.headers) == (503, {"Retry-After": "1"})
+    assert service.metrics.counters["rejected"] == 1
+    assert cache_counts(service) == (0, 0, 1)
+
+    # Cached statements need no queue space, so they are admitted even now
+    assert parse(service, STATEMENTS[:1])[0][1] is None
+    assert cache_counts(service) == (1, 0, 1)
+    service.pending = 0
+
+
+def test_persistent_results_count_as_disk_hits(tmp_path):
+    parse_func, namespace = load_parser("regex")
+    path = str(tmp_path / "cache.db")
+    for expected in [(0, 0, 2), (0, 2, 0)]:
+        service = LineageService(parse_func, workers=1, cache_path=path, namespace=namespace)
+        service.start()
+        try:
+            parse(service, STATEMENTS[:2])
+            assert cache_counts(service) == expected
+        finally:
+            service.close()
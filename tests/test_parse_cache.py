@@ -0,0 +1,63 @@
+import pytest
+
+import no_sql_parser
+from lineage_io import parallel_parse
+from parse_cache import ParseCache
+
+
+def parse_words(statement):
+    return [(word, word, "t") for word in statement.split()]
+
+
+def test_key_ignores_surrounding_whitespace_but_not_namespace():
+    cache = ParseCache(namespace="a")
+    assert cache.key("SELECT a FROM t") == cache.key("  SELECT a FROM t\n")
+    assert cache.key("SELECT a FROM t") != ParseCache(namespace="b").key("SELECT a FROM t")
+
+
+def test_results_persist_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with ParseCache(path=path, namespace="n") as cache:
+        assert cache.parse("SELECT a FROM t", parse_words) == parse_words("SELECT a FROM t")
+        assert cache.misses == 1
+
+    with ParseCache(path=path, namespace="n") as cache:
+        assert cache.parse("SELECT a FROM t", pytest.fail) == parse_words("SELECT a FROM t")
+        assert (cache.hits, cache.disk_hits, cache.misses) == (0, 1, 0)
+    with ParseCache(path=path, namespace="other") as cache:
+        assert cache.get(cache.key("SELECT a FROM t")) is None
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ParseCache(maxsize=2)
+    for statement in ("a", "b", "a", "c"):
+        cache.parse(statement, parse_words)
+    assert cache.get(cache.key("a")) is not None
+    assert cache.get(cache.key("b")) is None
+
+
+def test_namespace_is_fixed_and_versioned(monkeypatch, tmp_path):
+    namespace = no_sql_parser.cache_namespace("fast")
+    assert "__main__" not in namespace
+    assert namespace != no_sql_parser.cache_namespace("regex")
+    monkeypatch.setattr(no_sql_parser, "PARSER_VERSION", no_sql_parser.PARSER_VERSION + 1)
+    assert no_sql_parser.cache_namespace("fast") != namespace
+
+    catalog = tmp_path / "catalog.json"
+    catalog.write_text("{}")
+    assert no_sql_parser.cache_namespace("fast", str(catalog)) != no_sql_parser.cache_namespace("fast")
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_parallel_parse_never_parses_a_statement_twice(ordered):
+    distinct = [f"SELECT c{i} FROM t" for i in range(10)]
+    statements = [(f"logical_{k}_{i}", statement) for k in range(5) for i, statement in enumerate(distinct)]
+    cache = ParseCache()
+
+    parsed = list(parallel_parse(statements, parse_words, workers=2, batch_size=3, ordered=ordered, cache=cache))
+
+    assert cache.misses == len(distinct)
+    assert cache.hits == len(statements) - len(distinct)
+    assert sorted(parsed) == sorted((name, parse_words(statement)) for name, statement in statements)
+    if ordered:
+        assert [name for name, _ in parsed] == [name for name, _ in statements]
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+openpyxl = pytest.importorskip("openpyxl")
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "pv-dataframe-pivot-flexible.py")
+
+
+@pytest.fixture(scope="module")
+def module():
+    spec = importlib.util.spec_from_file_location("pv_dataframe_pivot_flexible", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def sheet_values(file_name, sheet_name):
+    workbook = openpyxl.load_workbook(file_name)
+    try:
+        return [list(row) for row in workbook[sheet_name].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+
+
+@pytest.mark.parametrize("as_chunks", [False, True])
+def test_streaming_writes_data_and_pivot_sheets(module, tmp_path, as_chunks):
+    df = pd.DataFrame({"Name": ["Alice", "Bob", "Eve"], "City": ["Paris", "London", "Paris"]})
+    source = (df.iloc[i:i + 2] for i in range(0, len(df), 2)) if as_chunks else df
+    file_name = str(tmp_path / "out.xlsx")
+
+    module.write_df_to_excel_with_pivot(source, file_name, "Data", "Pivot", module.example_pivot_func,
+                                        streaming=True)
+
+    assert sheet_values(file_name, "Data") == [["Name", "City"], ["Alice", "Paris"], ["Bob", "London"],
+                                               ["Eve", "Paris"]]
+    assert sheet_values(file_name, "Pivot") == [["City", "Name"], ["London", 1], ["Paris", 2]]
@@ -0,0 +1,161 @@
+import os
+import zipfile
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+openpyxl = pytest.importorskip("openpyxl")
+
+import pivot_refresh
+from pivot_refresh import refresh_pivot_report, state_path_for, write_incremental_report
+
+PIVOTS = [dict(sheet_name="Totals", index=["key"], values="value", aggfunc="sum")]
+
+
+def sheet_values(file_name, sheet_name):
+    workbook = openpyxl.load_workbook(file_name)
+    try:
+        return [list(row) for row in workbook[sheet_name].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+
+
+@pytest.fixture
+def report(tmp_path):
+    file_name = str(tmp_path / "report.xlsx")
+    write_incremental_report(pd.DataFrame({"key": ["a", "b", "a"], "value": [1, 2, 3]}), file_name, PIVOTS)
+    return file_name
+
+
+def snapshot(file_name):
+    with open(file_name, mode="rb") as f, open(state_path_for(file_name), mode="rb") as state:
+        return f.read(), state.read()
+
+
+def test_refresh_appends_rows_and_updates_pivots(report):
+    refresh_pivot_report(pd.DataFrame({"key": ["a", "c"], "value": [10, 20]}), report)
+    refresh_pivot_report(pd.DataFrame({"value": [5], "key": ["d"]}), report, chunk_rows=1)
+
+    assert zipfile.ZipFile(report).testzip() is None
+    assert sheet_values(report, "DataSource") == [["key", "value"], ["a", 1], ["b", 2], ["a", 3],
+                                                  ["a", 10], ["c", 20], ["d", 5]]
+    assert sheet_values(report, "Totals") == [["key", "value"], ["a", 14], ["b", 2], ["c", 20], ["d", 5]]
+
+
+def test_refresh_with_bad_value_leaves_workbook_untouched(report):
+    refresh_pivot_report(pd.DataFrame({"key": ["c"], "value": [4]}), report)
+    before = snapshot(report)
+
+    with pytest.raises(ValueError, match="cannot be used in worksheets"):
+        refresh_pivot_report(pd.DataFrame({"key": ["a", "b", "x\x01y", "d"], "value": [1, 2, 3, 4]}), report,
+                             chunk_rows=2)
+
+    assert snapshot(report) == before
+    refresh_pivot_report(pd.DataFrame({"key": ["e"], "value": [6]}), report)
+    assert sheet_values(report, "Totals") == [["key", "value"], ["a", 4], ["b", 2], ["c", 4], ["e", 6]]
+
+
+def test_refresh_failing_while_writing_rolls_back(report, monkeypatch):
+    before = snapshot(report)
+
+    def fail(f, entries):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pivot_refresh, "write_central_directory", fail)
+    with pytest.raises(OSError, match="disk full"):
+        refresh_pivot_report(pd.DataFrame({"key": ["c"], "value": [4]}), report)
+    monkeypatch.undo()
+
+    assert snapshot(report) == before
+    assert not [path for path in os.listdir(os.path.dirname(report)) if path.endswith(".tmp")]
+    refresh_pivot_report(pd.DataFrame({"key": ["c"], "value": [4]}), report)
+    assert sheet_values(report, "DataSource")[-1] == ["c", 4]
+
+
+def test_refresh_rejects_modified_workbook(report):
+    with open(report, mode="ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ValueError, match="changed since its pivot state was saved"):
+        refresh_pivot_report(pd.DataFrame({"key": ["c"], "value": [4]}), report)
+
+
+def test_zip64_records_are_readable(tmp_path, monkeypatch):
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", 10)
+    file_name = str(tmp_path / "report.xlsx")
+    write_incremental_report(pd.DataFrame({"key": ["a"], "value": [1]}), file_name, PIVOTS)
+    refresh_pivot_report(pd.DataFrame({"key": ["a"], "value": [2]}), file_name)
+    monkeypatch.undo()
+
+    assert zipfile.ZipFile(file_name).testzip() is None
+    assert sheet_values(file_name, "Totals") == [["key", "value"], ["a", 3]]
+
+
+def test_refresh_patches_workbook_in_place(report):
+    inode = os.stat(report).st_ino
+    with open(report, mode="rb") as f:
+        static = f.read(512)
+
+    refresh_pivot_report(pd.DataFrame({"key": ["c"], "value": [4]}), report)
+
+    assert os.stat(report).st_ino == inode
+    with open(report, mode="rb") as f:
+        assert f.read(512) == static
+    assert not os.path.exists(report + pivot_refresh.JOURNAL_SUFFIX)
+
+
+def test_interrupted_refresh_is_rolled_back_by_the_next_one(report, monkeypatch):
+    before = snapshot(report)
+
+    def crash(f, entries):
+        raise KeyboardInterrupt
+
+    # Simulate a process killed mid-write: nothing restores the workbook in process
+    monkeypatch.setattr(pivot_refresh, "write_central_directory", crash)
+    monkeypatch.setattr(pivot_refresh, "roll_back", lambda file_name: None)
+    with pytest.raises(KeyboardInterrupt):
+        refresh_pivot_report(pd.DataFrame({"key": ["c"], "value": [4]}), report)
+    monkeypatch.undo()
+    assert snapshot(report) != before and os.path.exists(report + pivot_refresh.JOURNAL_SUFFIX)
+
+    refresh_pivot_report(pd.DataFrame({"key": ["e"], "value": [6]}), report)
+
+    assert zipfile.ZipFile(report).testzip() is None
+    assert sheet_values(report, "DataSource")[-2:] == [["a", 3], ["e", 6]]
+    assert sheet_values(report, "Totals") == [["key", "value"], ["a", 4], ["b", 2], ["e", 6]]
+
+
+def test_state_round_trips_without_pickle(tmp_path):
+    np = pytest.importorskip("numpy")
+    from chunked_pivot import chunked_pivot_table
+
+    rng = np.random.default_rng(1)
+
+    def rows(count):
+        return pd.DataFrame({
+            "key": rng.choice(["a", "b", None], count),
+            "number": rng.integers(0, 3, count),
+            "day": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 3, count), unit="D"),
+            "amount": rng.random(count),
+            "units": rng.integers(0, 50, count),
+        })
+
+    pivots = [dict(sheet_name="Lists", index="key", columns="number", values=["amount", "units"],
+                   aggfunc=["sum", "mean", len, np.max]),
+              dict(sheet_name="Distinct", index=["day", "key"], values="units", aggfunc={"units": "nunique"},
+                   dropna=False),
+              dict(sheet_name="Sketch", index="number", values="units", aggfunc="approx_nunique")]
+    file_name = str(tmp_path / "report.xlsx")
+    parts = [rows(50), rows(30), rows(20)]
+    write_incremental_report(parts[0], file_name, pivots)
+    for part in parts[1:]:
+        refresh_pivot_report(part, file_name)
+
+    with np.load(state_path_for(file_name), allow_pickle=False) as arrays:
+        assert all(arrays[name].dtype != object for name in arrays.files)
+    full = pd.concat(parts, ignore_index=True)
+    for (spec, plans, accumulator), pivot in zip(pivot_refresh.load_state(state_path_for(file_name))["pivots"],
+                                                 pivots):
+        table = pivot_refresh.reshape_pivot(accumulator, spec.aggfunc, plans, spec.values, spec.index,
+                                            spec.columns, fill_value=spec.fill_value, dropna=spec.dropna)
+        expected = chunked_pivot_table(full, **{name: value for name, value in pivot.items() if name != "sheet_name"})
+        pd.testing.assert_frame_equal(table, expected)
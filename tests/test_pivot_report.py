@@ -0,0 +1,50 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from pivot_report import PivotSpec, factorize_columns, pivot_from_codes
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(0)
+    rows = 500
+    return pd.DataFrame({
+        # Category order differs from lexical order and "q" is never observed
+        "region": pd.Categorical(rng.choice(["z", "a", "m"], rows), categories=["z", "q", "a", "m"]),
+        "status": pd.Categorical(rng.choice(["x", "y", None], rows), categories=["y", "x"]),
+        "kind": rng.choice(["p", "o"], rows),
+        "amount": rng.random(rows),
+        "units": rng.integers(0, 9, rows),
+    })
+
+
+@pytest.mark.parametrize("arguments", [
+    dict(index="region", values="amount"),
+    dict(index=["region", "kind"], columns="status", values=["amount", "units"], aggfunc=["sum", "mean"]),
+    dict(index="kind", columns=["region", "status"], values="units", aggfunc="count"),
+    dict(index="region", columns="status", values="amount", aggfunc="sum", observed=False),
+    dict(index=["region", "kind"], columns="status", values=["amount", "units"],
+         aggfunc=["sum", "mean", "count", "max"], observed=False),
+    dict(index=["region", "status"], values="units", aggfunc={"units": "nunique"}, observed=False),
+    dict(index="region", columns="status", values="units", aggfunc="sum", fill_value=0, observed=False),
+    dict(index="region", columns="status", values="amount", dropna=False, observed=False),
+])
+def test_pivot_from_codes_matches_pivot_table(frame, arguments):
+    spec = PivotSpec("Pivot", **arguments)
+
+    table = pivot_from_codes(frame, factorize_columns(frame, spec.keys), spec)
+
+    pd.testing.assert_frame_equal(table, pd.pivot_table(frame, **arguments))
+
+
+def test_categorical_keys_keep_category_order_and_dtype(frame):
+    spec = PivotSpec("Pivot", index="region", values="amount", aggfunc="sum", observed=False)
+
+    table = pivot_from_codes(frame, factorize_columns(frame, spec.keys), spec)
+
+    assert isinstance(table.index, pd.CategoricalIndex)
+    assert table.index.dtype == frame["region"].dtype
+    assert list(table.index) == ["z", "q", "a", "m"]
+    assert table.loc["q", "amount"] == 0
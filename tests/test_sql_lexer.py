@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("sqlparse")
+
+import sql_lexer
+import with_Sql_parser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+from corpus import generate_corpus
+
+
+@pytest.mark.parametrize("options", [
+    dict(),
+    dict(union_depth=2, function_nesting=3, crlf=True),
+    dict(joins=0, width=5),
+    dict(function_nesting=0),
+    dict(subquery_depth=2, union_depth=1),
+])
+def test_fast_backend_matches_with_sql_parser_on_bench_corpus(options):
+    for _, statement in generate_corpus(20, seed=3, **options):
+        fast = sql_lexer.parse_select_statement(statement)
+        reference = with_Sql_parser.parse_select_statement(statement)
+
+        assert [column[0] for column in fast] == [column[0] for column in reference]
+        for (output, source, table), expected in zip(fast, reference):
+            if table == "Unknown":
+                # Documented difference: computed items keep their expression text
+                assert expected[1] == source.split("(", 1)[0]
+            else:
+                assert (output, source, table) == expected
+
+
+def test_computed_items_report_expression_text():
+    query = "SELECT 'a UNION b' AS s, COUNT(*) AS cnt, COUNT(*), t.a FROM sch.t t"
+
+    assert sql_lexer.parse_select_statement(query) == [
+        ("s", "'a UNION b'", "Unknown"), ("cnt", "COUNT(*)", "Unknown"), ("COUNT", "COUNT(*)", "Unknown"),
+        ("a", "a", "t")]
+    assert with_Sql_parser.parse_select_statement(query) == [
+        ("s", "s", "t"), ("cnt", "COUNT", "t"), ("COUNT", "COUNT(*)", "Unknown"), ("a", "a", "t")]
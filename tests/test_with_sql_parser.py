@@ -0,0 +1,25 @@
+import pytest
+
+sqlparse = pytest.importorskip("sqlparse")
+
+import with_Sql_parser
+from with_Sql_parser import parse_select_statement
+
+
+def test_subqueries_and_ctes_trace_to_physical_tables():
+    assert parse_select_statement(
+        "SELECT s.a, s.b AS bb, t.c FROM (SELECT x.a, x.b FROM sch.x x) s JOIN sch.t t ON s.a = t.a"
+    ) == [("a", "a", "x"), ("bb", "b", "x"), ("c", "c", "t")]
+    assert parse_select_statement(
+        "WITH c AS (SELECT y.k FROM sch.y y) SELECT c.k, d.m FROM c, (SELECT m FROM sch.m) d"
+    ) == [("k", "k", "y"), ("m", "m", "m")]
+
+
+def test_nested_subqueries_are_parsed_once(monkeypatch):
+    parsed = []
+    parse = sqlparse.parse
+    monkeypatch.setattr(with_Sql_parser.sqlparse, "parse", lambda text: parsed.append(text) or parse(text))
+
+    query = "SELECT s.a FROM (SELECT q.a FROM (SELECT r.a FROM (SELECT z.a FROM sch.z z) r) q) s"
+    assert parse_select_statement(query) == [("a", "a", "z")]
+    assert sum(map(len, parsed)) < len(query)
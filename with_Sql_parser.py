@@ -1,28 +1,67 @@
-import csv
-import re
+import argparse
+import os
+import sys
 import sqlparse
-from sqlparse.sql import IdentifierList, Identifier, Function
-from sqlparse.tokens import Keyword, DML
-
-def extract_tables(parsed_tokens):
-    tables = {}
+from sqlparse.sql import IdentifierList, Identifier, Function, Where
+from sqlparse.tokens import Comment, Keyword, DML, Punctuation
+from sqlparse.utils import remove_quotes
+
+from alias_index import AliasIndex
+from instrumentation import (Instrumentation, add_instrumentation_arguments, diagnostic, format_report,
+                             instrumentation_from_args, stage)
+from lineage_io import DEFAULT_CHUNK_ROWS, OUTPUT_FORMATS, stream_lineage
+from lineage_graph import compile_lineage_graph
+from parse_cache import DEFAULT_CACHE_SIZE, ParseCache
+from sql_decompose import decompose, trace_lineage
+
+# Mixed into parse cache keys; bump whenever parse_select_statement output changes so
+# results cached by an older parser are never served
+PARSER_VERSION = 1
+TABLE_LIST_END_KEYWORDS = ("GROUP BY", "ORDER BY", "HAVING", "LIMIT", "UNION", "UNION ALL", "INTERSECT", "EXCEPT")
+
+def extract_tables(parsed_tokens, catalog=None, ctes=None, derived=None):
+    tables = AliasIndex(catalog)
     from_seen = False
+    in_join_condition = False
 
     for token in parsed_tokens:
         if from_seen:
-            if isinstance(token, IdentifierList):
+            if isinstance(token, Where) or token.ttype is DML:
+                break
+            elif token.is_keyword:
+                keyword = token.normalized
+                if keyword in TABLE_LIST_END_KEYWORDS:
+                    break
+                # ON/USING start a join condition; the next JOIN ends it
+                in_join_condition = keyword in ("ON", "USING")
+            elif in_join_condition:
+                continue
+            elif isinstance(token, IdentifierList):
                 for identifier in token.get_identifiers():
-                    table_name, alias = extract_table_alias(identifier)
-                    tables[alias] = table_name
+                    add_table(tables, identifier, catalog, ctes, derived)
             elif isinstance(token, Identifier):
-                table_name, alias = extract_table_alias(token)
-                tables[alias] = table_name
-            elif token.ttype is Keyword and token.value.upper() in ("WHERE", "GROUP BY", "ORDER BY"):
-                break
+                add_table(tables, token, catalog, ctes, derived)
         elif token.ttype is Keyword and token.value.upper() == "FROM":
             from_seen = True
     return tables
 
+def add_table(tables, identifier, catalog=None, ctes=None, derived=None):
+    if not isinstance(identifier, Identifier):
+        return
+    table_name, alias = extract_table_alias(identifier)
+    table = table_name
+    if identifier.get_parent_name() is None:
+        # Unqualified names may refer to a FROM subquery (masked to its alias by
+        # sql_decompose) or a CTE rather than a physical table
+        if derived and table_name in derived:
+            table = derived[table_name]
+        elif ctes:
+            table = ctes.get(table_name.lower(), table_name)
+    tables[alias] = table
+    # Also accept the table name itself as a qualifier
+    if table_name not in tables:
+        tables[table_name] = table
+
 def extract_table_alias(identifier):
     alias = identifier.get_alias() or identifier.get_real_name()
     table_name = identifier.get_real_name()
@@ -45,8 +84,11 @@ def extract_columns(parsed_tokens, tables):
                     columns.append(column_data)
             elif token.ttype is Keyword and token.value.upper() == "FROM":
                 break
+            elif token.is_whitespace or token.ttype in Comment:
+                continue
             else:
-                print(f"Unexpected token in SELECT clause: {token}")
+                diagnostic("unexpected_token", f"Unexpected token in SELECT clause: {token}",
+                           token=str(token), ttype=str(token.ttype))
         elif token.ttype is DML and token.value.upper() == "SELECT":
             select_seen = True
     return columns
@@ -62,85 +104,147 @@ def parse_column(identifier, tables):
         source_table = "Unknown"
         if isinstance(identifier, Function):
             source_column = str(identifier)
-        elif "." in source_column:
-            alias, column_name = source_column.split(".", 1)
-            source_table = tables.get(alias, "Unknown")
-            source_column = column_name
         else:
-            source_table = next(iter(tables.values()), "Unknown")
+            source_column, source_table = tables.resolve(column_qualifier(identifier), source_column)
 
         return output_column, source_column, source_table
 
     except Exception as e:
-        print(f"Error processing column: {identifier}, error: {e}")
+        diagnostic("column_error", f"Error processing column: {identifier}, error: {e}",
+                   column=str(identifier), error=str(e))
         return None
 
-def split_union_queries(query):
-    queries = []
-    parsed = sqlparse.parse(query)
-
-    for stmt in parsed:
-        if stmt.get_type() == "SELECT":
-            queries.append(str(stmt).strip())
+def column_qualifier(identifier):
+    """
+    Returns the table alias a column is qualified with (the part before the last dot,
+    so schema.table.column gives table), or None for an unqualified column.
+    """
+    qualifier = previous = None
+    for token in identifier.tokens:
+        if token.match(Punctuation, "."):
+            qualifier = previous
+        elif token.is_whitespace or token.is_keyword:
+            break
         else:
-            union_parts = re.split(r"\bUNION(?: ALL)?\b", str(stmt), flags=re.IGNORECASE)
-            queries.extend([part.strip() for part in union_parts])
-
-    return queries
-
-def parse_select_statement(query):
-    queries = split_union_queries(query)
-    all_columns = []
-
-    for subquery in queries:
-        parsed = sqlparse.parse(subquery)[0]  # Parse the query into tokens
-        tables = extract_tables(parsed.tokens)
-        columns = extract_columns(parsed.tokens, tables)
-        all_columns.extend(columns)
+            previous = token
+    return remove_quotes(qualifier.value) if qualifier is not None else None
 
-    return all_columns
-
-def process_csv(input_file, output_file):
-    rows = []
+def split_union_queries(query):
+    """
+    Returns the text of every UNION/INTERSECT/EXCEPT branch, CTE bodies first. Set
+    operators inside string literals or subqueries do not split a branch.
+    """
+    def branch_texts(decomposition):
+        for cte in decomposition.ctes:
+            yield from branch_texts(cte.body)
+        for branch in decomposition.branches:
+            yield branch.text(query)
+
+    return list(branch_texts(decompose(query)))
+
+def parse_branch(query, branch, catalog=None, ctes=None, derived=None):
+    with stage("sqlparse.parse"):
+        # FROM subqueries are replaced by their aliases and resolve through derived
+        parsed = sqlparse.parse(branch.masked_text(query))[0]
+    with stage("extract_tables"):
+        tables = extract_tables(parsed.tokens, catalog, ctes, derived)
+    with stage("extract_columns"):
+        return extract_columns(parsed.tokens, tables)
+
+def parse_select_statement(query, catalog=None):
+    # Decompose once into CTEs, set-operation branches and FROM subqueries, then give
+    # sqlparse each branch on its own so no fragment is parsed twice
+    with stage("decompose"):
+        decomposition = decompose(query)
+    return trace_lineage(query, decomposition, parse_branch, catalog)
+
+def cache_namespace(catalog_path=None):
+    """
+    Returns the parse cache namespace for this parser. It is a fixed module name, not
+    __name__, so a cache file is shared whether the module runs as a script or is
+    imported (cli.py, lineage_service).
+    """
+    namespace = f"with_Sql_parser:{PARSER_VERSION}"
+    if catalog_path:
+        # Cached results depend on the catalog contents
+        namespace += f":{os.path.abspath(catalog_path)}:{os.path.getmtime(catalog_path)}"
+    return namespace
+
+def process_csv(input_file, output_file, chunk_rows=DEFAULT_CHUNK_ROWS, resume=False,
+                workers=1, ordered=True, cache_size=DEFAULT_CACHE_SIZE, cache_path=None, catalog_path=None,
+                output_format="csv", metrics=None, report_path=None, metrics_callback=None,
+                graph_path=None, raise_errors=False):
     try:
-        with open(input_file, mode='r', encoding='utf-8') as csv_file:
-            reader = csv.DictReader(csv_file)
-            for row in reader:
-                logical_name = row['logical_name']
-                select_statement = row['select_statement']
-                parsed_columns = parse_select_statement(select_statement)
-                for output_column, source_column, source_table in parsed_columns:
-                    rows.append({
-                        "logical_name": logical_name,
-                        "output_column_name": output_column,
-                        "source_column_name": source_column,
-                        "source_table_name": source_table
-                    })
-
-        with open(output_file, mode='w', newline='', encoding='utf-8') as csv_out:
-            writer = csv.DictWriter(csv_out, fieldnames=[
-                "logical_name",
-                "output_column_name",
-                "source_column_name",
-                "source_table_name"
-            ])
-            writer.writeheader()
-            writer.writerows(rows)
-        print(f"Output successfully written to {output_file}")
-
+        namespace = cache_namespace(catalog_path)
+        if metrics is None and (report_path or metrics_callback):
+            metrics = Instrumentation()
+        with ParseCache(cache_size, cache_path, namespace=namespace) as cache:
+            # Workers load the catalog themselves rather than receive it with every batch
+            stream_lineage(input_file, output_file, parse_select_statement,
+                           chunk_rows=chunk_rows, resume=resume, workers=workers, ordered=ordered,
+                           cache=cache, output_format=output_format, metrics=metrics, catalog_path=catalog_path)
+            print(f"Output successfully written to {output_file}")
+            print(cache.report())
+            if graph_path:
+                graph = compile_lineage_graph(output_file, graph_path, output_format)
+                print(f"Dependency graph of {graph.logical_count} logical SQLs and {graph.column_count} columns "
+                      f"written to {graph_path}")
+            if metrics is not None:
+                metrics.count("cache_memory_hits", cache.hits)
+                metrics.count("cache_disk_hits", cache.disk_hits)
+                metrics.count("cache_misses", cache.misses)
+                report = metrics.publish(report_path, metrics_callback)
+                if report_path:
+                    print(f"Run report written to {report_path}")
+                elif metrics_callback is None:
+                    # e.g. --profile without --report
+                    print(format_report(report))
+        return True
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"An error occurred: {e}")
+        return False
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract column lineage from SQL SELECT statements.")
+    parser.add_argument('input_file', nargs='?', default="input.csv",
+                        help='Input CSV with logical_name and select_statement columns')
+    parser.add_argument('output_file', nargs='?', default="output.csv",
+                        help='Output path (CSV, or Parquet/Arrow with --output-format)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS,
+                        help='Flush output and write a resume checkpoint every N input rows')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume from the checkpoint left by an interrupted run')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of parser processes (default: 1, parse in-process)')
+    parser.add_argument('--unordered', action='store_true',
+                        help='With --workers, write results as batches finish instead of in input order')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='Number of parsed statements kept in memory (0 disables the LRU)')
+    parser.add_argument('--cache-path',
+                        help='SQLite file that persists parsed statements between runs')
+    parser.add_argument('--catalog',
+                        help='Schema catalog for unqualified columns: compiled catalog_index file, JSON, or table_name/column_name CSV')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default="csv",
+                        help='Lineage output format; parquet and arrow dictionary-encode repeated names (needs pyarrow)')
+    parser.add_argument('--graph',
+                        help='Also aggregate the output into a column-level dependency graph file (see lineage_graph)')
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None, raise_errors=False):
+    """
+    :param raise_errors: Let a failure propagate instead of printing it (cli.py batch jobs).
+    :return: Exit status, 1 if the run failed.
+    """
+    args = parse_args(argv)
+    ok = process_csv(args.input_file, args.output_file, chunk_rows=args.chunk_rows, resume=args.resume,
+                     workers=args.workers, ordered=not args.unordered,
+                     cache_size=args.cache_size, cache_path=args.cache_path, catalog_path=args.catalog,
+                     output_format=args.output_format, metrics=instrumentation_from_args(args),
+                     report_path=args.report, graph_path=args.graph, raise_errors=raise_errors)
+    return 0 if ok else 1
 
 if __name__ == "__main__":
-    input_csv_path = "input.csv"
-    output_csv_path = "output.csv"
-    process_csv(input_csv_path, output_csv_path)
-
-
-
-
-if __name__ == "__main__":
-    input_csv_path = "input.csv"  # Replace with your input file path
-    output_csv_path = "output.csv"  # Replace with your desired output file path
-
-    process_csv(input_csv_path, output_csv_path)
+    sys.exit(main())